@@ -23,6 +23,9 @@ export const listingSchema = z
 
 
 const listingsResponseSchema = z.array(listingSchema);
+
+{/* LISTINGS PER REQUEST, THE MOST THE SERVER ALLOWS */}
+const LISTINGS_PAGE_SIZE = 100;
 type ListingResponse = z.infer<typeof listingsResponseSchema>
 
 {/* STATUS STYLES FOR LISTING CARDS */}
@@ -57,13 +60,21 @@ export default function Profile({}: Route.ComponentProps) {
   {/* FETCH LISTINGS */}
   const fetchListings = async () => {
     try {
-      const res = await api.get("/profile/listings");
+      {/* THE ENDPOINT IS PAGINATED, SO FOLLOW X-Next-Cursor UNTIL EVERY PAGE IS LOADED */}
+      const allListings: ListingResponse = [];
+      let cursor: string | undefined;
+      do {
+        const res = await api.get("/profile/listings", {
+          params: { card_num: LISTINGS_PAGE_SIZE, cursor },
+        });
 
-      const data = await res.data;
-      console.log("Fetched listings:", data);
+        const data = await res.data;
+        console.log("Fetched listings:", data);
 
-      const parsedListings = listingsResponseSchema.parse(data);
-      setListings(parsedListings);
+        allListings.push(...listingsResponseSchema.parse(data));
+        cursor = res.headers["x-next-cursor"] as string | undefined;
+      } while (cursor);
+      setListings(allListings);
     } catch (err) {
       console.error("Failed to fetch listings:", err);
     } finally {
@@ -29,6 +29,9 @@ interface Listing {
   image_url: string | null;
 }
 
+{/* LISTINGS PER REQUEST, THE MOST THE SERVER ALLOWS */}
+const LISTINGS_PAGE_SIZE = 100;
+
 {/* FORMATS PHONE NUMBER OR RETURNS FALLBACK */}
 const formatPhone = (phone: string | null) => {
     if (!phone) return "No phone";
@@ -149,18 +152,25 @@ export default function AdminUserDetailPage({ loaderData }: Route.ComponentProps
     setListingsLoading(true);
     setListingsError(null);
 
-    {/* FETCH USER LISTINGS */}
+    {/* FETCH USER LISTINGS, FOLLOWING X-Next-Cursor UNTIL EVERY PAGE IS LOADED */}
     try {
-      const response = await fetch(`${apiURL}/admin/users/${userId}/listings`, {
-        credentials: "include",
-      });
-
-      if (!response.ok) {
-        throw new Error("Failed to fetch user listings");
-      }
+      const allListings: Listing[] = [];
+      let cursor: string | null = null;
+      do {
+        const params = new URLSearchParams({ card_num: String(LISTINGS_PAGE_SIZE) });
+        if (cursor) params.set("cursor", cursor);
+        const response = await fetch(`${apiURL}/admin/users/${userId}/listings?${params}`, {
+          credentials: "include",
+        });
+
+        if (!response.ok) {
+          throw new Error("Failed to fetch user listings");
+        }
 
-      const data = await response.json();
-      setListings(data);
+        allListings.push(...(await response.json()));
+        cursor = response.headers.get("X-Next-Cursor");
+      } while (cursor);
+      setListings(allListings);
     } catch (err: any) {
       setListingsError(err?.message || "Failed to load user listings");
     } finally {
@@ -0,0 +1,5 @@
+#!/bin/bash
+# Runs once when the db volume is first created, and lets the db-replica service stream from it.
+# For an existing volume, append the same line to pg_hba.conf by hand and reload postgres.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
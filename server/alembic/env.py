@@ -7,9 +7,9 @@ from sqlalchemy import pool
 
 from alembic import context
 
-from app.models import Base, User, AccessToken, Listing
+from app.models import Base, User, AccessToken, Listing, EmailJob, EmailDeadLetter, SellerListingStats, ListingFacetCounts
 
-_ = User, AccessToken, Listing
+_ = User, AccessToken, Listing, EmailJob, EmailDeadLetter, SellerListingStats, ListingFacetCounts
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
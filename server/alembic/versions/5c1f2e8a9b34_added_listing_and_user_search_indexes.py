@@ -0,0 +1,50 @@
+"""added listing and user search indexes
+
+Revision ID: 5c1f2e8a9b34
+Revises: fa94903592a7
+Create Date: 2026-10-18 10:12:41.530218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1f2e8a9b34'
+down_revision: Union[str, Sequence[str], None] = 'fa94903592a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # pg_trgm provides the similarity operators and the gin_trgm_ops operator class
+    op.execute(sa.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+
+    op.add_column('listing_table', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index('ix_listing_table_search_vector', 'listing_table', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_listing_table_title_trgm', 'listing_table', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+    op.create_index('ix_user_first_name_trgm', 'user', ['first_name'], unique=False, postgresql_using='gin', postgresql_ops={'first_name': 'gin_trgm_ops'})
+    op.create_index('ix_user_last_name_trgm', 'user', ['last_name'], unique=False, postgresql_using='gin', postgresql_ops={'last_name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_last_name_trgm', table_name='user')
+    op.drop_index('ix_user_first_name_trgm', table_name='user')
+    op.drop_index('ix_listing_table_title_trgm', table_name='listing_table')
+    op.drop_index('ix_listing_table_search_vector', table_name='listing_table')
+    op.drop_column('listing_table', 'search_vector')
+    # The extension is left installed since other objects in the database may depend on it
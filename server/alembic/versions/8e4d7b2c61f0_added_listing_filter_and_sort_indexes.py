@@ -0,0 +1,58 @@
+"""added listing filter and sort indexes
+
+Revision ID: 8e4d7b2c61f0
+Revises: 5c1f2e8a9b34
+Create Date: 2026-10-18 13:47:05.118904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4d7b2c61f0'
+down_revision: Union[str, Sequence[str], None] = '5c1f2e8a9b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Each index is designed around a query in app/api:
+#   seller_id_updated_at   -> get_my_listings, get_user_listings_by_id and the admin activate/deactivate updates
+#   status_updated_at      -> GET /listings?status=active with the default updated_at sort (and its keyset cursors)
+#   updated_at             -> the unfiltered admin listings page
+#   category_status_price  -> category pages filtered by status and a price range
+#   active_price           -> active listings sorted or filtered by price
+#   active_created_at      -> active listings sorted by newest
+# The sort columns are paired with id in the same direction as the ORDER BY tie-breaker in get_listings.
+INDEXES = [
+    ('ix_listing_table_seller_id_updated_at', ['seller_id', sa.text('updated_at DESC'), sa.text('id DESC')], None),
+    ('ix_listing_table_status_updated_at', ['status', sa.text('updated_at DESC'), sa.text('id DESC')], None),
+    ('ix_listing_table_updated_at', [sa.text('updated_at DESC'), sa.text('id DESC')], None),
+    ('ix_listing_table_category_status_price', ['category', 'status', 'price_cents'], None),
+    ('ix_listing_table_active_price', ['price_cents', 'id'], sa.text("status = 'ACTIVE'")),
+    ('ix_listing_table_active_created_at', [sa.text('created_at DESC'), sa.text('id DESC')], sa.text("status = 'ACTIVE'")),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps listing_table writable while the indexes build, but cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, columns, where in INDEXES:
+            op.create_index(
+                name,
+                'listing_table',
+                columns,
+                unique=False,
+                postgresql_where=where,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='listing_table', postgresql_concurrently=True, if_exists=True)
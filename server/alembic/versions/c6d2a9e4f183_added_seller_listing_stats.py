@@ -0,0 +1,108 @@
+"""added seller listing stats
+
+Revision ID: c6d2a9e4f183
+Revises: b71e3c9d4a52
+Create Date: 2026-10-18 17:03:26.418095
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6d2a9e4f183'
+down_revision: Union[str, Sequence[str], None] = 'b71e3c9d4a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# seller_listing_stats holds one row per seller and status. It is filled once with a GROUP BY over
+# listing_table and then kept up to date by statement-level triggers: each statement's changed rows
+# arrive as transition tables and are folded into the stats with one GROUP BY, so the admin bulk
+# activate/deactivate updates cost one stats write per seller and status, not one per listing.
+# Changed rows count +1 in their new status and -1 in their old one. Rows are upserted in key order
+# so concurrent statements lock them in the same order. Deletes only update existing rows, since a
+# user delete cascades to both tables and must not re-insert stats for the deleted user.
+
+UPSERT_STATS = """
+        INSERT INTO seller_listing_stats AS stats (seller_id, status, listing_count, value_cents, last_activity_at)
+        SELECT seller_id, status, sum(listings), sum(value), max(activity)
+        FROM ({changes}) AS changes
+        GROUP BY seller_id, status
+        ORDER BY seller_id, status
+        ON CONFLICT (seller_id, status) DO UPDATE SET
+            listing_count = stats.listing_count + EXCLUDED.listing_count,
+            value_cents = stats.value_cents + EXCLUDED.value_cents,
+            last_activity_at = GREATEST(stats.last_activity_at, EXCLUDED.last_activity_at);
+"""
+
+ADDED_ROWS = "SELECT seller_id, status, 1 AS listings, price_cents::bigint AS value, updated_at AS activity FROM new_rows"
+REMOVED_ROWS = "SELECT seller_id, status, -1, -price_cents::bigint, NULL::timestamptz FROM old_rows"
+
+APPLY_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION seller_listing_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {UPSERT_STATS.format(changes=ADDED_ROWS)}
+    ELSIF TG_OP = 'UPDATE' THEN
+        {UPSERT_STATS.format(changes=f"{ADDED_ROWS} UNION ALL {REMOVED_ROWS}")}
+    ELSE
+        UPDATE seller_listing_stats AS stats
+        SET listing_count = stats.listing_count - deltas.listings,
+            value_cents = stats.value_cents - deltas.value
+        FROM (
+            SELECT seller_id, status, count(*) AS listings, sum(price_cents) AS value
+            FROM old_rows
+            GROUP BY seller_id, status
+        ) AS deltas
+        WHERE stats.seller_id = deltas.seller_id AND stats.status = deltas.status;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+TRIGGERS = [
+    ('listing_table_stats_insert', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('listing_table_stats_update', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('listing_table_stats_delete', 'DELETE', 'OLD TABLE AS old_rows'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('seller_listing_stats',
+    sa.Column('seller_id', sa.UUID(), nullable=False),
+    sa.Column('status', postgresql.ENUM(name='listingstatus', create_type=False), nullable=False),
+    sa.Column('listing_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('value_cents', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('last_activity_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['seller_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('seller_id', 'status')
+    )
+    # Blocks listing writes until the triggers exist, so no change is missed between the backfill and the triggers
+    op.execute(sa.text('LOCK TABLE listing_table IN SHARE MODE'))
+    op.execute(sa.text(
+        """
+        INSERT INTO seller_listing_stats (seller_id, status, listing_count, value_cents, last_activity_at)
+        SELECT seller_id, status, count(*), sum(price_cents), max(updated_at)
+        FROM listing_table
+        GROUP BY seller_id, status
+        """
+    ))
+    op.execute(sa.text(APPLY_FUNCTION))
+    for name, event, transition_tables in TRIGGERS:
+        op.execute(sa.text(
+            f"CREATE TRIGGER {name} AFTER {event} ON listing_table REFERENCING {transition_tables} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION seller_listing_stats_apply()"
+        ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _, _ in reversed(TRIGGERS):
+        op.execute(sa.text(f'DROP TRIGGER IF EXISTS {name} ON listing_table'))
+    op.execute(sa.text('DROP FUNCTION IF EXISTS seller_listing_stats_apply()'))
+    op.drop_table('seller_listing_stats')
@@ -0,0 +1,122 @@
+"""added listing facet counts
+
+Revision ID: e2b7c5a13d90
+Revises: c6d2a9e4f183
+Create Date: 2026-10-18 18:21:47.902134
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c5a13d90'
+down_revision: Union[str, Sequence[str], None] = 'c6d2a9e4f183'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# listing_facet_counts holds the number of listings per category, condition, status and price
+# bucket, for the facet counts in app/db/facets.py. It works like seller_listing_stats: filled once
+# with a GROUP BY, then statement-level triggers fold each statement's transition tables into it,
+# +1 for rows in their new combination and -1 in their old one, upserting in key order.
+
+# Same bounds as PRICE_BUCKET_BOUNDS in app/db/facets.py
+PRICE_BUCKET_FUNCTION = """
+CREATE OR REPLACE FUNCTION listing_price_bucket(price_cents integer) RETURNS smallint
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN price_cents < 1000 THEN 0
+        WHEN price_cents < 2500 THEN 1
+        WHEN price_cents < 5000 THEN 2
+        WHEN price_cents < 10000 THEN 3
+        WHEN price_cents < 25000 THEN 4
+        WHEN price_cents < 50000 THEN 5
+        ELSE 6
+    END::smallint
+$$
+"""
+
+UPSERT_COUNTS = """
+        INSERT INTO listing_facet_counts AS counts (category, condition, status, price_bucket, listing_count)
+        SELECT category, condition, status, price_bucket, sum(listings)
+        FROM ({changes}) AS changes
+        GROUP BY category, condition, status, price_bucket
+        ORDER BY category, condition, status, price_bucket
+        ON CONFLICT (category, condition, status, price_bucket) DO UPDATE SET
+            listing_count = counts.listing_count + EXCLUDED.listing_count;
+"""
+
+ADDED_ROWS = "SELECT category, condition, status, listing_price_bucket(price_cents) AS price_bucket, 1 AS listings FROM new_rows"
+REMOVED_ROWS = "SELECT category, condition, status, listing_price_bucket(price_cents), -1 FROM old_rows"
+
+APPLY_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION listing_facet_counts_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {UPSERT_COUNTS.format(changes=ADDED_ROWS)}
+    ELSIF TG_OP = 'UPDATE' THEN
+        {UPSERT_COUNTS.format(changes=f"{ADDED_ROWS} UNION ALL {REMOVED_ROWS}")}
+    ELSE
+        {UPSERT_COUNTS.format(changes=REMOVED_ROWS)}
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+TRIGGERS = [
+    ('listing_table_facets_insert', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('listing_table_facets_update', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('listing_table_facets_delete', 'DELETE', 'OLD TABLE AS old_rows'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('listing_facet_counts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('category', postgresql.ENUM(name='listingcategory', create_type=False), nullable=True),
+    sa.Column('condition', postgresql.ENUM(name='listingcondition', create_type=False), nullable=True),
+    sa.Column('status', postgresql.ENUM(name='listingstatus', create_type=False), nullable=False),
+    sa.Column('price_bucket', sa.SmallInteger(), nullable=False),
+    sa.Column('listing_count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # NULLS NOT DISTINCT (Postgres 15+) lets ON CONFLICT match listings without a category or condition
+    op.create_index(
+        'ix_listing_facet_counts_key',
+        'listing_facet_counts',
+        ['category', 'condition', 'status', 'price_bucket'],
+        unique=True,
+        postgresql_nulls_not_distinct=True,
+    )
+    op.execute(sa.text(PRICE_BUCKET_FUNCTION))
+    # Blocks listing writes until the triggers exist, so no change is missed between the backfill and the triggers
+    op.execute(sa.text('LOCK TABLE listing_table IN SHARE MODE'))
+    op.execute(sa.text(
+        """
+        INSERT INTO listing_facet_counts (category, condition, status, price_bucket, listing_count)
+        SELECT category, condition, status, listing_price_bucket(price_cents), count(*)
+        FROM listing_table
+        GROUP BY 1, 2, 3, 4
+        """
+    ))
+    op.execute(sa.text(APPLY_FUNCTION))
+    for name, event, transition_tables in TRIGGERS:
+        op.execute(sa.text(
+            f"CREATE TRIGGER {name} AFTER {event} ON listing_table REFERENCING {transition_tables} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION listing_facet_counts_apply()"
+        ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _, _ in reversed(TRIGGERS):
+        op.execute(sa.text(f'DROP TRIGGER IF EXISTS {name} ON listing_table'))
+    op.execute(sa.text('DROP FUNCTION IF EXISTS listing_facet_counts_apply()'))
+    op.execute(sa.text('DROP FUNCTION IF EXISTS listing_price_bucket(integer)'))
+    op.drop_index('ix_listing_facet_counts_key', table_name='listing_facet_counts')
+    op.drop_table('listing_facet_counts')
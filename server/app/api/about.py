@@ -1,18 +1,22 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
 from app.core.config import settings
+from app.core.cache import response_cache
 
 router = APIRouter()
 
 IMAGE_BASE_URL = f"{settings.base_url}/static/images/about"
 
 @router.get("/about", tags=["about"])
-async def get_about_images():
+async def get_about_images(request: Request):
     """
     Serves images for the About Us page.
     """
-    return {
-        "Anders": f"{IMAGE_BASE_URL}/anders.jpg",
-        "Alex": f"{IMAGE_BASE_URL}/alex.jpg",
-        "Evelyn": f"{IMAGE_BASE_URL}/evelyn.jpg",
-        "Kali": f"{IMAGE_BASE_URL}/kali.jpg"
-    }
\ No newline at end of file
+    async def produce(_: Response):
+        return {
+            "Anders": f"{IMAGE_BASE_URL}/anders.jpg",
+            "Alex": f"{IMAGE_BASE_URL}/alex.jpg",
+            "Evelyn": f"{IMAGE_BASE_URL}/evelyn.jpg",
+            "Kali": f"{IMAGE_BASE_URL}/kali.jpg"
+        }
+
+    return await response_cache.serve(request, "about", dict[str, str], produce)
\ No newline at end of file
@@ -1,16 +1,26 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from app.db.database import get_async_session
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from app.db.database import get_async_session, get_read_session, get_read_sessionmaker, estimate_table_rows, engine
+from app.db.pool import pool_stats
+from app.db.slow_queries import slow_query_log
 from typing import Annotated, Optional
 from app.models.listing import Listing, ListingStatus
-from app.schemas.user import UserResponse
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.user import UserResponse, UserFilters, BulkModerationRequest, ModerationOutcome
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import select, asc, desc, func, update
 from app.models.user import User
-from app.auth.backend import fastapi_users
-from app.schemas.pagination import Pagination, SortEnum, pagination_params
-from app.schemas.listing import ListingResponse
+from app.auth.backend import current_user_required
+from app.schemas.pagination import Pagination, SortEnum, pagination_params, seller_pagination_params
+from app.schemas.listing import ListingFilters, ListingResponse, SellerStatsResponse
+from app.models.seller_stats import load_seller_stats
 import uuid
-from app.api.listings import get_listings
+from app.api.listings import get_listings, normalize_keyword, parse_listing_filters, apply_listing_filters, parse_fields, listing_projection
+from app.core.cache import listing_counts, user_counts, response_cache
+from app.auth.strategy import forget_user
+from app.db.search import user_search_filter, user_relevance
+from app.core.export import EXPORT_FORMATS, export_response
+from app.core.listing_events import notify_listing_changes
+from app.core.serialization import Projection, USER_FIELD_SPECS, json_response
 
 router = APIRouter()
 
@@ -18,7 +28,7 @@ router = APIRouter()
 async def deactivate_user_listings(
     user_id: uuid.UUID,
     async_session: AsyncSession = Depends(get_async_session),
-    current_user = Depends(fastapi_users.current_user())
+    current_user = Depends(current_user_required)
 ):
     """
     This function deactivates all listings for the selected user, used after banning a user.
@@ -29,9 +39,13 @@ async def deactivate_user_listings(
             update(Listing)
             .where(Listing.seller_id == user_id)
             .values(status=ListingStatus.INACTIVE.value)
+            .returning(Listing.id)
         )
-        await session.execute(statement)
+        result = await session.execute(statement)
+        await notify_listing_changes(session, "updated", result.scalars().all())
         await session.commit()
+        await listing_counts.invalidate()
+        await response_cache.invalidate("listings")
         new_statement = select(Listing).where(Listing.seller_id == user_id)
         result = await session.scalars(new_statement)
         listings = result.all()
@@ -42,7 +56,7 @@ async def deactivate_user_listings(
 async def activate_user_listings(
     user_id: uuid.UUID,
     async_session: AsyncSession = Depends(get_async_session),
-    current_user = Depends(fastapi_users.current_user())
+    current_user = Depends(current_user_required)
 ):
     """
     This function activates all listings for the selected user, used after unbanning a user.
@@ -53,15 +67,70 @@ async def activate_user_listings(
             update(Listing)
             .where(Listing.seller_id == user_id)
             .values(status=ListingStatus.ACTIVE.value)
+            .returning(Listing.id)
         )
-        await session.execute(statement)
+        result = await session.execute(statement)
+        await notify_listing_changes(session, "updated", result.scalars().all())
         await session.commit()
+        await listing_counts.invalidate()
+        await response_cache.invalidate("listings")
         new_statement = select(Listing).where(Listing.seller_id == user_id)
         result = await session.scalars(new_statement)
         listings = result.all()
         return listings
     
 
+def parse_yes_no(name: str, value: Optional[str]) -> Optional[bool]:
+    """
+    This function converts a yes/no query parameter into a boolean.
+    Raises a 400 Bad Request error if the value is neither yes nor no.
+    """
+    if not value:
+        return None
+    if value.lower() == "yes":
+        return True
+    if value.lower() == "no":
+        return False
+    raise HTTPException(status_code=400, detail=f"Invalid {name} value '{value}'.")
+
+def parse_user_filters(
+    is_active: Optional[str] = None,
+    is_admin: Optional[str] = None,
+    is_verified: Optional[str] = None,
+    keyword: Optional[str] = None,
+) -> UserFilters:
+    """
+    This function validates the raw user filter query parameters for the admin user endpoints.
+    """
+    return UserFilters(
+        is_active=parse_yes_no("is_active", is_active),
+        is_admin=parse_yes_no("is_admin", is_admin),
+        is_verified=parse_yes_no("is_verified", is_verified),
+        keyword=normalize_keyword(keyword),
+    )
+
+def apply_user_filters(statement, filters: UserFilters):
+    """
+    This function adds the WHERE clauses for a validated set of user filters to a statement.
+    """
+    # Filtering users by active status
+    if filters.is_active is not None:
+        statement = statement.where(User.is_active == filters.is_active)
+
+    # Filtering users by admin status
+    if filters.is_admin is not None:
+        statement = statement.where(User.is_superuser == filters.is_admin)
+
+    # Filtering users by verification status
+    if filters.is_verified is not None:
+        statement = statement.where(User.is_verified == filters.is_verified)
+
+    # Filtering users by keyword in first name or last name, including close misspellings
+    if filters.keyword:
+        statement = statement.filter(user_search_filter(filters.keyword))
+
+    return statement
+
 def check_admin(user):
     """
     This function checks if the current user is an admin and raises a 403 Forbidden error if not
@@ -74,8 +143,8 @@ def check_admin(user):
 async def get_listings_admin(
     # in query parameters, specify page_num to indicate the page number and card_num to indicate the number of cards for pagination
     pagination: Annotated[Pagination, Depends(pagination_params)],
-    async_session: AsyncSession = Depends(get_async_session),
-    sort_by: Optional[str] = Query("updated_at", description="Sort field: price, created_at, updated_at"),
+    async_session: AsyncSession = Depends(get_read_session),
+    sort_by: Optional[str] = Query("updated_at", description="Sort field: price, created_at, updated_at, relevance"),
     order: Optional[str] = Query(SortEnum.DESC.value, description="Sort order: asc or desc"),
 
     # Filters
@@ -85,13 +154,19 @@ async def get_listings_admin(
     min_price: Optional[int] = Query(None, ge=0),
     max_price: Optional[int] = Query(None, ge=0),
     keyword: Optional[str] = Query(None, description="Keyword to search in title or description"),
-    current_user = Depends(fastapi_users.current_user())
+    cursor: Optional[str] = Query(None, description="Opaque keyset cursor from the X-Next-Cursor or X-Prev-Cursor header"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to include, all fields if not given"),
+    description_length: Optional[int] = Query(None, ge=1, description="Truncate descriptions to this many characters"),
+    response: Response = None,
+    current_user = Depends(current_user_required)
 ):
     """
     This route retrieves listings for the administrator Listings Management page.
+    Only the columns behind the requested fields are selected.
     """
     check_admin(current_user)
-    return await get_listings(
+    projection = listing_projection(False, fields, description_length)
+    listings = await get_listings(
         pagination=pagination,
         async_session=async_session,
         sort_by=sort_by,
@@ -101,28 +176,141 @@ async def get_listings_admin(
         condition=condition,
         min_price=min_price,
         max_price=max_price,
-        keyword=keyword
+        keyword=keyword,
+        cursor=cursor,
+        response=response,
+        projection=projection
+    )
+    return json_response(projection.dump(listings), response)
+
+def parse_export_format(export_format: str) -> str:
+    """
+    This function validates the format query parameter of the export endpoints.
+    Raises a 400 Bad Request error if the format is not supported.
+    """
+    export_format = export_format.lower()
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format value '{export_format}'. Must be 'ndjson' or 'csv'.")
+    return export_format
+
+def listing_export_statement(filters: ListingFilters):
+    """
+    This function builds the query behind the listing export, every listing matching the filters
+    ordered by id, with the seller's email.
+    """
+    statement = (
+        select(
+            Listing.id,
+            Listing.seller_id,
+            User.email.label("seller_email"),
+            Listing.title,
+            Listing.description,
+            Listing.price_cents,
+            Listing.status,
+            Listing.category,
+            Listing.condition,
+            Listing.image,
+            Listing.created_at,
+            Listing.updated_at,
+        )
+        .join(User, Listing.seller_id == User.id)
+        .order_by(Listing.id)
     )
+    return apply_listing_filters(statement, filters)
+
+@router.get("/admin/listings/export", tags=["admin"])
+async def export_listings(
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_read_sessionmaker),
+    current_user = Depends(current_user_required),
+    export_format: str = Query("ndjson", alias="format", description="Export format: ndjson or csv"),
+
+    # Filters, matching get_listings_admin
+    status: Optional[str] = Query(None, description="Status value (matching ListingStatus enum)"),
+    category: Optional[str] = Query(None, description="Category value (matching ListingCategory enum)"),
+    condition: Optional[str] = Query(None, description="Condition value (matching ListingCondition enum)"),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    keyword: Optional[str] = Query(None, description="Keyword to search in title or description"),
+):
+    """
+    This route streams every listing matching the admin listing filters as NDJSON or CSV, for admin only.
+    Rows are ordered by id and include the seller's email.
+    """
+    check_admin(current_user)
+    export_format = parse_export_format(export_format)
+    filters = parse_listing_filters(status, category, condition, min_price, max_price, keyword)
+    return export_response(sessionmaker, listing_export_statement(filters), export_format, "listings")
+
+@router.get("/admin/users/export", tags=["admin"])
+async def export_users(
+    sessionmaker: async_sessionmaker[AsyncSession] = Depends(get_read_sessionmaker),
+    current_user = Depends(current_user_required),
+    export_format: str = Query("ndjson", alias="format", description="Export format: ndjson or csv"),
+
+    # Filters, matching get_users
+    is_active: Optional[str] = Query(None, description="If the user is active, matches with yes or no"),
+    is_admin: Optional[str] = Query(None, description="If the user is admin or user, matches with yes or no"),
+    is_verified: Optional[str] = Query(None, description="If the user is verified, matches with yes or no"),
+    keyword: Optional[str] = Query(None, description="Keyword to search for user first name or last name"),
+):
+    """
+    This route streams every user matching the admin user filters as NDJSON or CSV, for admin only.
+    Password hashes are never included.
+    """
+    check_admin(current_user)
+    export_format = parse_export_format(export_format)
+    filters = parse_user_filters(is_active, is_admin, is_verified, keyword)
+    statement = select(
+        User.id,
+        User.email,
+        User.first_name,
+        User.last_name,
+        User.phone_number,
+        User.is_active,
+        User.is_superuser,
+        User.is_verified,
+        User.is_banned,
+    ).order_by(User.id)
+    statement = apply_user_filters(statement, filters)
+    return export_response(sessionmaker, statement, export_format, "users")
 
 @router.get("/admin/users/total", tags=["admin"])
 async def get_total_users(
-    async_session: AsyncSession = Depends(get_async_session),
-    current_user = Depends(fastapi_users.current_user())
+    async_session: AsyncSession = Depends(get_read_session),
+    current_user = Depends(current_user_required),
+
+    # Filters, matching get_users
+    is_active: Optional[str] = Query(None, description="If the user is active, matches with yes or no"),
+    is_admin: Optional[str] = Query(None, description="If the user is admin or user, matches with yes or no"),
+    is_verified: Optional[str] = Query(None, description="If the user is verified, matches with yes or no"),
+    keyword: Optional[str] = Query(None, description="Keyword to search for user first name or last name"),
+    estimate: bool = Query(False, description="Return the planner's row estimate instead of an exact count when no filters are set")
 ):
     """
-    This route retrieves the total number of users in the database.
+    This route retrieves the total number of users matching the same filters as GET /admin/users.
     It can be used for paginating users on the admin User Management page.
+    Exact counts are cached per filter set for a short time and cleared when users change.
     """
     check_admin(current_user)
+    filters = parse_user_filters(is_active, is_admin, is_verified, keyword)
     async with async_session as session:
-        total = await session.scalar(select(func.count(User.id)))
-        return {"total": total}
+        if estimate and filters == UserFilters():
+            total = await estimate_table_rows(session, User.__tablename__)
+            if total is not None:
+                return {"total": total, "estimated": True}
+
+        total = user_counts.get(filters)
+        if total is None:
+            statement = apply_user_filters(select(func.count()).select_from(User), filters)
+            total = await session.scalar(statement)
+            user_counts.set(filters, total)
+        return {"total": total, "estimated": False}
     
 @router.get("/admin/users/{user_id}", tags=["admin"], response_model=UserResponse)
 async def get_user_by_id(
     user_id: uuid.UUID,
-    async_session: AsyncSession = Depends(get_async_session),
-    current_user = Depends(fastapi_users.current_user())
+    async_session: AsyncSession = Depends(get_read_session),
+    current_user = Depends(current_user_required)
 ):
     """
     This route retrieves a user by their ID for admin use only.
@@ -140,22 +328,58 @@ async def get_user_by_id(
 @router.get("/admin/users/{user_id}/listings", tags=["admin"], response_model=list[ListingResponse])
 async def get_user_listings_by_id(
     user_id: uuid.UUID,
-    async_session: AsyncSession = Depends(get_async_session),
-    current_user = Depends(fastapi_users.current_user())
+    pagination: Annotated[Pagination, Depends(seller_pagination_params)],
+    async_session: AsyncSession = Depends(get_read_session),
+    sort_by: Optional[str] = Query("updated_at", description="Sort field: price, created_at, updated_at"),
+    order: Optional[str] = Query(SortEnum.DESC.value, description="Sort order: asc or desc"),
+    status: Optional[str] = Query(None, description="Status value (matching ListingStatus enum)"),
+    cursor: Optional[str] = Query(None, description="Opaque keyset cursor from the X-Next-Cursor or X-Prev-Cursor header"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to include, all fields if not given"),
+    description_length: Optional[int] = Query(None, ge=1, description="Truncate descriptions to this many characters"),
+    response: Response = None,
+    current_user = Depends(current_user_required)
+):
+    """
+    This route retrieves one page of the listings for a given user ID for admin use only,
+    optionally filtered by status. Pages work like GET /admin/listings.
+    """
+    check_admin(current_user)
+    projection = listing_projection(False, fields, description_length)
+    listings = await get_listings(
+        pagination=pagination,
+        async_session=async_session,
+        sort_by=sort_by,
+        order=order,
+        status=status,
+        category=None,
+        condition=None,
+        min_price=None,
+        max_price=None,
+        keyword=None,
+        cursor=cursor,
+        response=response,
+        projection=projection,
+        seller_id=user_id
+    )
+    return json_response(projection.dump(listings), response)
+
+@router.get("/admin/users/{user_id}/stats", tags=["admin"], response_model=SellerStatsResponse)
+async def get_user_stats_by_id(
+    user_id: uuid.UUID,
+    async_session: AsyncSession = Depends(get_read_session),
+    current_user = Depends(current_user_required)
 ):
     """
-    This route retrieves all the listings for a given user ID for admin use only.
+    This route retrieves the listing counts by status, active listing value and last activity
+    of a given user ID for admin use only.
     """
     check_admin(current_user)
     async with async_session as session:
-        statement = select(Listing).where(Listing.seller_id == user_id)
-        result = await session.scalars(statement)
-        listings = result.all()
-        return listings
+        return await load_seller_stats(session, user_id)
 
 def check_ban_request(
     user: User,
-    current_user = Depends(fastapi_users.current_user())
+    current_user = Depends(current_user_required)
 ):
     """
     This function determines if the ban request is valid.
@@ -171,7 +395,7 @@ def check_ban_request(
 async def ban_user_by_id(
     user_id: uuid.UUID,
     async_session: AsyncSession = Depends(get_async_session),
-    current_user = Depends(fastapi_users.current_user()),
+    current_user = Depends(current_user_required),
 ):
     """
     This function bans a user using their id, for admin only.
@@ -186,13 +410,15 @@ async def ban_user_by_id(
         user.is_banned = True
         await async_session.commit()
         await async_session.refresh(user)
+        await response_cache.invalidate("listings")
+        await forget_user(user.id)
     return user
 
 @router.post("/admin/users/{user_id}/unban", tags=["admin"], response_model=UserResponse)
 async def unban_user_by_id(
     user_id: uuid.UUID,
     async_session: AsyncSession = Depends(get_async_session),
-    current_user = Depends(fastapi_users.current_user()),
+    current_user = Depends(current_user_required),
 ):
     """
     This function reinstates a user's account using their id, for admin only.
@@ -206,14 +432,123 @@ async def unban_user_by_id(
         user.is_banned = False
         await async_session.commit()
         await async_session.refresh(user)
+        await response_cache.invalidate("listings")
+        await forget_user(user.id)
     return user
     
+async def moderate_users(
+    session: AsyncSession,
+    current_user,
+    body: BulkModerationRequest,
+    ban: bool,
+) -> list[ModerationOutcome]:
+    """
+    This function bans or unbans every user selected by a bulk moderation request in one transaction.
+    The selected users are locked first so the outcomes cannot race with other moderation requests,
+    then one UPDATE ... RETURNING changes the users and another changes their listings.
+    Ban requests go through check_ban_request, so admins still cannot ban themselves or other admins.
+    """
+    statement = select(User.id, User.is_superuser, User.is_banned)
+    if body.user_ids is not None:
+        statement = statement.where(User.id.in_(body.user_ids))
+    else:
+        # The keyword was normalized when the body was validated
+        statement = apply_user_filters(statement, body.filters)
+    rows = (await session.execute(statement.with_for_update())).all()
+
+    outcomes = {}
+    changed = []
+    for row in rows:
+        if ban:
+            try:
+                check_ban_request(row, current_user)
+            except HTTPException as exc:
+                outcomes[row.id] = ModerationOutcome(user_id=row.id, outcome="rejected", detail=exc.detail)
+                continue
+        if row.is_banned == ban:
+            outcomes[row.id] = ModerationOutcome(user_id=row.id, outcome="unchanged")
+        else:
+            outcomes[row.id] = ModerationOutcome(user_id=row.id, outcome="banned" if ban else "unbanned")
+            changed.append(row.id)
+    for user_id in body.user_ids or []:
+        if user_id not in outcomes:
+            outcomes[user_id] = ModerationOutcome(user_id=user_id, outcome="not_found")
+
+    if changed:
+        result = await session.execute(update(User).where(User.id.in_(changed)).values(is_banned=ban).returning(User.id))
+        changed = result.scalars().all()
+
+    # Listings only follow users whose state changed. Users that already were banned or unbanned keep
+    # their listings as they are, which includes listings an admin deactivated on their own.
+    if body.include_listings and changed:
+        old_status, new_status = (ListingStatus.ACTIVE, ListingStatus.INACTIVE) if ban else (ListingStatus.INACTIVE, ListingStatus.ACTIVE)
+        result = await session.execute(
+            update(Listing)
+            .where(Listing.seller_id.in_(changed), Listing.status == old_status)
+            .values(status=new_status)
+            .returning(Listing.id, Listing.seller_id)
+        )
+        changed_listings = result.all()
+        for listing_id, seller_id in changed_listings:
+            outcomes[seller_id].listing_ids.append(listing_id)
+        await notify_listing_changes(session, "updated", [listing_id for listing_id, _ in changed_listings])
+
+    if body.dry_run:
+        await session.rollback()
+        return list(outcomes.values())
+
+    await session.commit()
+    if not changed:
+        return list(outcomes.values())
+    if body.include_listings:
+        await listing_counts.invalidate()
+    await response_cache.invalidate("listings")
+    await forget_user(*changed)
+    return list(outcomes.values())
+
+def stream_outcomes(outcomes: list[ModerationOutcome]) -> StreamingResponse:
+    """
+    This function streams bulk moderation outcomes back as newline-delimited JSON, one user per line.
+    """
+    return StreamingResponse(
+        (outcome.model_dump_json() + "\n" for outcome in outcomes),
+        media_type="application/x-ndjson",
+    )
+
+@router.post("/admin/users/ban", tags=["admin"])
+async def ban_users(
+    body: BulkModerationRequest,
+    async_session: AsyncSession = Depends(get_async_session),
+    current_user = Depends(current_user_required),
+):
+    """
+    This route bans many users at once, selected by ID or by the admin user filters, for admin only.
+    Their active listings are deactivated in the same transaction unless include_listings is false.
+    """
+    check_admin(current_user)
+    outcomes = await moderate_users(async_session, current_user, body, ban=True)
+    return stream_outcomes(outcomes)
+
+@router.post("/admin/users/unban", tags=["admin"])
+async def unban_users(
+    body: BulkModerationRequest,
+    async_session: AsyncSession = Depends(get_async_session),
+    current_user = Depends(current_user_required),
+):
+    """
+    This route reinstates many users at once, selected by ID or by the admin user filters, for admin only.
+    Their inactive listings are reactivated in the same transaction unless include_listings is false.
+    """
+    check_admin(current_user)
+    outcomes = await moderate_users(async_session, current_user, body, ban=False)
+    return stream_outcomes(outcomes)
+    
 @router.get("/admin/users", tags=["admin"], response_model=list[UserResponse])
 async def get_users(
     # in query parameters, specify page_num to indicate the page number and card_num to indicate the number of cards for pagination
     pagination: Annotated[Pagination, Depends(pagination_params)],
-    current_user = Depends(fastapi_users.current_user()),
-    async_session: AsyncSession = Depends(get_async_session),
+    current_user = Depends(current_user_required),
+    async_session: AsyncSession = Depends(get_read_session),
     sort_by: Optional[str] = Query(None, description="Sort field: first name, last name, phone number, email"),
     order: Optional[str] = Query(SortEnum.ASC.value, description="Sort order: asc or desc"),
 
@@ -221,13 +556,16 @@ async def get_users(
     is_active: Optional[str] = Query(None, description="If the user is active, matches with yes or no"),
     is_admin: Optional[str] = Query(None, description="If the user is admin or user, matches with yes or no"),
     is_verified: Optional[str] = Query(None, description="If the user is verified, matches with yes or no"),
-    keyword: Optional[str] = Query(None, description="Keyword to search for user first name or last name")
+    keyword: Optional[str] = Query(None, description="Keyword to search for user first name or last name"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to include, all fields if not given")
 
 ):
     """
     This route retrieves all of the users in the database for the admin User Management page.
+    Only the columns behind the requested fields are selected, so password hashes are never read.
     """
     check_admin(current_user)
+    projection = Projection(USER_FIELD_SPECS, parse_fields(fields, USER_FIELD_SPECS))
     sort_fields = {
         "first_name": User.first_name,
         "last_name": User.last_name,
@@ -244,46 +582,17 @@ async def get_users(
     if sort_order not in SortEnum:
         raise HTTPException(status_code=400, detail="Invalid order value. Must be 'asc' or 'desc'.")
     
+    filters = parse_user_filters(is_active, is_admin, is_verified, keyword)
+
     # Accessing the database and retrieving the users.
     async with async_session as session:
-        statement = select(User)
-
-        # Filtering users by active status
-        if is_active:
-            if is_active.lower() == "yes":
-                active_bool = True
-            elif is_active.lower() == "no":
-                active_bool = False
-            else:
-                raise HTTPException(status_code=400, detail=f"Invalid is_active value '{is_active}'.")
-            statement = statement.where(User.is_active == active_bool)
-
-        # Filtering users by admin status
-        if is_admin:
-            if is_admin.lower() == "yes":
-                admin_bool = True
-            elif is_admin.lower() == "no":
-                admin_bool = False
-            else:
-                raise HTTPException(status_code=400, detail=f"Invalid is_admin value '{is_admin}'.")
-            statement = statement.where(User.is_superuser == admin_bool)
-        
-        # Filtering users by verification status
-        if is_verified:
-            if is_verified.lower() == "yes":
-                verified_bool = True
-            elif is_verified.lower() == "no":
-                verified_bool = False
-            else:
-                raise HTTPException(status_code=400, detail=f"Invalid is_verified value '{is_verified}'.")
-            statement = statement.where(User.is_verified == verified_bool)
-
-        # Filtering users by keyword in first name or last name
-        if keyword:
-            search_filter = f"%{keyword}%"
-            # Source: https://stackoverflow.com/questions/20363836/postgresql-ilike-query-with-sqlalchemy
-            # Source: https://stackoverflow.com/questions/7942547/using-or-in-sqlalchemy
-            statement = statement.filter(User.first_name.ilike(search_filter) | User.last_name.ilike(search_filter))
+        statement = apply_user_filters(select(*projection.columns()), filters)
+
+        # Without an explicit sort field, keyword searches list the closest name matches first
+        if filters.keyword and not sort_by:
+            order_clause = user_relevance(filters.keyword)
+        else:
+            order_clause = desc(sort_column) if sort_order == SortEnum.DESC.value else asc(sort_column)
 
         statement = (
             statement.limit(pagination.card_num)
@@ -292,9 +601,43 @@ async def get_users(
                 if pagination.page_num == 1
                 else (pagination.page_num - 1) * pagination.card_num
             )
-            .order_by(desc(sort_column) if sort_order == SortEnum.DESC.value else asc(sort_column))
+            .order_by(order_clause)
         )
 
-        result = await session.scalars(statement)
+        result = await session.execute(statement)
         users = result.all()
-        return users
\ No newline at end of file
+        return json_response(projection.dump(users))
+
+@router.get("/admin/db/pool", tags=["admin"])
+async def get_pool_stats(
+    current_user = Depends(current_user_required)
+):
+    """
+    This route returns the database connection pool state and metrics for this worker.
+    Each uvicorn worker has its own pool, so repeated calls may be answered by different workers.
+    """
+    check_admin(current_user)
+    return pool_stats(engine.sync_engine)
+
+@router.get("/admin/db/slow-queries", tags=["admin"])
+async def get_slow_queries(
+    current_user = Depends(current_user_required)
+):
+    """
+    This route returns the slow query log of this worker: the statements slower than
+    settings.slow_query_threshold_ms, with their route, parameter shapes and sampled plans,
+    plus a summary per route and statement. The filter endpoints build different SQL for each
+    combination of filters, so the summary shows which combinations need an index.
+    """
+    check_admin(current_user)
+    return slow_query_log.snapshot()
+
+@router.delete("/admin/db/slow-queries", tags=["admin"])
+async def clear_slow_queries(
+    current_user = Depends(current_user_required)
+):
+    """
+    This route empties the slow query log of this worker, e.g. after adding an index.
+    """
+    check_admin(current_user)
+    return {"cleared": slow_query_log.clear()}
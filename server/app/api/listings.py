@@ -1,16 +1,41 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, UploadFile, Form, File
-import shutil
+import uuid
+from datetime import datetime
+from pydantic_core import to_json
+from fastapi import APIRouter, Depends, Query, HTTPException, UploadFile, Form, File, Request, Response
+from fastapi.responses import StreamingResponse
 from pathlib import Path
-from app.db.database import get_async_session
+from app.db.database import get_async_session, get_read_session, estimate_table_rows
 from typing import Annotated, Optional
 from app.models.listing import Listing, ListingCategory, ListingCondition, ListingStatus
-from app.schemas.listing import UserListingResponse
+from app.schemas.listing import UserListingResponse, ListingFilters, ListingFacetsResponse, ListingImportResponse, ListingChangesResponse, enum_label, normalize_keyword
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, asc, desc, func
+from sqlalchemy import select, asc, desc, func, tuple_
 from sqlalchemy.orm import selectinload
 from app.models.user import User
-from app.auth.backend import fastapi_users
-from app.schemas.pagination import Pagination, SortEnum, pagination_params
+from app.db.search import listing_search_filter, listing_relevance
+from app.db.facets import count_facets
+from app.db.listing_sync import changes_statement, latest_listing_update, next_sync_token, not_modified, pending_change_statement, validator_headers
+from app.auth.backend import current_user_required
+from app.core.config import settings
+from app.core.cache import cache_key, listing_counts, response_cache
+from app.core.uploads import stage_upload
+from app.core.images import generate_variants, LISTING_VARIANTS
+from app.core.listing_import import import_listings, manifest_format
+from app.core.listing_events import listing_events, notify_listing_changes
+from app.core.serialization import FieldSpec, Projection, USER_LISTING_PROJECTION, listing_field_specs
+from app.core.instrumentation import measure_serialization
+from app.schemas.pagination import (
+    Pagination,
+    SortEnum,
+    Cursor,
+    CursorDirection,
+    pagination_params,
+    encode_cursor,
+    decode_cursor,
+    SyncToken,
+    encode_sync_token,
+    decode_sync_token,
+)
 
 router = APIRouter()
 
@@ -18,19 +43,109 @@ router = APIRouter()
 BASE_DIR = Path(__file__).resolve().parents[2]  # points to server/
 LISTINGS_DIR = BASE_DIR / "app" / "static" / "images" / "listings"
 
-# Source for utility function: https://stackoverflow.com/questions/63580229/how-to-save-uploadfile-in-fastapi
-def save_upload_file(upload_file: UploadFile) -> None:
-    try:
-        with open(f"{LISTINGS_DIR}/{upload_file.filename}", "wb") as buffer:
-            shutil.copyfileobj(upload_file.file, buffer)
-    finally:
-        upload_file.file.close()
+def parse_listing_filters(
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    condition: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    keyword: Optional[str] = None,
+    seller_id: Optional[uuid.UUID] = None,
+) -> ListingFilters:
+    """
+    This function validates the raw listing filter query parameters.
+    Raises a 400 Bad Request error if an enum value is invalid.
+    """
+    # Filter by status
+    status_enum = None
+    if status:
+        try:
+            status_enum = ListingStatus[status.upper()]
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Invalid status value '{status}'.")
+
+    # Filter by category
+    category_enum = None
+    if category:
+        try:
+            category_enum = ListingCategory[category.upper()]
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Invalid category value '{category}'.")
+
+    # Filter by condition
+    condition_enum = None
+    if condition:
+        try:
+            condition_enum = ListingCondition[condition.upper()]
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Invalid condition value '{condition}'.")
+
+    return ListingFilters(
+        status=status_enum,
+        category=category_enum,
+        condition=condition_enum,
+        min_price=min_price,
+        max_price=max_price,
+        keyword=normalize_keyword(keyword),
+        seller_id=seller_id,
+    )
+
+def apply_listing_filters(statement, filters: ListingFilters):
+    """
+    This function adds the WHERE clauses for a validated set of listing filters to a statement.
+    """
+    if filters.seller_id:
+        statement = statement.where(Listing.seller_id == filters.seller_id)
+
+    if filters.status:
+        statement = statement.where(Listing.status == filters.status)
+
+    if filters.category:
+        statement = statement.where(Listing.category == filters.category)
+
+    if filters.condition:
+        statement = statement.where(Listing.condition == filters.condition)
+
+    # Filter by price range
+    if filters.min_price is not None:
+        statement = statement.where(Listing.price_cents >= filters.min_price)
+
+    if filters.max_price is not None:
+        statement = statement.where(Listing.price_cents <= filters.max_price)
+
+    # Filter using search keywords in title and description (full-text with a trigram fallback)
+    if filters.keyword:
+        statement = statement.filter(listing_search_filter(filters.keyword))
+
+    return statement
+
+def parse_fields(fields: Optional[str], specs: dict[str, FieldSpec]) -> Optional[list[str]]:
+    """
+    This function validates the fields query parameter, a comma-separated list of response fields.
+    Returns None when it is not given, meaning every field.
+    Raises a 400 Bad Request error if a field name is unknown.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    for name in names:
+        if name not in specs:
+            raise HTTPException(status_code=400, detail=f"Invalid fields value '{name}'. Must be a comma-separated list of: {', '.join(specs)}.")
+    return names or None
+
+def listing_projection(with_seller: bool, fields: Optional[str], description_length: Optional[int]) -> Projection:
+    """
+    This function builds the projection for the fields and description_length query parameters
+    of the listing list endpoints.
+    """
+    specs = listing_field_specs(with_seller, description_length)
+    return Projection(specs, parse_fields(fields, specs))
 
 async def get_listings(
     # in query parameters, specify page_num to indicate the page number and card_num to indicate the number of cards for pagination
     pagination: Annotated[Pagination, Depends(pagination_params)],
-    async_session: AsyncSession = Depends(get_async_session),
-    sort_by: Optional[str] = Query("updated_at", description="Sort field: price, created_at, updated_at"),
+    async_session: AsyncSession = Depends(get_read_session),
+    sort_by: Optional[str] = Query("updated_at", description="Sort field: price, created_at, updated_at, relevance"),
     order: Optional[str] = Query(SortEnum.DESC.value, description="Sort order: asc or desc"),
 
     # Filters
@@ -39,11 +154,22 @@ async def get_listings(
     condition: Optional[str] = Query(None, description="Condition value (matching ListingCondition enum)"),
     min_price: Optional[int] = Query(None, ge=0),
     max_price: Optional[int] = Query(None, ge=0),
-    keyword: Optional[str] = Query(None, description="Keyword to search in title or description")
+    keyword: Optional[str] = Query(None, description="Keyword to search in title or description"),
+    cursor: Optional[str] = Query(None, description="Opaque keyset cursor from the X-Next-Cursor or X-Prev-Cursor header"),
+    response: Optional[Response] = None,
+    projection: Optional[Projection] = None,
+    seller_id: Optional[uuid.UUID] = None
 ):
     """
     This function contains the core logic for retrieving listings.
     It is called by the standard and admin get_listings endpoints.
+    With a projection, only the columns for its fields are selected and listings are returned
+    as row tuples instead of ORM objects, for encoding with the projection.
+
+    Pages are selected with page_num (OFFSET) unless a cursor is given, in which case
+    the page starts right after (or before) the row the cursor points at. Cursors for
+    the neighbouring pages are returned in the X-Next-Cursor and X-Prev-Cursor headers.
+    A seller_id limits the listings to one seller, for the profile and admin user pages.
     """
     sort_fields = {
         "id": Listing.title,
@@ -54,109 +180,296 @@ async def get_listings(
 
     sort_column = sort_fields.get(sort_by, Listing.updated_at)
     sort_order = order.lower()
+    by_relevance = sort_by == "relevance"
 
     # Raise exceptions if sort fields are invalid
-    if sort_by and sort_by not in sort_fields:
-        raise HTTPException(status_code=400, detail=f"Invalid sort_by value '{sort_by}'. Must be 'price', 'created_at', or 'updated_at'.")
+    if sort_by and sort_by not in sort_fields and not by_relevance:
+        raise HTTPException(status_code=400, detail=f"Invalid sort_by value '{sort_by}'. Must be 'price', 'created_at', 'updated_at', or 'relevance'.")
+
+    # Relevance is only defined for keyword searches, and its float score cannot be used as a keyset cursor
+    if by_relevance and not normalize_keyword(keyword):
+        raise HTTPException(status_code=400, detail="Sorting by relevance requires a keyword.")
+    if by_relevance and cursor:
+        raise HTTPException(status_code=400, detail="Cursor pagination is not supported when sorting by relevance.")
 
     # Raise exceptions if sort order is invalid
     if sort_order not in SortEnum:
         raise HTTPException(status_code=400, detail="Invalid order value. Must be 'asc' or 'desc'.")
     
+    filters = parse_listing_filters(status, category, condition, min_price, max_price, keyword, seller_id)
+
     # Retrieve the listings from the database
     async with async_session as session:
-        statement = select(Listing).options(selectinload(Listing.seller))
-
-        # Filter by status
-        if status:
-            try:
-                status_enum = ListingStatus[status.upper()]
-            except KeyError:
-                raise HTTPException(status_code=400, detail=f"Invalid status value '{status}'.")
-            statement = statement.where(Listing.status == status_enum)
+        if projection is not None:
+            # The sort column and id are always selected because the keyset cursors are built from them
+            statement = select(*projection.columns(sort_column, Listing.id))
+            if projection.needs_seller:
+                statement = statement.join(User, Listing.seller_id == User.id)
+        else:
+            statement = select(Listing).options(selectinload(Listing.seller))
+        statement = apply_listing_filters(statement, filters)
 
-        # Filter by category
-        if category:
+        # Listing.id breaks ties so that rows sharing a sort value keep a stable order across pages
+        ascending = sort_order == SortEnum.ASC.value
+        if cursor:
             try:
-                category_enum = ListingCategory[category.upper()]
-            except KeyError:
-                raise HTTPException(status_code=400, detail=f"Invalid category value '{category}'.")
-            statement = statement.where(Listing.category == category_enum)
+                page_cursor = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor value.")
+            if page_cursor.sort_by != (sort_by or "updated_at") or page_cursor.order != sort_order:
+                raise HTTPException(status_code=400, detail="Cursor does not match the requested sort_by and order.")
 
-        # Filter by condition
-        if condition:
-            try:
-                condition_enum = ListingCondition[condition.upper()]
-            except KeyError:
-                raise HTTPException(status_code=400, detail=f"Invalid condition value '{condition}'.")
-            statement = statement.where(Listing.condition == condition_enum)
-
-        # Filter by price range
-        if min_price is not None:
-            statement = statement.where(Listing.price_cents >= min_price)
-
-        if max_price is not None:
-            statement = statement.where(Listing.price_cents <= max_price)
-
-        # Filter using search keywords in title and description
-        if keyword:
-            search_filter = f"%{keyword}%"
-            # Source: https://stackoverflow.com/questions/20363836/postgresql-ilike-query-with-sqlalchemy
-            # Source: https://stackoverflow.com/questions/7942547/using-or-in-sqlalchemy
-            statement = statement.filter(Listing.title.ilike(search_filter) | Listing.description.ilike(search_filter))
-
-        statement = (
-            statement.limit(pagination.card_num)
-            .offset(
+            # Walking backwards is the same query with the sort order flipped, reversed afterwards
+            backwards = page_cursor.direction == CursorDirection.PREV
+            scan_ascending = ascending != backwards
+            boundary = tuple_(sort_column, Listing.id)
+            cursor_key = tuple_(page_cursor.value, page_cursor.id)
+            statement = statement.where(boundary > cursor_key if scan_ascending else boundary < cursor_key)
+        else:
+            backwards = False
+            scan_ascending = ascending
+            statement = statement.offset(
                 pagination.page_num - 1
                 if pagination.page_num == 1
                 else (pagination.page_num - 1) * pagination.card_num
             )
-            .order_by(asc(sort_column) if sort_order == SortEnum.ASC.value else desc(sort_column))
-        )
 
-        result = await session.scalars(statement)
-        listings = result.all()
+        # One extra row is fetched to find out whether another page exists in the scan direction
+        if by_relevance:
+            order_clauses = [*listing_relevance(filters.keyword), desc(Listing.id)]
+        else:
+            order_clauses = [
+                asc(sort_column) if scan_ascending else desc(sort_column),
+                asc(Listing.id) if scan_ascending else desc(Listing.id),
+            ]
+        statement = statement.limit(pagination.card_num + 1).order_by(*order_clauses)
+
+        result = await (session.scalars(statement) if projection is None else session.execute(statement))
+        listings = list(result.all())
+        has_more = len(listings) > pagination.card_num
+        listings = listings[:pagination.card_num]
+        if backwards:
+            listings.reverse()
+
+        if response is not None and listings and not by_relevance:
+            has_next = has_more if not backwards else True
+            has_prev = has_more if backwards else (cursor is not None or pagination.page_num > 1)
+            sort_attr = sort_column.key
+            if has_next:
+                response.headers["X-Next-Cursor"] = encode_cursor(Cursor(
+                    sort_by=sort_by or "updated_at",
+                    order=sort_order,
+                    value=getattr(listings[-1], sort_attr),
+                    id=listings[-1].id,
+                    direction=CursorDirection.NEXT,
+                ))
+            if has_prev:
+                response.headers["X-Prev-Cursor"] = encode_cursor(Cursor(
+                    sort_by=sort_by or "updated_at",
+                    order=sort_order,
+                    value=getattr(listings[0], sort_attr),
+                    id=listings[0].id,
+                    direction=CursorDirection.PREV,
+                ))
         return listings
     
 @router.get("/listings/total", tags=["listings"])
 async def get_total_listings(
-    async_session: AsyncSession = Depends(get_async_session)
+    async_session: AsyncSession = Depends(get_read_session),
+
+    # Filters, matching get_listings
+    status: Optional[str] = Query(None, description="Status value (matching ListingStatus enum)"),
+    category: Optional[str] = Query(None, description="Category value (matching ListingCategory enum)"),
+    condition: Optional[str] = Query(None, description="Condition value (matching ListingCondition enum)"),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    keyword: Optional[str] = Query(None, description="Keyword to search in title or description"),
+    estimate: bool = Query(False, description="Return the planner's row estimate instead of an exact count when no filters are set")
 ):
     """
-    The purpose of this route is to get the total number of listings in the database
-    for pagination.
+    The purpose of this route is to get the total number of listings matching the same filters
+    as GET /listings, for pagination.
+    Exact counts are cached per filter set for a short time and cleared when listings change.
     """
+    filters = parse_listing_filters(status, category, condition, min_price, max_price, keyword)
     async with async_session as session:
-        total = await session.scalar(select(func.count(Listing.id)))
-        return {"total": total}
+        if estimate and filters == ListingFilters():
+            total = await estimate_table_rows(session, Listing.__tablename__)
+            if total is not None:
+                return {"total": total, "estimated": True}
+
+        total = listing_counts.get(filters)
+        if total is None:
+            statement = apply_listing_filters(select(func.count()).select_from(Listing), filters)
+            total = await session.scalar(statement)
+            listing_counts.set(filters, total)
+        return {"total": total, "estimated": False}
+
+@router.get("/listings/facets", tags=["listings"], response_model=ListingFacetsResponse)
+async def get_listing_facets(
+    request: Request,
+    async_session: AsyncSession = Depends(get_read_session),
+
+    # Filters, matching get_listings
+    status: Optional[str] = Query(None, description="Status value (matching ListingStatus enum)"),
+    category: Optional[str] = Query(None, description="Category value (matching ListingCategory enum)"),
+    condition: Optional[str] = Query(None, description="Condition value (matching ListingCondition enum)"),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    keyword: Optional[str] = Query(None, description="Keyword to search in title or description"),
+):
+    """
+    The purpose of this route is to get the number of listings per status, category, condition and
+    price range that match the same filters as GET /listings, for the counts in the filter sidebar.
+    All four are counted in one GROUPING SETS query, see app/db/facets.py. Responses are cached like
+    GET /listings until a listing write invalidates them.
+    """
+    filters = parse_listing_filters(status, category, condition, min_price, max_price, keyword)
+
+    async def produce(_: Response):
+        async with async_session as session:
+            return await count_facets(session, filters, apply_listing_filters)
+
+    return await response_cache.serve(request, "listings", ListingFacetsResponse, produce)
+
+@router.get("/listings/changes", tags=["listings"], response_model=ListingChangesResponse)
+async def get_listing_changes(
+    request: Request,
+    async_session: AsyncSession = Depends(get_read_session),
+    sync_token: Optional[str] = Query(None, description="Opaque token from the sync_token of the previous response"),
+    updated_since: Optional[datetime] = Query(None, description="Start from the changes after this time instead of a token"),
+    limit: int = Query(100, ge=1, le=500, description="Most changes per response"),
+
+    # Filters, matching get_listings apart from status, which delta sync tracks itself
+    category: Optional[str] = Query(None, description="Category value (matching ListingCategory enum)"),
+    condition: Optional[str] = Query(None, description="Condition value (matching ListingCondition enum)"),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    keyword: Optional[str] = Query(None, description="Keyword to search in title or description"),
+
+    # Sparse fieldsets for the listings, like GET /listings
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to include, all fields if not given"),
+    description_length: Optional[int] = Query(None, ge=1, description="Truncate descriptions to this many characters")
+):
+    """
+    The purpose of this route is to keep a client's copy of the listing feed up to date without
+    downloading whole pages again. It returns the active listings created or changed after the sync
+    token, tombstones for the ones that left ACTIVE status, and the token to poll with next, see
+    app/db/listing_sync.py. Without a token or updated_since it starts a full sync of the active listings.
+    Responses carry Last-Modified and an ETag for the token and filters. A poll with a token whose
+    If-None-Match or If-Modified-Since is still current gets an empty 304 when a one-row probe finds
+    no change after the token.
+    """
+    if sync_token and updated_since:
+        raise HTTPException(status_code=400, detail="Pass either sync_token or updated_since, not both.")
+    token = None
+    if sync_token:
+        try:
+            token = decode_sync_token(sync_token)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid sync_token value.")
+    elif updated_since:
+        if updated_since.tzinfo is None:
+            raise HTTPException(status_code=400, detail="updated_since must include a time zone.")
+        token = SyncToken(updated_at=updated_since, id=0)
+
+    filters = parse_listing_filters(None, category, condition, min_price, max_price, keyword)
+    projection = listing_projection(True, fields, description_length)
+
+    async with async_session as session:
+        latest = await latest_listing_update(session)
+        headers = validator_headers(latest, cache_key(request))
+        if (
+            token is not None
+            and not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since"), latest, headers["ETag"])
+            and await session.scalar(pending_change_statement(filters, token, apply_listing_filters)) is None
+        ):
+            return Response(status_code=304, headers=headers)
+
+        result = await session.execute(changes_statement(projection, filters, token, limit, apply_listing_filters))
+        rows = list(result.all())
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    body = {
+        "listings": [projection.to_dict(row) for row in rows if row.status == ListingStatus.ACTIVE],
+        "removed": [
+            {"id": row.id, "status": enum_label(row.status), "updated_at": row.updated_at}
+            for row in rows
+            if row.status != ListingStatus.ACTIVE
+        ],
+        "sync_token": encode_sync_token(next_sync_token(rows, token, has_more)),
+        "has_more": has_more,
+    }
+    with measure_serialization():
+        content = to_json(body)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@router.get("/listings/stream", tags=["listings"])
+async def stream_listings(
+    request: Request,
+
+    # Filters, matching get_listings apart from status, since the stream follows active listings
+    category: Optional[str] = Query(None, description="Category value (matching ListingCategory enum)"),
+    condition: Optional[str] = Query(None, description="Condition value (matching ListingCondition enum)"),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    keyword: Optional[str] = Query(None, description="Keyword to search in title or description"),
+):
+    """
+    The purpose of this route is to push new and changed listings to the home feed as server-sent
+    events instead of having it poll GET /listings. Listings matching the filters arrive as created
+    or updated events with the full listing, listings that left ACTIVE status as removed events,
+    and a resync event asks the client to catch up through GET /listings/changes, see
+    app/core/listing_events.py. The stream holds no database connection while it is open.
+    """
+    filters = parse_listing_filters(None, category, condition, min_price, max_price, keyword)
+    subscription = listing_events.subscribe(filters)
+    if subscription is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many open listing streams, please try again shortly.",
+            headers={"Retry-After": str(settings.admission_retry_after_seconds)},
+        )
+    return StreamingResponse(
+        subscription.events(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        # nginx would otherwise buffer the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/listings/{listing_id}", tags=["listings"], response_model=UserListingResponse)
 async def get_listing_by_id(
+    request: Request,
     listing_id: int,
-    async_session: AsyncSession = Depends(get_async_session)
+    async_session: AsyncSession = Depends(get_read_session)
 ):
     """
     The purpose of this route is to retrieve a listing by its ID.
+    Responses are served from the response cache until a listing write invalidates them.
     """
-    async with async_session as session:
-        statement = (
-            select(Listing)
-            .options(selectinload(Listing.seller))
-            .where(Listing.id == listing_id)
-        )
-        result = await session.scalars(statement)
-        listing = result.one()
-        return listing
+    async def produce(_: Response):
+        async with async_session as session:
+            statement = (
+                select(*USER_LISTING_PROJECTION.columns())
+                .join(User, Listing.seller_id == User.id)
+                .where(Listing.id == listing_id)
+            )
+            result = await session.execute(statement)
+            listing = result.one()
+            return listing
+
+    return await response_cache.serve(request, "listings", UserListingResponse, produce, serialize=USER_LISTING_PROJECTION.dump_one)
 
 # Pagination tutorial: https://www.youtube.com/watch?v=Em6OzzcO9Xo
 # https://stackoverflow.com/questions/74941021/using-sqlalchemy-what-is-a-good-way-to-load-related-object-that-are-were-not-ea
 @router.get("/listings", tags=["listings"], response_model=list[UserListingResponse])
 async def get_listings_standard(
+    request: Request,
     # in query parameters, specify page_num to indicate the page number and card_num to indicate the number of cards for pagination
     pagination: Annotated[Pagination, Depends(pagination_params)],
-    async_session: AsyncSession = Depends(get_async_session),
-    sort_by: Optional[str] = Query("updated_at", description="Sort field: price, created_at, updated_at"),
+    async_session: AsyncSession = Depends(get_read_session),
+    sort_by: Optional[str] = Query("updated_at", description="Sort field: price, created_at, updated_at, relevance"),
     order: Optional[str] = Query(SortEnum.DESC.value, description="Sort order: asc or desc"),
 
     # Filters
@@ -165,7 +478,12 @@ async def get_listings_standard(
     condition: Optional[str] = Query(None, description="Condition value (matching ListingCondition enum)"),
     min_price: Optional[int] = Query(None, ge=0),
     max_price: Optional[int] = Query(None, ge=0),
-    keyword: Optional[str] = Query(None, description="Keyword to search in title or description")
+    keyword: Optional[str] = Query(None, description="Keyword to search in title or description"),
+    cursor: Optional[str] = Query(None, description="Opaque keyset cursor from the X-Next-Cursor or X-Prev-Cursor header"),
+
+    # Sparse fieldsets, e.g. fields=id,title,price_cents,image_variants&description_length=120 for grid cards
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to include, all fields if not given"),
+    description_length: Optional[int] = Query(None, ge=1, description="Truncate descriptions to this many characters")
 
 ):
     """
@@ -174,19 +492,28 @@ async def get_listings_standard(
     but using Copilot made it go faster.
 
     The purpose of this route is to retrieve listings for standard members.
+    Pages are served from the response cache, keyed by the query parameters, until a listing write invalidates them.
     """
-    return await get_listings(
-        pagination=pagination,
-        async_session=async_session,
-        sort_by=sort_by,
-        order=order,
-        status=status,
-        category=category,
-        condition=condition,
-        min_price=min_price,
-        max_price=max_price,
-        keyword=keyword
-    )
+    projection = listing_projection(True, fields, description_length)
+
+    async def produce(response: Response):
+        return await get_listings(
+            pagination=pagination,
+            async_session=async_session,
+            sort_by=sort_by,
+            order=order,
+            status=status,
+            category=category,
+            condition=condition,
+            min_price=min_price,
+            max_price=max_price,
+            keyword=keyword,
+            cursor=cursor,
+            response=response,
+            projection=projection
+        )
+
+    return await response_cache.serve(request, "listings", list[UserListingResponse], produce, serialize=projection.dump)
 
 @router.post("/listings/new", tags=["listings"], response_model=UserListingResponse)
 async def create_listing(
@@ -199,28 +526,42 @@ async def create_listing(
     condition: ListingCondition | None = Form(None),
     image: UploadFile | None = File(None),
     async_session: AsyncSession = Depends(get_async_session),
-    user = Depends(fastapi_users.current_user())
+    user = Depends(current_user_required)
 ):
     """
     This route saves a new listing to the database.
+    The image is streamed to a temporary file first and only published under its
+    content-addressed name once the listing row has been committed. Its resized
+    variants are then generated in the image process pool.
     """
-    if image:
-        save_upload_file(image)
+    staged_image = await stage_upload(image, LISTINGS_DIR, "images/listings") if image else None
     # Create a new Listing object and add it to the database
     # Source: https://medium.com/@halpertln/session-queries-in-sqlalchemy-90233d455b12
     async with async_session as session:
-        new_listing = Listing(
-            title=title,
-            seller_id=user.id,
-            description=description,
-            price_cents=int(price) * 100,
-            status=ListingStatus.ACTIVE,
-            category=category,
-            condition=condition,
-            image=f"images/listings/{image.filename}" if image else None
-        )
-        session.add(new_listing)
-        await session.commit()
+        try:
+            new_listing = Listing(
+                title=title,
+                seller_id=user.id,
+                description=description,
+                price_cents=int(price) * 100,
+                status=ListingStatus.ACTIVE,
+                category=category,
+                condition=condition,
+                image=staged_image.relative_path if staged_image else None
+            )
+            session.add(new_listing)
+            await session.flush()
+            await notify_listing_changes(session, "created", [new_listing.id])
+            await session.commit()
+        except BaseException:
+            if staged_image:
+                await staged_image.discard()
+            raise
+        if staged_image:
+            await staged_image.commit()
+            await generate_variants(staged_image.relative_path, LISTING_VARIANTS)
+        await listing_counts.invalidate()
+        await response_cache.invalidate("listings")
         # Verify that the listing exists in the database and return the new listing
         statement = (
             select(Listing)
@@ -229,4 +570,32 @@ async def create_listing(
         )
         result = await session.scalars(statement)
         listing = result.one()
-        return listing
\ No newline at end of file
+        return listing
+
+@router.post("/listings/import", tags=["listings"], response_model=ListingImportResponse)
+async def import_listings_route(
+    manifest: UploadFile = File(...),
+    images: list[UploadFile] = File([]),
+    # "jsonl" or "csv", taken from the manifest's extension or content type when not given
+    format: str | None = Form(None),
+    async_session: AsyncSession = Depends(get_async_session),
+    user = Depends(current_user_required)
+):
+    """
+    This route creates many listings for the current user from one manifest.
+    The manifest is a JSONL or CSV file with the title, description, price (in dollars) and
+    optionally the category, condition, status and image of each listing, the image being the
+    filename of one of the uploaded images. Rows are validated and inserted in batches, see
+    app/core/listing_import.py, and the response has one result per row with the new listing's
+    id or the errors that kept the row out.
+    """
+    import_format = manifest_format(manifest, format)
+    # No import can use more images than it has rows
+    if len(images) > settings.listing_import_max_rows:
+        raise HTTPException(status_code=400, detail=f"An import can include at most {settings.listing_import_max_rows} images.")
+    async with async_session as session:
+        summary = await import_listings(session, user.id, manifest, import_format, images, LISTINGS_DIR)
+    if summary["created"]:
+        await listing_counts.invalidate()
+        await response_cache.invalidate("listings")
+    return summary
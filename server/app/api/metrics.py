@@ -0,0 +1,40 @@
+import secrets
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from app.api.admin import check_admin
+from app.auth.backend import current_user_optional
+from app.core.config import settings
+from app.core.instrumentation import request_stats
+from app.core.listing_events import render_listing_event_metrics
+from app.core.ratelimit import render_rate_limit_metrics
+from app.db.database import engine
+from app.db.pool import render_pool_metrics
+
+router = APIRouter()
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def has_metrics_token(request: Request) -> bool:
+    """
+    This function checks the request for settings.metrics_token as a bearer token.
+    No request has it while the setting is empty.
+    """
+    if not settings.metrics_token:
+        return False
+    authorization = request.headers.get("authorization", "")
+    return secrets.compare_digest(authorization.encode(), f"Bearer {settings.metrics_token}".encode())
+
+@router.get("/metrics", tags=["metrics"], include_in_schema=False)
+async def get_metrics(request: Request, current_user = Depends(current_user_optional)):
+    """
+    This route returns the request, rate limit and connection pool metrics of this worker in the Prometheus text format.
+    Each uvicorn worker keeps its own counters, so scrape every worker or run one worker per container.
+    It is only served to administrators and to scrapers sending settings.metrics_token as a bearer token.
+    """
+    if not has_metrics_token(request):
+        if current_user is None:
+            raise HTTPException(status_code=401, detail="Send the metrics token or sign in as an administrator.")
+        check_admin(current_user)
+    lines = [*request_stats.render(), *render_rate_limit_metrics(), *render_listing_event_metrics(), *render_pool_metrics(engine.sync_engine)]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,34 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.auth.backend import fastapi_users
-from app.db.database import get_async_session, AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import Annotated, Optional
+from app.auth.backend import current_user_required
+from app.db.database import get_async_session, get_read_session, AsyncSession
 from app.schemas.user import CustomUserUpdate, UserResponse
-from app.models.listing import Listing
-from app.schemas.listing import ListingResponse
+from app.schemas.listing import ListingResponse, SellerStatsResponse
+from app.schemas.pagination import Pagination, SortEnum, seller_pagination_params
+from app.models.seller_stats import load_seller_stats
 from app.models.user import User
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_async_session
-from sqlalchemy import select
+from app.core.cache import user_counts
+from app.auth.strategy import forget_user
+from app.api.listings import get_listings, listing_projection
+from app.core.serialization import json_response
 
 router = APIRouter()
 
 @router.get("/profile/listings", tags=["profile"], response_model=list[ListingResponse])
 async def get_my_listings(
-    async_session: AsyncSession = Depends(get_async_session),
-    user: User = Depends(fastapi_users.current_user()),
+    pagination: Annotated[Pagination, Depends(seller_pagination_params)],
+    async_session: AsyncSession = Depends(get_read_session),
+    user: User = Depends(current_user_required),
+    sort_by: Optional[str] = Query("updated_at", description="Sort field: price, created_at, updated_at"),
+    order: Optional[str] = Query(SortEnum.DESC.value, description="Sort order: asc or desc"),
+    status: Optional[str] = Query(None, description="Status value (matching ListingStatus enum)"),
+    cursor: Optional[str] = Query(None, description="Opaque keyset cursor from the X-Next-Cursor or X-Prev-Cursor header"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to include, all fields if not given"),
+    description_length: Optional[int] = Query(None, ge=1, description="Truncate descriptions to this many characters"),
+    response: Response = None,
 ):
     """
-    Retrieve the currently authenticated user's listings.
+    Retrieve one page of the currently authenticated user's listings, optionally filtered by status.
+    Pages work like GET /listings, with page_num or the keyset cursors in the X-Next-Cursor and
+    X-Prev-Cursor headers. Totals per status come from GET /profile/stats.
+    Only the columns behind the requested fields are selected.
     """
+    projection = listing_projection(False, fields, description_length)
+    listings = await get_listings(
+        pagination=pagination,
+        async_session=async_session,
+        sort_by=sort_by,
+        order=order,
+        status=status,
+        category=None,
+        condition=None,
+        min_price=None,
+        max_price=None,
+        keyword=None,
+        cursor=cursor,
+        response=response,
+        projection=projection,
+        seller_id=user.id
+    )
+    return json_response(projection.dump(listings), response)
+
+
+@router.get("/profile/stats", tags=["profile"], response_model=SellerStatsResponse)
+async def get_my_stats(
+    async_session: AsyncSession = Depends(get_read_session),
+    user: User = Depends(current_user_required),
+):
+    """Retrieve the currently authenticated user's listing counts by status, active listing value and last activity."""
     async with async_session as session:
-        statement = select(Listing).where(Listing.seller_id == user.id)
-        result = await session.scalars(statement)
-        listings = result.all()
-        return listings
+        return await load_seller_stats(session, user.id)
 
 
 @router.get("/profile", tags=["profile"], response_model=UserResponse)
 async def get_me(
-      user: User = Depends(fastapi_users.current_user()),
+      user: User = Depends(current_user_required),
 ):
       """Retrieve the currently authenticated user's profile details."""
       return {
@@ -48,25 +87,23 @@ async def get_me(
 @router.put("/profile", tags=["profile"], response_model=UserResponse)
 async def update_me(
     user_update: CustomUserUpdate,
-    user: User = Depends(fastapi_users.current_user()),
+    user: User = Depends(current_user_required),
     session: AsyncSession = Depends(get_async_session)
 ):
     """
     Update the currently authenticated user's profile details.
     """
-    user: User | None = await session.get(User, user.id)
-    if not user:
-        raise HTTPException(
-            status_code=404,
-            detail="User not found"
-        )
+    # The authenticated user was loaded by the auth strategy, so merge it instead of fetching it again
+    user = await session.merge(user, load=False)
 
     for k, v in user_update.dict(exclude_unset=True).items():
         setattr(user, k, v)
 
     # Saves the changes to the database.
     await session.commit()
-    await session.refresh(user)
+    # Name changes can move the user in and out of keyword-filtered counts
+    await user_counts.invalidate()
+    await forget_user(user.id)
 
     return {
         "id": user.id,
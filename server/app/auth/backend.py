@@ -1,10 +1,14 @@
 import uuid
+from typing import Optional
 
+from fastapi import Depends, HTTPException
 from fastapi_users.authentication import CookieTransport
 from fastapi_users.authentication import AuthenticationBackend
 from fastapi_users import FastAPIUsers
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
-from app.models.access_token import get_database_strategy
+from app.db.database import get_async_session
+from app.auth.strategy import select_strategy
 from app.models.user import User, get_user_manager
 
 # This file sets up cookie-based authentication for FastAPI Users.
@@ -18,10 +22,36 @@ cookie_transport = CookieTransport(
 auth_backend = AuthenticationBackend(
     name="cookie",
     transport=cookie_transport,
-    get_strategy=get_database_strategy
+    get_strategy=select_strategy()
 )
 
 fastapi_users = FastAPIUsers[User, uuid.UUID](
     get_user_manager,
     [auth_backend],
-)
\ No newline at end of file
+)
+
+# The rate limiter and the routes depend on these rather than calling fastapi_users.current_user()
+# themselves. FastAPI runs each dependency callable once per request, and current_user() returns a
+# new callable on every call, so sharing one is what keeps the user from being loaded twice.
+read_current_user = fastapi_users.current_user(optional=True)
+
+
+async def current_user_optional(
+    user: Optional[User] = Depends(read_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> Optional[User]:
+    """
+    The signed in user, or None. The lookup's transaction is committed right away, which returns its
+    connection to the pool: FastAPI only closes the session once the response has been sent, which for
+    a listing stream or an export would hold the connection for as long as the download runs.
+    Sessions are not expired on commit, so the user stays usable by the route.
+    """
+    await session.commit()
+    return user
+
+
+async def current_user_required(user: Optional[User] = Depends(current_user_optional)) -> User:
+    """The signed in user, or a 401 Unauthorized error like fastapi_users.current_user()."""
+    if user is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return user
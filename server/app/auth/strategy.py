@@ -0,0 +1,216 @@
+import logging
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any
+import jwt
+from fastapi import Depends
+from fastapi_users import exceptions
+from fastapi_users.authentication.strategy import DatabaseStrategy, JWTStrategy, Strategy
+from fastapi_users.authentication.strategy.db import AccessTokenDatabase
+from fastapi_users.jwt import decode_jwt, generate_jwt
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.orm import make_transient_to_detached
+from app.core.cache import TTLCache, response_cache
+from app.core.config import settings
+from app.models.access_token import AccessToken, get_access_token_db
+from app.models.user import User
+
+# This file holds the authentication strategies used by the cookie backend in app/auth/backend.py.
+#
+# "database" (the default) stores opaque tokens in the accesstoken table. Looking a token up costs
+# a token query and a user query, so successful lookups are cached per worker for a few seconds.
+#
+# "jwt" issues signed tokens that carry the user id, so no token table is needed. Logging out adds
+# the token's id to a revocation list in Redis until the token would have expired anyway.
+#
+# Both strategies cache a copy of the user's columns, not the ORM object itself, and every request
+# gets a fresh detached User built from it. Cached entries are tied to a per-user version number
+# kept by the response cache, and forget_user bumps it on logout, bans and profile updates.
+# The cache is only used with the Redis response cache backend, where the bump is seen by every
+# worker immediately. With the memory backend the versions are per worker, so a worker that did not
+# handle the ban or logout would keep the user signed in; every request reads the database instead.
+# Banned users are treated as logged out, so a ban locks them out of every endpoint.
+
+logger = logging.getLogger(__name__)
+
+TOKEN_LIFETIME_SECONDS = settings.access_token_lifetime_seconds
+
+# ("token", token) -> (user id, user version, token expiry, user columns) for the database strategy
+# ("user", user id) -> (user version, user columns) for the jwt strategy
+auth_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl_seconds)
+
+
+def session_cache_enabled() -> bool:
+    """Checks whether cached sessions can be used, which needs versions shared by every worker."""
+    return response_cache.shared is not None and settings.auth_cache_ttl_seconds > 0
+
+
+def user_namespace(user_id) -> str:
+    """Returns the response cache namespace whose version guards a user's cached sessions."""
+    return f"user:{user_id}"
+
+
+async def forget_user(*user_ids) -> None:
+    """Drops every cached session of the given users, called after logout, bans and profile changes."""
+    await response_cache.invalidate(*(user_namespace(user_id) for user_id in user_ids))
+
+
+def snapshot_user(user: User) -> dict[str, Any]:
+    """Copies the column values of a user so they can be cached without holding on to a session."""
+    return {attribute.key: getattr(user, attribute.key) for attribute in User.__mapper__.column_attrs}
+
+
+def restore_user(values: dict[str, Any]) -> User:
+    """Builds a detached User from cached column values, which can be merged into a session."""
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+async def load_user(user_manager, user_id) -> User | None:
+    """Loads a user through the user manager, treating missing and banned users as logged out."""
+    try:
+        user = await user_manager.get(user_manager.parse_id(user_id))
+    except (exceptions.UserNotExists, exceptions.InvalidID):
+        return None
+    if user.is_banned:
+        return None
+    return user
+
+
+class CachedDatabaseStrategy(DatabaseStrategy):
+    """The fastapi-users database strategy with a short-lived per-worker cache of token lookups."""
+
+    async def read_token(self, token, user_manager):
+        if token is None:
+            return None
+
+        cached = session_cache_enabled()
+        entry = auth_cache.get(("token", token)) if cached else None
+        if entry is not None:
+            user_id, version, expires_at, values = entry
+            if expires_at > time.time() and version == await response_cache.version(user_namespace(user_id)):
+                return restore_user(values)
+
+        max_age = datetime.now(timezone.utc) - timedelta(seconds=self.lifetime_seconds)
+        access_token = await self.database.get_by_token(token, max_age)
+        if access_token is None:
+            return None
+        if not cached:
+            return await load_user(user_manager, access_token.user_id)
+        # Read the version before the user, so a ban committed in between invalidates this entry
+        version = await response_cache.version(user_namespace(access_token.user_id))
+        user = await load_user(user_manager, access_token.user_id)
+        if user is None:
+            return None
+        expires_at = access_token.created_at.timestamp() + self.lifetime_seconds
+        auth_cache.set(("token", token), (user.id, version, expires_at, snapshot_user(user)))
+        return user
+
+    async def destroy_token(self, token, user):
+        await super().destroy_token(token, user)
+        auth_cache.delete(("token", token))
+        await forget_user(user.id)
+
+
+class RevocationList:
+    """
+    Token ids that were logged out before they expired, stored in Redis so every worker sees them.
+    If Redis cannot be reached, tokens are treated as revoked: a Redis outage logs users out
+    instead of letting revoked tokens back in.
+    """
+
+    def __init__(self, url: str):
+        self.client = Redis.from_url(url)
+
+    async def revoke(self, token_id: str, expires_at: float) -> None:
+        remaining = int(expires_at - time.time()) + 1
+        if remaining > 0:
+            await self.client.set(f"revoked-token:{token_id}", 1, ex=remaining)
+
+    async def is_revoked(self, token_id: str) -> bool:
+        try:
+            return bool(await self.client.exists(f"revoked-token:{token_id}"))
+        except RedisError:
+            logger.warning("Could not check the token revocation list", exc_info=True)
+            return True
+
+
+class RevocableJWTStrategy(JWTStrategy):
+    """
+    The fastapi-users JWT strategy with a token id in every token, so single tokens can be revoked.
+    The user row is still loaded to apply bans and profile changes, but only on a cache miss.
+    """
+
+    def __init__(self, revocations: RevocationList, **kwargs):
+        super().__init__(**kwargs)
+        self.revocations = revocations
+
+    async def read_token(self, token, user_manager):
+        if token is None:
+            return None
+        try:
+            data = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+        except jwt.PyJWTError:
+            return None
+        user_id, token_id = data.get("sub"), data.get("jti")
+        if user_id is None or token_id is None or await self.revocations.is_revoked(token_id):
+            return None
+
+        if not session_cache_enabled():
+            return await load_user(user_manager, user_id)
+        version = await response_cache.version(user_namespace(user_id))
+        entry = auth_cache.get(("user", user_id))
+        if entry is not None and entry[0] == version:
+            return restore_user(entry[1])
+        user = await load_user(user_manager, user_id)
+        if user is None:
+            return None
+        auth_cache.set(("user", user_id), (version, snapshot_user(user)))
+        return user
+
+    async def write_token(self, user):
+        data = {"sub": str(user.id), "aud": self.token_audience, "jti": secrets.token_urlsafe(16)}
+        return generate_jwt(data, self.encode_key, self.lifetime_seconds, algorithm=self.algorithm)
+
+    async def destroy_token(self, token, user):
+        data = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+        try:
+            await self.revocations.revoke(data["jti"], data["exp"])
+        except RedisError:
+            # Logging out still clears the cookie. is_revoked rejects every token while Redis is down,
+            # but a copy of this token works again once it is back, until the token expires.
+            logger.warning("Could not revoke a token for user %s", user.id, exc_info=True)
+
+
+def get_database_strategy(
+    access_token_db: AccessTokenDatabase[AccessToken] = Depends(get_access_token_db)
+) -> Strategy:
+    return CachedDatabaseStrategy(access_token_db, lifetime_seconds=TOKEN_LIFETIME_SECONDS)
+
+
+def get_jwt_strategy() -> Strategy:
+    return jwt_strategy
+
+
+def create_jwt_strategy() -> RevocableJWTStrategy:
+    """Creates the JWT strategy, which keeps its revocation list in the Redis from settings.redis_url."""
+    return RevocableJWTStrategy(
+        RevocationList(settings.redis_url),
+        secret=settings.auth_secret,
+        lifetime_seconds=TOKEN_LIFETIME_SECONDS,
+    )
+
+
+def select_strategy():
+    """Returns the strategy dependency described by settings.auth_strategy."""
+    if settings.auth_strategy == "database":
+        return get_database_strategy
+    if settings.auth_strategy == "jwt":
+        return get_jwt_strategy
+    raise ValueError(f"Unknown auth_strategy '{settings.auth_strategy}'.")
+
+
+jwt_strategy = create_jwt_strategy() if settings.auth_strategy == "jwt" else None
@@ -0,0 +1,397 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+from urllib.parse import urlencode
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.instrumentation import measure_serialization
+from app.db.notifications import listen, notify
+from app.db.routing import is_pinned_to_primary
+
+logger = logging.getLogger(__name__)
+
+CACHE_CHANNEL = "cache_invalidations"
+
+# Keys per notification, which keeps payloads well under the 8000 byte limit of pg_notify
+BROADCAST_BATCH_SIZE = 100
+
+
+class TTLCache:
+    """
+    A small in-process cache bounded by both a maximum number of entries and a time-to-live.
+    The least recently used entry is evicted once the cache is full.
+    Each uvicorn worker has its own copy, so entries are only shared within one process.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value for key, or default if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Stores value under key, evicting the least recently used entry if the cache is full."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Removes a single entry if it exists."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Removes every entry, used when a write may have changed any cached value."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheBroadcast:
+    """
+    Sends the invalidations of this worker's in-memory caches to the other uvicorn workers with
+    Postgres NOTIFY and applies theirs, for when no shared backend holds the caches. Each cache
+    registers a handler by name, which gets the invalidated keys, or None to drop everything.
+    Invalidations usually arrive within milliseconds; if the LISTEN connection is lost, every
+    handler is called with None once it is back, since the invalidations sent meanwhile are gone.
+    """
+
+    def __init__(self):
+        # Tells this worker's own notifications apart, which it has already applied
+        self.origin = uuid.uuid4().hex
+        self.handlers: dict[str, Callable[[list[str] | None], None]] = {}
+        self.received = 0
+        self._task: asyncio.Task | None = None
+
+    def register(self, name: str, handler: Callable[[list[str] | None], None]) -> None:
+        self.handlers[name] = handler
+
+    def start(self) -> None:
+        """Starts applying the invalidations of the other workers, called when the app starts."""
+        if self.handlers and self._task is None:
+            self._task = asyncio.create_task(
+                listen(CACHE_CHANNEL, self._receive, self._resync),
+                context=contextvars.Context(),
+            )
+
+    async def stop(self) -> None:
+        """Closes the LISTEN connection, called when the app shuts down."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def publish(self, name: str, keys: list[str]) -> None:
+        """Sends invalidated keys to the other workers. Errors are logged, their entries then expire with their TTL."""
+        batches = [keys[start:start + BROADCAST_BATCH_SIZE] for start in range(0, len(keys), BROADCAST_BATCH_SIZE)] or [[]]
+        payloads = [
+            json.dumps({"origin": self.origin, "cache": name, "keys": batch}, separators=(",", ":"))
+            for batch in batches
+        ]
+        try:
+            await notify(CACHE_CHANNEL, *payloads)
+        except Exception:
+            logger.warning("Could not broadcast the invalidation of %d %s keys", len(keys), name, exc_info=True)
+
+    def _receive(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            origin, handler, keys = message["origin"], self.handlers.get(message["cache"]), message["keys"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring a malformed cache invalidation: %s", payload)
+            return
+        if origin != self.origin and handler is not None:
+            handler(keys)
+            self.received += 1
+
+    def _resync(self) -> None:
+        for handler in self.handlers.values():
+            handler(None)
+
+
+cache_broadcast = CacheBroadcast()
+
+
+class CountCache(TTLCache):
+    """
+    A TTLCache of pagination totals, which are always kept per worker. Writes call invalidate(),
+    which clears it in this worker and, through the broadcast, in every other worker.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, broadcast: CacheBroadcast):
+        super().__init__(maxsize, ttl)
+        self.name = name
+        self.broadcast = broadcast
+        broadcast.register(name, lambda keys: self.clear())
+
+    async def invalidate(self) -> None:
+        """Drops every count in every worker, called whenever a listing or user write could change one."""
+        self.clear()
+        await self.broadcast.publish(self.name, [])
+
+
+# Counts for the pagination totals, keyed by the normalized filter set
+listing_counts = CountCache("listing_counts", settings.count_cache_size, settings.count_cache_ttl_seconds, cache_broadcast)
+user_counts = CountCache("user_counts", settings.count_cache_size, settings.count_cache_ttl_seconds, cache_broadcast)
+
+
+class CachedResponse(BaseModel):
+    """Pydantic model for a serialized response body stored in the response cache."""
+    body: bytes
+    etag: str
+    headers: dict[str, str] = {}
+
+
+class RedisCacheBackend:
+    """
+    Shared cache backend that lets every uvicorn worker see the same entries and invalidations.
+    Any Redis-compatible server works, including the local one from docker-compose.yml.
+    Errors are logged and treated as cache misses so an outage only costs performance.
+    """
+
+    def __init__(self, url: str):
+        self.client = Redis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            return await self.client.get(key)
+        except RedisError:
+            logger.warning("Shared cache read failed for %s", key, exc_info=True)
+            return None
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        try:
+            await self.client.set(key, value, px=int(ttl * 1000))
+        except RedisError:
+            logger.warning("Shared cache write failed for %s", key, exc_info=True)
+
+    async def incr(self, key: str) -> int | None:
+        try:
+            return await self.client.incr(key)
+        except RedisError:
+            logger.warning("Shared cache increment failed for %s", key, exc_info=True)
+            return None
+
+    async def incr_many(self, keys: list[str]) -> None:
+        """Increments several keys in one round trip."""
+        try:
+            async with self.client.pipeline(transaction=False) as pipeline:
+                for key in keys:
+                    pipeline.incr(key)
+                await pipeline.execute()
+        except RedisError:
+            logger.warning("Shared cache increment failed for %s keys", len(keys), exc_info=True)
+
+
+class ResponseCache:
+    """
+    Two-level cache for the serialized JSON of public read endpoints.
+
+    Entries live in a per-worker LRU and, if configured, in a shared backend. Keys are built
+    from the request path, its normalized query parameters and a version number for the
+    namespace the endpoint belongs to. Invalidating a namespace bumps its version, which
+    makes every older entry unreachable at once; with a shared backend the version lives
+    in the backend so the bump is seen by all workers, otherwise the bump is broadcast to them.
+    Clients pinned to the primary after a write bypass the cache, since an entry could hold a
+    replica's read from before their write.
+
+    The local versions are drawn from one counter and kept for at most max_namespaces
+    namespaces, since there is one per user. A namespace that is dropped, and every namespace
+    that was never invalidated, gets the highest version dropped so far, so its versions only
+    ever go up and an old entry cannot become reachable again.
+    """
+
+    def __init__(
+        self,
+        local: TTLCache,
+        shared: RedisCacheBackend | None,
+        max_age: int,
+        max_namespaces: int = 4096,
+        broadcast: CacheBroadcast | None = None,
+    ):
+        self.local = local
+        self.shared = shared
+        self.max_age = max_age
+        self.broadcast = broadcast
+        self.max_namespaces = max_namespaces
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+        self._adapters: dict[Any, TypeAdapter] = {}
+        if broadcast is not None:
+            broadcast.register("response", self.forget)
+
+    async def version(self, namespace: str) -> int:
+        """Returns the current version number of a namespace."""
+        if self.shared is not None:
+            raw = await self.shared.get(f"cache-version:{namespace}")
+            if raw is not None:
+                return int(raw)
+        return self._versions.get(namespace, self._floor)
+
+    async def invalidate(self, *namespaces: str) -> None:
+        """Drops every cached response in the given namespaces, called after writes."""
+        self.forget(list(namespaces))
+        if self.shared is not None and namespaces:
+            await self.shared.incr_many([f"cache-version:{namespace}" for namespace in namespaces])
+        elif self.broadcast is not None and namespaces:
+            await self.broadcast.publish("response", list(namespaces))
+
+    def forget(self, namespaces: list[str] | None) -> None:
+        """Bumps the local versions of the given namespaces, or of every namespace for None."""
+        if namespaces is None:
+            self._counter += 1
+            self._floor = self._counter
+            self._versions.clear()
+            self.local.clear()
+            return
+        for namespace in namespaces:
+            self._counter += 1
+            self._versions[namespace] = self._counter
+            self._versions.move_to_end(namespace)
+        while len(self._versions) > self.max_namespaces:
+            _, dropped = self._versions.popitem(last=False)
+            self._floor = max(self._floor, dropped)
+
+    async def serve(
+        self,
+        request: Request,
+        namespace: str,
+        response_model: Any,
+        produce: Callable[[Response], Awaitable[Any]],
+        serialize: Callable[[Any], bytes] | None = None,
+    ) -> Response:
+        """
+        Returns the cached response for this request, or calls produce to build it.
+        produce receives a Response whose headers are stored alongside the body, and its
+        return value is validated and serialized with response_model just like FastAPI would,
+        unless a serialize function is given that encodes it directly to the same JSON.
+        Requests whose If-None-Match header matches the ETag get an empty 304 response.
+        """
+        if is_pinned_to_primary(request):
+            # Built from the primary for this client only, so it is neither stored nor shared
+            entry = await self._produce(response_model, produce, serialize)
+            return self._respond(request, entry, "private, no-cache")
+
+        key = f"response:{namespace}:{await self.version(namespace)}:{cache_key(request)}"
+        entry = self.local.get(key)
+        if entry is None and self.shared is not None:
+            raw = await self.shared.get(key)
+            if raw is not None:
+                entry = CachedResponse.model_validate_json(raw)
+                self.local.set(key, entry)
+
+        if entry is None:
+            entry = await self._produce(response_model, produce, serialize)
+            self.local.set(key, entry)
+            if self.shared is not None:
+                await self.shared.set(key, entry.model_dump_json().encode(), self.local.ttl)
+        return self._respond(request, entry, f"public, max-age={self.max_age}")
+
+    async def _produce(
+        self,
+        response_model: Any,
+        produce: Callable[[Response], Awaitable[Any]],
+        serialize: Callable[[Any], bytes] | None,
+    ) -> CachedResponse:
+        header_response = Response()
+        value = await produce(header_response)
+        with measure_serialization():
+            if serialize is not None:
+                body = serialize(value)
+            else:
+                adapter = self._adapter(response_model)
+                body = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+        headers = {
+            name: header
+            for name, header in header_response.headers.items()
+            if name not in ("content-length", "content-type")
+        }
+        return CachedResponse(body=body, etag=make_etag(body), headers=headers)
+
+    def _respond(self, request: Request, entry: CachedResponse, cache_control: str) -> Response:
+        headers = {
+            **entry.headers,
+            "ETag": entry.etag,
+            "Cache-Control": cache_control,
+        }
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def _adapter(self, response_model: Any) -> TypeAdapter:
+        adapter = self._adapters.get(response_model)
+        if adapter is None:
+            adapter = self._adapters[response_model] = TypeAdapter(response_model)
+        return adapter
+
+
+def cache_key(request: Request) -> str:
+    """
+    Builds a cache key from the request path and its query parameters.
+    Parameters are sorted and blank values dropped, so equivalent URLs share one entry.
+    """
+    params = sorted(
+        (name, value.strip())
+        for name, value in request.query_params.multi_items()
+        if value.strip()
+    )
+    return f"{request.url.path}?{urlencode(params)}"
+
+
+def make_etag(body: bytes) -> str:
+    """Builds a strong ETag from a hash of the response body."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Checks an If-None-Match header against an ETag, using weak comparison as RFC 9110 requires."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+    return etag in candidates
+
+
+def create_response_cache() -> ResponseCache:
+    """Creates the response cache described by the settings."""
+    shared = None
+    if settings.response_cache_backend == "redis":
+        shared = RedisCacheBackend(settings.redis_url)
+    elif settings.response_cache_backend != "memory":
+        raise ValueError(f"Unknown response_cache_backend '{settings.response_cache_backend}'.")
+    local = TTLCache(maxsize=settings.response_cache_size, ttl=settings.response_cache_ttl_seconds)
+    return ResponseCache(
+        local,
+        shared,
+        settings.response_cache_max_age,
+        max_namespaces=settings.auth_cache_size,
+        # Without a shared backend each worker has its own versions, which the others must hear about
+        broadcast=cache_broadcast if shared is None else None,
+    )
+
+
+response_cache = create_response_cache()
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import (
-    PostgresDsn
+    PostgresDsn,
+    field_validator,
 )
 import resend
 
@@ -13,6 +14,21 @@ class Settings(BaseSettings):
     auth_secret: str = "CHANGE_ME_TO_A_RANDOM_SECRET"
     cookie_domain: str = "localhost"
     cookie_secure: bool = False
+    # "database" for tokens stored in the accesstoken table, "jwt" for signed tokens revoked through Redis
+    auth_strategy: str = "database"
+    # Per-worker cache of authenticated users, 0 disables it. Only used with response_cache_backend "redis",
+    # which shares the versions that logouts and bans bump between workers
+    auth_cache_ttl_seconds: float = 10.0
+    auth_cache_size: int = 4096
+    # How long a login lasts, for both the cookie tokens and the rows in the accesstoken table
+    access_token_lifetime_seconds: int = 3600
+    # Expired rows are deleted in batches every interval by one worker at a time, 0 disables the purge.
+    # The pause between batches lets logins through while a large backlog is deleted
+    access_token_purge_interval_seconds: float = 600.0
+    access_token_purge_batch_size: int = 1000
+    access_token_purge_pause_seconds: float = 0.05
+    # Daily partitions created ahead of time once accesstoken is partitioned, see app/db/access_tokens.py
+    access_token_partition_days_ahead: int = 3
     resend_api_key: str
 
     base_url: str = "http://localhost:8080"
@@ -22,8 +38,145 @@ class Settings(BaseSettings):
         'postgresql://postgres:postgres@db:5432/postgres'
     )
 
+    # Connection pool, sized per worker (the prod image runs 4 workers)
+    db_pool_size: int = 5
+    db_max_overflow: int = 5
+    db_pool_timeout_seconds: float = 10.0
+    db_pool_pre_ping: bool = True
+    db_pool_recycle_seconds: int = 1800
+    # 0 disables the server-side statement timeout
+    db_statement_timeout_ms: int = 30000
+    # asyncpg prepared statement cache size per connection
+    db_statement_cache_size: int = 100
+    # Set when connecting through PgBouncer in transaction pooling mode
+    db_pgbouncer: bool = False
+    # Statements slower than this are kept in the slow query log (GET /admin/db/slow-queries), 0 disables it
+    slow_query_threshold_ms: float = 500.0
+    slow_query_log_size: int = 200
+    # Share of slow SELECTs that get an EXPLAIN (ANALYZE, BUFFERS) plan, which runs them a second time
+    slow_query_explain_sample_rate: float = 0.1
+    slow_query_explain_timeout_ms: int = 10000
+    # Reports the number of SQL statements each request ran in an X-DB-Query-Count header, used by the benchmarks
+    db_query_count_header: bool = False
+
+    # Read replicas for read-only routes, as a JSON list of postgresql:// URLs. Empty sends every read to the primary
+    database_replica_urls: list[str] = []
+    # How long a client's reads stay on the primary after it writes, so it sees its own changes
+    replica_read_your_writes_seconds: float = 5.0
+    # Replicas further behind the primary than this are taken out of rotation
+    replica_max_lag_seconds: float = 10.0
+    replica_health_check_seconds: float = 5.0
+
     frontend_url: str = "http://localhost:5173"
 
+    # Logging, "json" writes one JSON object per line and "text" is the plain format
+    log_level: str = "INFO"
+    log_format: str = "json"
+    # Logs every request with its duration, database time and query count
+    log_requests: bool = True
+    # Adds a Server-Timing header with the database, serialization and total time of each request.
+    # Off unless set, since it shows anyone the database time and query count of a request.
+    # The development compose file turns it on
+    server_timing_header: bool = False
+    # Requests running more SQL statements than this are logged as likely N+1 patterns, 0 disables the check
+    n_plus_one_query_threshold: int = 20
+    # GET /metrics is only served to administrators and, if set, to requests with an "Authorization: Bearer <token>" header
+    metrics_token: str = ""
+
+    # Outbound email queue, "resend" sends through Resend and "fake" only logs the emails
+    email_provider: str = "resend"
+    email_batch_size: int = 50
+    email_max_attempts: int = 8
+    email_retry_base_seconds: float = 30.0
+    email_retry_max_seconds: float = 3600.0
+    # How long a claimed job stays hidden from other workers before it is retried
+    email_claim_lease_seconds: float = 300.0
+    email_worker_poll_seconds: float = 2.0
+
+    # Largest accepted image upload, in bytes
+    max_upload_bytes: int = 10 * 1024 * 1024
+
+    # Resized image variants, the format can be "webp" or "avif"
+    image_variant_format: str = "webp"
+    image_variant_quality: int = 80
+    image_workers: int = 2
+
+    # POST /listings/import: rows read, validated and inserted per batch, and the most rows per manifest
+    listing_import_batch_size: int = 500
+    listing_import_max_rows: int = 5000
+
+    # Pagination total counts
+    count_cache_ttl_seconds: float = 30.0
+    count_cache_size: int = 1024
+
+    # GET /listings/changes sends the changes of the last few seconds again on the next poll, so writes that
+    # commit late, or reach a read replica late, are not skipped. Keep it above the longest listing write
+    # transaction plus the replica lag
+    listing_sync_settle_seconds: float = 10.0
+
+    # Response cache for public reads, "memory" keeps it per worker and broadcasts invalidations to the other
+    # workers through Postgres NOTIFY, "redis" shares it between workers
+    response_cache_backend: str = "memory"
+    response_cache_size: int = 512
+    response_cache_ttl_seconds: float = 30.0
+    response_cache_max_age: int = 15
+    redis_url: str = "redis://localhost:6379/0"
+
+    # GET /listings/stream, per worker: most open streams, events queued per client before its backlog is
+    # replaced by a resync, the heartbeat interval and the reconnect delay sent to EventSource clients
+    listing_stream_max_subscribers: int = 5000
+    listing_stream_queue_size: int = 64
+    listing_stream_heartbeat_seconds: float = 15.0
+    listing_stream_retry_ms: int = 3000
+    # LISTEN needs a session of its own, so behind PgBouncer in transaction mode point this at Postgres directly.
+    # The cache invalidations the workers send each other are received on it too
+    listing_events_database_url: PostgresDsn | None = None
+
+    # Token bucket rate limit per user, or per IP for anonymous clients, see app/core/ratelimit.py.
+    # "memory" keeps the buckets per worker, so each worker allows the full rate; "redis" shares them
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"
+    # Tokens refilled per second and the most a client can save up for a burst
+    rate_limit_per_second: float = 5.0
+    rate_limit_burst: float = 60.0
+    # Tokens each request costs, as "METHOD /route/template" -> cost. Routes not listed cost 1, and 0 exempts a route
+    rate_limit_route_costs: dict[str, float] = {
+        "POST /listings/new": 10.0,
+        "POST /listings/import": 60.0,
+        "POST /auth/login": 5.0,
+        "POST /auth/register": 5.0,
+        "POST /auth/request-verify-token": 5.0,
+        "GET /admin/listings/export": 20.0,
+        "GET /admin/users/export": 20.0,
+        "POST /admin/users/ban": 5.0,
+        "POST /admin/users/unban": 5.0,
+        "GET /metrics": 0.0,
+        # Streams stay open for hours, so they must not count as in-flight work; the subscriber cap bounds them
+        "GET /listings/stream": 0.0,
+    }
+    # Extra cost of listing searches with a keyword, and of each card requested per page
+    rate_limit_keyword_cost: float = 4.0
+    rate_limit_card_cost: float = 0.05
+    # Most buckets the memory backend keeps, the least recently used are dropped first
+    rate_limit_memory_size: int = 10000
+    # Addresses or networks of the proxies in front of the server, e.g. ["172.16.0.0/12"] for nginx in
+    # docker-compose.prod.yml. X-Forwarded-For is only read from these, otherwise every client behind
+    # the proxy shares the proxy's IP bucket
+    rate_limit_trusted_proxies: list[str] = []
+    # Admission control per worker: requests costing at least admission_min_cost get a 503 while more
+    # than admission_max_pool_waiters checkouts wait for a database connection, or while the requests
+    # already running cost more than admission_max_inflight_cost in total. 0 disables either check
+    admission_min_cost: float = 2.0
+    admission_max_pool_waiters: int = 4
+    admission_max_inflight_cost: float = 100.0
+    admission_retry_after_seconds: int = 2
+
+    @field_validator("listing_events_database_url", mode="before")
+    @classmethod
+    def empty_url_is_unset(cls, value):
+        """Treats an empty value, like the one example.env ships with, as not set."""
+        return None if value == "" else value
+
 
 settings = Settings()
 resend.api_key = settings.resend_api_key
\ No newline at end of file
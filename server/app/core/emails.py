@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+import resend
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.email_job import EmailJob, EmailDeadLetter
+
+# This file delivers the emails queued in the email_job table with enqueue_email.
+# Requests only insert a row, and the worker started with `python -m app.core.emails` sends them,
+# so a slow or unavailable email provider never holds up an API request.
+#
+# The worker claims up to email_batch_size due jobs at a time with FOR UPDATE SKIP LOCKED, so
+# several workers can run side by side without sending an email twice. Claiming pushes run_after
+# forward by email_claim_lease_seconds, so jobs claimed by a worker that crashed are retried once
+# the lease runs out. Failed jobs are retried with exponential backoff and jitter, and after
+# email_max_attempts they are moved to the email_dead_letter table.
+
+logger = logging.getLogger(__name__)
+
+FROM_ADDRESS = "noreply@gatormarket.com"
+
+
+class ResendProvider:
+    """Sends emails through the Resend batch API."""
+
+    def send_batch(self, messages: list[dict]) -> None:
+        resend.Batch.send(messages)
+
+
+class FakeEmailProvider:
+    """Keeps sent emails in memory and logs them instead of sending them, for local development and tests."""
+
+    def __init__(self):
+        self.sent: list[dict] = []
+
+    def send_batch(self, messages: list[dict]) -> None:
+        for message in messages:
+            logger.info("Fake email to %s: %s", ", ".join(message["to"]), message["subject"])
+        self.sent.extend(messages)
+
+
+def create_provider():
+    """Creates the email provider described by the settings."""
+    if settings.email_provider == "resend":
+        return ResendProvider()
+    if settings.email_provider == "fake":
+        return FakeEmailProvider()
+    raise ValueError(f"Unknown email_provider '{settings.email_provider}'.")
+
+
+def to_message(job: EmailJob) -> dict:
+    """Builds the provider payload for a queued email."""
+    return {"from": FROM_ADDRESS, "to": [job.to], "subject": job.subject, "html": job.html}
+
+
+def retry_delay(attempts: int) -> float:
+    """Returns the backoff before the next attempt, doubling per attempt up to a cap, with jitter."""
+    delay = min(settings.email_retry_max_seconds, settings.email_retry_base_seconds * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def claim_jobs(session: AsyncSession, limit: int) -> list[EmailJob]:
+    """Claims the next due jobs for this worker and counts the attempt."""
+    now = datetime.now(timezone.utc)
+    due = (
+        select(EmailJob.id)
+        .where(EmailJob.run_after <= now)
+        .order_by(EmailJob.run_after)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    statement = (
+        update(EmailJob)
+        .where(EmailJob.id.in_(due.scalar_subquery()))
+        .values(
+            attempts=EmailJob.attempts + 1,
+            run_after=now + timedelta(seconds=settings.email_claim_lease_seconds),
+        )
+        .returning(EmailJob)
+    )
+    result = await session.scalars(statement, execution_options={"synchronize_session": False})
+    jobs = result.all()
+    await session.commit()
+    return jobs
+
+
+async def deliver(provider, jobs: list[EmailJob]) -> dict[int, str]:
+    """
+    Sends the jobs through the provider and returns the errors by job id.
+    A batch is all or nothing, so when it fails each email is retried on its own to find
+    the ones that actually fail instead of failing the whole batch.
+    """
+    try:
+        await asyncio.to_thread(provider.send_batch, [to_message(job) for job in jobs])
+        return {}
+    except Exception as exc:
+        if len(jobs) == 1:
+            return {jobs[0].id: repr(exc)}
+    errors = {}
+    for job in jobs:
+        try:
+            await asyncio.to_thread(provider.send_batch, [to_message(job)])
+        except Exception as exc:
+            errors[job.id] = repr(exc)
+    return errors
+
+
+async def record_results(session: AsyncSession, jobs: list[EmailJob], errors: dict[int, str]) -> None:
+    """Deletes the sent jobs, reschedules the failed ones and dead-letters those out of attempts."""
+    now = datetime.now(timezone.utc)
+    sent = [job.id for job in jobs if job.id not in errors]
+    if sent:
+        await session.execute(delete(EmailJob).where(EmailJob.id.in_(sent)))
+    for job in jobs:
+        error = errors.get(job.id)
+        if error is None:
+            continue
+        if job.attempts >= settings.email_max_attempts:
+            logger.error("Email %s to %s failed %s times, moving it to the dead letter table: %s", job.id, job.to, job.attempts, error)
+            session.add(EmailDeadLetter(
+                to=job.to,
+                subject=job.subject,
+                html=job.html,
+                attempts=job.attempts,
+                last_error=error,
+                created_at=job.created_at,
+            ))
+            await session.execute(delete(EmailJob).where(EmailJob.id == job.id))
+        else:
+            logger.warning("Email %s to %s failed on attempt %s: %s", job.id, job.to, job.attempts, error)
+            await session.execute(
+                update(EmailJob)
+                .where(EmailJob.id == job.id)
+                .values(run_after=now + timedelta(seconds=retry_delay(job.attempts)), last_error=error)
+            )
+    await session.commit()
+
+
+async def process_batch(sessionmaker: async_sessionmaker[AsyncSession], provider) -> int:
+    """Claims, sends and records one batch of jobs, returning how many were claimed."""
+    async with sessionmaker() as session:
+        jobs = await claim_jobs(session, settings.email_batch_size)
+    if not jobs:
+        return 0
+    errors = await deliver(provider, jobs)
+    async with sessionmaker() as session:
+        await record_results(session, jobs, errors)
+    return len(jobs)
+
+
+async def run_worker(sessionmaker: async_sessionmaker[AsyncSession], provider) -> None:
+    """Drains the queue forever, sleeping between polls whenever it runs out of due jobs."""
+    logger.info("Email worker started")
+    while True:
+        try:
+            claimed = await process_batch(sessionmaker, provider)
+        except Exception:
+            # The database may be restarting, try again after the poll interval
+            logger.exception("Email worker could not process a batch")
+            claimed = 0
+        if claimed < settings.email_batch_size:
+            await asyncio.sleep(settings.email_worker_poll_seconds)
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.core.emails, runs the worker that sends queued emails
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run_worker(AsyncSessionLocal, create_provider()))
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from PIL import Image, ImageOps
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# This file generates resized derivatives of uploaded images.
+# Every image stored under app/static gets fixed-width variants written next to it in a
+# "variants" folder, e.g. images/listings/<hash>.jpg -> images/listings/variants/<hash>-grid.webp.
+# The names are derived from the original path, so response models can build the variant URLs
+# without a database lookup. Resizing runs in a process pool so it never blocks the API workers.
+# Only variants that exist on disk are advertised: a variant that failed or was never generated,
+# such as those of images uploaded before this pipeline until `make images-backfill` runs, is
+# replaced by the URL of the original image.
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = Path(__file__).resolve().parents[1] / "static"
+
+VARIANTS_DIRNAME = "variants"
+
+# Variant name -> (width in pixels, square crop)
+LISTING_VARIANTS = {
+    "grid": (400, False),
+    "detail": (1200, False),
+}
+PROFILE_VARIANTS = {
+    "avatar": (160, True),
+}
+
+_pool: ProcessPoolExecutor | None = None
+
+# Whether each variant file exists, checked again after a minute so new variants show up
+variant_files = TTLCache(maxsize=10000, ttl=60.0)
+
+
+def variant_path(image: str, name: str) -> str:
+    """Returns the static path of a variant for an image path stored on a model."""
+    folder, _, filename = image.rpartition("/")
+    stem = filename.rsplit(".", 1)[0]
+    return f"{folder}/{VARIANTS_DIRNAME}/{stem}-{name}.{settings.image_variant_format}"
+
+
+def variant_exists(path: str) -> bool:
+    """Checks whether a variant was written, remembering the answer for a minute."""
+    exists = variant_files.get(path)
+    if exists is None:
+        exists = (STATIC_DIR / path).is_file()
+        variant_files.set(path, exists)
+    return exists
+
+
+def variant_urls(image: str | None, variants: dict) -> dict[str, str] | None:
+    """
+    Returns a map of variant name to URL, suitable for building a srcset on the frontend.
+    Variants that do not exist point at the original image instead.
+    """
+    if image is None:
+        return None
+    urls = {}
+    for name in variants:
+        path = variant_path(image, name)
+        urls[name] = f"{settings.base_url}/static/{path if variant_exists(path) else image}"
+    return urls
+
+
+def render_variants(source: str, image: str, variants: dict) -> list[str]:
+    """
+    Writes every missing variant of one image and returns the paths that were created.
+    This runs inside a pool process. Re-encoding drops the EXIF block, and the orientation
+    it stored is applied to the pixels first so phone photos are not rotated.
+    """
+    created = []
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            has_alpha = original.mode in ("LA", "PA") or "transparency" in original.info
+            original = original.convert("RGBA" if has_alpha else "RGB")
+        for name, (width, square) in variants.items():
+            target = STATIC_DIR / variant_path(image, name)
+            if target.exists():
+                continue
+            if square:
+                resized = ImageOps.fit(original, (width, width), Image.Resampling.LANCZOS)
+            else:
+                height = max(1, round(original.height * min(1, width / original.width)))
+                resized = original.resize((min(width, original.width), height), Image.Resampling.LANCZOS)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Write under a temporary name so a half-written variant is never served
+            temp = target.with_name(f".{target.name}.{os.getpid()}")
+            resized.save(temp, format=settings.image_variant_format.upper(), quality=settings.image_variant_quality)
+            os.replace(temp, target)
+            created.append(str(target))
+    return created
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Returns the process pool used for image work, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.image_workers)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    """Stops the pool processes, called when the app shuts down."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def generate_variants(image: str, variants: dict) -> None:
+    """
+    Generates the variants of an image stored under app/static in the process pool.
+    Failures are logged rather than raised, since the original image is still usable.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(
+            get_pool(),
+            render_variants,
+            str(STATIC_DIR / image),
+            image,
+            variants,
+        )
+    except Exception:
+        logger.exception("Could not generate variants for %s", image)
+        return
+    for name in variants:
+        variant_files.set(variant_path(image, name), True)
+
+
+def backfill(folder: str, variants: dict) -> None:
+    """Generates variants for every image already in a folder under app/static."""
+    directory = STATIC_DIR / folder
+    for path in sorted(directory.iterdir()):
+        if not path.is_file() or path.name.startswith("."):
+            continue
+        try:
+            created = render_variants(str(path), f"{folder}/{path.name}", variants)
+        except OSError as exc:
+            print(f"Skipping {path.name}: {exc}")
+            continue
+        for target in created:
+            print(f"Created {target}")
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.core.images, to create variants for images uploaded before this pipeline existed
+    backfill("images/listings", LISTING_VARIANTS)
+    backfill("images/profile", PROFILE_VARIANTS)
@@ -0,0 +1,235 @@
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from app.core.config import settings
+from app.core.metrics import Histogram, render_counter, render_histogram
+
+# This file measures where the time of each request goes.
+# InstrumentationMiddleware gives every request a RequestMetrics in a context variable. The SQLAlchemy
+# hooks in app/db/queries.py add each statement's duration and row count to it, and the code that
+# encodes response bodies wraps that work in measure_serialization(). Responses made by FastAPI's own
+# response_model encoding are not covered, only the cached and projection-encoded ones.
+#
+# The numbers come out three ways: a Server-Timing header on every response, which browser dev tools
+# show next to the request and which is only turned on in development; per-route counters and
+# histograms on GET /metrics in the Prometheus text format, for administrators and the metrics token;
+# and one structured log line per request. Requests that run more than
+# settings.n_plus_one_query_threshold statements are logged as likely N+1 patterns together with the
+# statement they repeated most. Like the pool metrics, the counters are kept per worker process.
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger("app.requests")
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+
+# Buckets for the number of statements per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestMetrics:
+    """What one request spent its time on."""
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.serialize_seconds = 0.0
+        self.serialize_depth = 0
+        self.statements = Counter()
+
+    def record_query(self, statement: str, seconds: float, rows: int) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        self.rows += rows
+        self.statements[statement] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def route(self) -> str:
+        return route_label(self.scope) if self.scope is not None else "background"
+
+
+# A mutable object rather than plain numbers, so statements run in copied contexts still add to it
+current_metrics: ContextVar[RequestMetrics | None] = ContextVar("current_metrics", default=None)
+
+
+@contextmanager
+def measure_serialization() -> Iterator[None]:
+    """Adds the time spent in the block to the current request's serialization time. Nested blocks count once."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    metrics.serialize_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_depth -= 1
+        if metrics.serialize_depth == 0:
+            metrics.serialize_seconds += time.perf_counter() - start
+
+
+class RequestStats:
+    """Per-route counters and histograms of the requests this worker has handled."""
+
+    def __init__(self):
+        self.requests: dict[tuple, int] = defaultdict(int)
+        self.duration: dict[tuple, Histogram] = defaultdict(Histogram)
+        self.db_time: dict[tuple, Histogram] = defaultdict(Histogram)
+        self.serialize_time: dict[tuple, Histogram] = defaultdict(Histogram)
+        self.queries: dict[tuple, Histogram] = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.rows: dict[tuple, int] = defaultdict(int)
+        self.n_plus_one: dict[tuple, int] = defaultdict(int)
+
+    def record(self, method: str, route: str, status: int, seconds: float, metrics: RequestMetrics) -> None:
+        key = (method, route)
+        self.requests[(method, route, str(status))] += 1
+        self.duration[key].observe(seconds)
+        self.db_time[key].observe(metrics.db_seconds)
+        self.serialize_time[key].observe(metrics.serialize_seconds)
+        self.queries[key].observe(metrics.queries)
+        self.rows[key] += metrics.rows
+
+    def render(self) -> list[str]:
+        """Returns the Prometheus text format lines for these stats."""
+        labels = ("method", "route")
+        return [
+            *render_counter("http_requests_total", "Requests handled by this worker.", self.requests, ("method", "route", "status")),
+            *render_histogram("http_request_duration_seconds", "Time until the response finished.", self.duration, labels),
+            *render_histogram("http_request_db_seconds", "Time spent running SQL statements per request.", self.db_time, labels),
+            *render_histogram("http_request_serialize_seconds", "Time spent encoding response bodies per request.", self.serialize_time, labels),
+            *render_histogram("http_request_db_queries", "SQL statements run per request.", self.queries, labels),
+            *render_counter("http_request_db_rows_total", "Rows returned or changed by SQL statements.", self.rows, labels),
+            *render_counter("http_request_n_plus_one_total", "Requests that ran more statements than the N+1 threshold.", self.n_plus_one, labels),
+        ]
+
+
+request_stats = RequestStats()
+
+
+def route_label(scope) -> str:
+    """Returns the path template of the matched route, so metrics are not split per listing id."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def server_timing(metrics: RequestMetrics) -> str:
+    """Builds the Server-Timing header value, with durations in milliseconds."""
+    return (
+        f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} queries", '
+        f"serialize;dur={metrics.serialize_seconds * 1000:.1f}, "
+        f"total;dur={metrics.elapsed() * 1000:.1f}"
+    )
+
+
+def finish_request(scope, status: int, metrics: RequestMetrics) -> None:
+    """Records a finished request in the stats and the request log, and flags likely N+1 patterns."""
+    seconds = metrics.elapsed()
+    method, route = scope["method"], route_label(scope)
+    request_stats.record(method, route, status, seconds, metrics)
+    fields = {
+        "method": method,
+        "path": scope["path"],
+        "route": route,
+        "status": status,
+        "duration_ms": round(seconds * 1000, 2),
+        "db_ms": round(metrics.db_seconds * 1000, 2),
+        "queries": metrics.queries,
+        "rows": metrics.rows,
+        "serialize_ms": round(metrics.serialize_seconds * 1000, 2),
+    }
+    if settings.log_requests:
+        request_logger.info("request", extra={"fields": fields})
+
+    threshold = settings.n_plus_one_query_threshold
+    if threshold and metrics.queries > threshold:
+        request_stats.n_plus_one[(method, route)] += 1
+        statement, repeats = metrics.statements.most_common(1)[0]
+        logger.warning(
+            "Possible N+1 query pattern",
+            extra={"fields": {**fields, "repeated_statement": " ".join(statement.split())[:500], "repeats": repeats}},
+        )
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware that measures each request and reports the numbers as described above."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics(scope)
+        token = current_metrics.set(metrics)
+        # Stays 500 if the app fails before it starts a response
+        status = 500
+
+        async def send_with_timings(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                # Streamed responses keep working after this point, so their header only covers the setup
+                if settings.server_timing_header:
+                    headers.append((b"server-timing", server_timing(metrics).encode()))
+                if settings.db_query_count_header:
+                    headers.append((QUERY_COUNT_HEADER.lower().encode(), str(metrics.queries).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            current_metrics.reset(token)
+            finish_request(scope, status, metrics)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as one JSON object per line, including any fields passed as extra={"fields": ...}."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The plain log format, with any extra fields appended as key=value pairs."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{name}={value}" for name, value in fields.items())
+        return line
+
+
+def configure_logging() -> None:
+    """Sends the logs of every app.* logger to stderr in the format from settings.log_format."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if settings.log_format == "json" else TextFormatter())
+    app_logger = logging.getLogger("app")
+    app_logger.handlers = [handler]
+    app_logger.setLevel(settings.log_level.upper())
+    app_logger.propagate = False
@@ -0,0 +1,248 @@
+import asyncio
+import contextvars
+import json
+import logging
+from collections import Counter
+from collections.abc import AsyncIterator, Iterable
+from pydantic_core import to_json
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import render_counter
+from app.core.serialization import USER_LISTING_PROJECTION
+from app.db.database import AsyncSessionLocal
+from app.db.notifications import listen
+from app.models.listing import Listing, ListingStatus
+from app.models.user import User
+from app.schemas.listing import ListingFilters, enum_label
+from app.schemas.pagination import SyncToken, encode_sync_token
+
+# This file pushes listing changes to clients as server-sent events, for GET /listings/stream.
+# Writes call notify_listing_changes() inside their transaction, which sends the changed ids on the
+# listing_events channel with pg_notify. Postgres only delivers a notification once its transaction
+# commits, so rolled back writes and dry runs send nothing.
+#
+# Each worker has one ListingEventHub, which holds one LISTEN connection of its own rather than one
+# from the pool, opened when its first subscriber connects. Notifications
+# that arrive together are merged and their listings loaded in one query, each event is encoded
+# once, and the bytes are shared by every subscriber whose filters match. Subscribers are grouped
+# by filter set, so the filters are checked once per set rather than once per connection.
+#
+# An idle connection is a coroutine waiting on its queue and nothing else: the heartbeat is a single
+# task for the whole hub. Queues are bounded. A client that falls settings.listing_stream_queue_size
+# events behind has its backlog dropped for one resync event, as does everyone after the LISTEN
+# connection was lost. A resync, like the id of every event, carries a sync token for
+# GET /listings/changes, which sends whatever the client missed.
+
+LISTING_EVENTS_CHANNEL = "listing_events"
+
+# Ids per notification, which keeps payloads well under the 8000 byte limit of pg_notify
+NOTIFY_BATCH_SIZE = 500
+
+HEARTBEAT = b": ping\n\n"
+
+logger = logging.getLogger(__name__)
+
+
+async def notify_listing_changes(session: AsyncSession, change: str, listing_ids: Iterable[int]) -> None:
+    """
+    Queues a notification for listings that were created or updated in the session's transaction.
+    change is "created" or "updated". Status changes are updates, the stream turns listings that left
+    ACTIVE status into removed events.
+    """
+    listing_ids = list(listing_ids)
+    for start in range(0, len(listing_ids), NOTIFY_BATCH_SIZE):
+        payload = json.dumps({"change": change, "ids": listing_ids[start:start + NOTIFY_BATCH_SIZE]}, separators=(",", ":"))
+        await session.execute(select(func.pg_notify(LISTING_EVENTS_CHANNEL, payload)))
+
+
+def format_event(event: str, data: bytes, event_id: str | None = None) -> bytes:
+    """Encodes one server-sent event. data is JSON, which never contains a raw newline."""
+    lines = [b"event: " + event.encode()]
+    if event_id is not None:
+        lines.append(b"id: " + event_id.encode())
+    lines.append(b"data: " + data)
+    return b"\n".join(lines) + b"\n\n"
+
+
+def resync_event(sync_token: str | None) -> bytes:
+    """Tells a client it may have missed events and should catch up through GET /listings/changes."""
+    return format_event("resync", to_json({"sync_token": sync_token}))
+
+
+def matches(filters: ListingFilters, row) -> bool:
+    """
+    Checks a listing against a subscriber's filters, the same ones GET /listings takes.
+    The keyword is matched in Python as words that all appear in the title or description, which
+    is close to the full-text search of GET /listings without a query per event.
+    """
+    if filters.category is not None and row.category != filters.category:
+        return False
+    if filters.condition is not None and row.condition != filters.condition:
+        return False
+    if filters.min_price is not None and row.price_cents < filters.min_price:
+        return False
+    if filters.max_price is not None and row.price_cents > filters.max_price:
+        return False
+    if filters.keyword:
+        text = f"{row.title} {row.description or ''}".lower()
+        return all(word in text for word in filters.keyword.split())
+    return True
+
+
+class Subscription:
+    """One client of GET /listings/stream, with its filters and its bounded queue of encoded events."""
+
+    def __init__(self, hub: "ListingEventHub", filters: ListingFilters):
+        self.hub = hub
+        self.filters = filters
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=settings.listing_stream_queue_size)
+
+    def offer(self, message: bytes) -> None:
+        """Queues an event, or replaces the backlog with a resync when the client has fallen behind."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(resync_event(None))
+            self.hub.dropped += 1
+
+    async def events(self, last_event_id: str | None = None) -> AsyncIterator[bytes]:
+        """Yields the encoded events until the client disconnects, which cancels the wait."""
+        try:
+            yield f"retry: {settings.listing_stream_retry_ms}\n\n".encode()
+            if last_event_id:
+                # A reconnect: everything after the last event it saw comes from GET /listings/changes
+                yield resync_event(last_event_id)
+            while True:
+                yield await self.queue.get()
+        finally:
+            self.hub.unsubscribe(self)
+
+
+class ListingEventHub:
+    """Receives the listing notifications of one worker and fans them out to its stream subscribers."""
+
+    def __init__(self):
+        self.groups: dict[ListingFilters, set[Subscription]] = {}
+        self.subscribers = 0
+        self.dropped = 0
+        self.events: Counter[str] = Counter()
+        self._pending: asyncio.Queue[str] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    def subscribe(self, filters: ListingFilters) -> Subscription | None:
+        """Adds a subscriber, or returns None once the worker has settings.listing_stream_max_subscribers."""
+        if self.subscribers >= settings.listing_stream_max_subscribers:
+            return None
+        subscription = Subscription(self, filters)
+        self.groups.setdefault(filters, set()).add(subscription)
+        self.subscribers += 1
+        if not self._tasks:
+            # A fresh context, so the tasks do not carry the request metrics of the request that started them
+            self._tasks = [
+                asyncio.create_task(coroutine, context=contextvars.Context())
+                for coroutine in (self._listen(), self._dispatch(), self._heartbeat())
+            ]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        group = self.groups.get(subscription.filters)
+        if group is None or subscription not in group:
+            return
+        group.discard(subscription)
+        if not group:
+            del self.groups[subscription.filters]
+        self.subscribers -= 1
+
+    async def stop(self) -> None:
+        """Closes the LISTEN connection and stops the background tasks, called when the app shuts down."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def broadcast(self, message: bytes) -> None:
+        for group in self.groups.values():
+            for subscription in group:
+                subscription.offer(message)
+
+    async def _listen(self) -> None:
+        """Keeps a LISTEN connection open. Notifications sent while it was down are gone, so clients resync."""
+        await listen(LISTING_EVENTS_CHANNEL, self._pending.put_nowait, lambda: self.broadcast(resync_event(None)))
+
+    async def _dispatch(self) -> None:
+        """Turns batches of notifications into events, so a burst of writes costs one query."""
+        while True:
+            payloads = [await self._pending.get()]
+            while not self._pending.empty():
+                payloads.append(self._pending.get_nowait())
+            if not self.subscribers:
+                continue
+            created, updated = set(), set()
+            for payload in payloads:
+                try:
+                    notification = json.loads(payload)
+                    (created if notification["change"] == "created" else updated).update(notification["ids"])
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("Ignoring a malformed listing notification: %s", payload)
+            try:
+                await self._publish(created, updated - created)
+            except Exception:
+                logger.exception("Could not publish %d listing events", len(created) + len(updated))
+                self.broadcast(resync_event(None))
+
+    async def _publish(self, created: set[int], updated: set[int]) -> None:
+        statement = (
+            select(*USER_LISTING_PROJECTION.columns(Listing.status, Listing.updated_at))
+            .join(User, Listing.seller_id == User.id)
+            .where(Listing.id.in_(created | updated))
+            .order_by(Listing.updated_at, Listing.id)
+        )
+        # The primary, since a replica may not have the rows of a notification yet
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(statement)).all()
+
+        events = []
+        for row in rows:
+            event_id = encode_sync_token(SyncToken(updated_at=row.updated_at, id=row.id))
+            if row.status == ListingStatus.ACTIVE:
+                event = "created" if row.id in created else "updated"
+                data = to_json(USER_LISTING_PROJECTION.to_dict(row))
+            elif row.id in updated:
+                event = "removed"
+                data = to_json({"id": row.id, "status": enum_label(row.status), "updated_at": row.updated_at})
+            else:
+                # Created as a draft or inactive, nothing to show or remove yet
+                continue
+            events.append((row, format_event(event, data, event_id)))
+            self.events[event] += 1
+
+        for filters, group in list(self.groups.items()):
+            for row, message in events:
+                if matches(filters, row):
+                    for subscription in list(group):
+                        subscription.offer(message)
+
+    async def _heartbeat(self) -> None:
+        """Sends a comment to every subscriber on an interval, so proxies keep idle streams open."""
+        while True:
+            await asyncio.sleep(settings.listing_stream_heartbeat_seconds)
+            for group in list(self.groups.values()):
+                for subscription in group:
+                    # A full queue already has data on the way, so it does not need a heartbeat
+                    if not subscription.queue.full():
+                        subscription.queue.put_nowait(HEARTBEAT)
+
+
+listing_events = ListingEventHub()
+
+
+def render_listing_event_metrics() -> list[str]:
+    """Returns the listing stream metrics of this worker in the Prometheus text format."""
+    return [
+        *render_counter("listing_stream_subscribers", "Open GET /listings/stream connections.", {(): listing_events.subscribers}, (), kind="gauge"),
+        *render_counter("listing_stream_events_total", "Listing events published, by event.", {(event,): count for event, count in listing_events.events.items()}, ("event",)),
+        *render_counter("listing_stream_resyncs_total", "Backlogs dropped for a resync because a client fell behind.", {(): listing_events.dropped}, ()),
+    ]
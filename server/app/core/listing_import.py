@@ -0,0 +1,284 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import uuid
+from collections.abc import Iterator
+from pathlib import Path
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.images import generate_variants, LISTING_VARIANTS
+from app.core.listing_events import notify_listing_changes
+from app.core.uploads import StagedUpload, stage_upload
+from app.models.listing import Listing
+from app.schemas.listing import ListingImportRow
+
+# This file imports many listings from one manifest, for sellers moving a lot of items at once
+# and for loading seed data like scripts/init.sql.
+# The manifest is JSONL (one object per line) or CSV (a header row naming the columns), and images
+# are uploaded next to it and referenced by filename. The manifest is read and validated
+# settings.listing_import_batch_size rows at a time in the threadpool, and the valid rows of each
+# batch go to Postgres as one multi-row INSERT ... RETURNING, so memory stays bounded and the
+# database sees a few large statements instead of a commit and a re-SELECT per listing.
+# Invalid rows are reported with their errors and do not stop the rest of the import.
+# Images are staged concurrently when the first batch using them is read, so images that no imported
+# row uses (after a truncated manifest, say) are never read or written. They are published once the
+# batch using them is committed, and their variants are generated together in the image process pool
+# at the end.
+
+IMPORT_FORMATS = {
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".csv": "csv",
+}
+
+IMPORT_CONTENT_TYPES = {
+    "application/jsonl": "jsonl",
+    "application/x-ndjson": "jsonl",
+    "application/x-jsonlines": "jsonl",
+    "text/csv": "csv",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def manifest_format(manifest: UploadFile, requested: str | None) -> str:
+    """
+    Picks the manifest format from the format form field, the file extension or the content type,
+    in that order. Raises a 400 Bad Request error when none of them names a supported format.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested == "ndjson":
+            requested = "jsonl"
+        if requested not in ("jsonl", "csv"):
+            raise HTTPException(status_code=400, detail=f"Unsupported manifest format '{requested}'.")
+        return requested
+    detected = IMPORT_FORMATS.get(Path(manifest.filename or "").suffix.lower())
+    detected = detected or IMPORT_CONTENT_TYPES.get((manifest.content_type or "").split(";")[0].strip())
+    if detected is None:
+        raise HTTPException(status_code=400, detail="The manifest must be a .jsonl or .csv file.")
+    return detected
+
+
+class ManifestReader:
+    """
+    Reads a manifest row by row from the uploaded file, which Starlette has already spooled to
+    memory or disk. read_batch() blocks on file reads, so it is called in the threadpool.
+    Each row is returned with its row number, counting data rows from 1, and either the raw
+    dict or the reason it could not be parsed.
+    """
+
+    def __init__(self, file, format: str):
+        self.text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        self.rows = self._csv_rows() if format == "csv" else self._jsonl_rows()
+
+    def read_batch(self, size: int) -> list[tuple[int, dict | str]]:
+        batch = []
+        for row in self.rows:
+            batch.append(row)
+            if len(batch) >= size:
+                break
+        return batch
+
+    def close(self) -> None:
+        # Leaves the upload's file open, FastAPI closes it with the request
+        self.text.detach()
+
+    def _csv_rows(self) -> Iterator[tuple[int, dict | str]]:
+        reader = csv.DictReader(self.text)
+        try:
+            for number, row in enumerate(reader, start=1):
+                if None in row:
+                    yield number, f"Row has {len(reader.fieldnames) + len(row[None])} columns, the header has {len(reader.fieldnames)}"
+                else:
+                    # Short rows fill the missing columns with None, leave them out so they count as missing
+                    yield number, {key: value for key, value in row.items() if value is not None}
+        except (csv.Error, UnicodeDecodeError) as error:
+            yield reader.line_num, f"Could not read the CSV: {error}"
+
+    def _jsonl_rows(self) -> Iterator[tuple[int, dict | str]]:
+        number = 0
+        try:
+            for line in self.text:
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as error:
+                    yield number, f"Invalid JSON: {error.msg}"
+                    continue
+                yield number, row if isinstance(row, dict) else "Each line must be a JSON object"
+        except UnicodeDecodeError as error:
+            yield number + 1, f"Could not read the manifest: {error}"
+
+
+def validation_errors(error: ValidationError) -> list[str]:
+    """Flattens a Pydantic error into one "field: message" string per problem."""
+    return [
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+        for detail in error.errors(include_url=False)
+    ]
+
+
+def index_images(images: list[UploadFile]) -> tuple[dict[str, UploadFile], dict[str, str]]:
+    """
+    Keys the uploaded images by filename without reading them. Returns the images and the reason each
+    refused filename cannot be used, so only the rows using it fail.
+    """
+    uploads, rejected = {}, {}
+    for image in images:
+        name = image.filename or ""
+        if name in uploads or name in rejected:
+            uploads.pop(name, None)
+            rejected[name] = f"More than one image named '{name}' was uploaded"
+        else:
+            uploads[name] = image
+    return uploads, rejected
+
+
+async def stage_images(
+    uploads: dict[str, UploadFile],
+    names: set[str],
+    directory: Path,
+    staged: dict[str, StagedUpload],
+    rejected: dict[str, str],
+) -> None:
+    """
+    Stages the named images into directory concurrently, the first time a batch uses them, and adds each
+    to staged or, with the reason it was refused, to rejected. Images no valid row uses are never read.
+    """
+    names = [name for name in names if name in uploads and name not in staged and name not in rejected]
+    outcomes = await asyncio.gather(
+        *(stage_upload(uploads[name], directory, "images/listings") for name in names),
+        return_exceptions=True,
+    )
+    failure = None
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, HTTPException):
+            rejected[name] = outcome.detail
+        elif isinstance(outcome, BaseException):
+            failure = failure or outcome
+        else:
+            # Kept even when another image failed, so the caller discards it
+            staged[name] = outcome
+    if failure is not None:
+        raise failure
+
+
+async def discard_all(uploads) -> None:
+    await asyncio.gather(*(upload.discard() for upload in uploads))
+
+
+async def insert_batch(session: AsyncSession, values: list[dict]) -> list[int]:
+    """
+    Inserts a batch of listings and returns their ids in the order of values.
+    SQLAlchemy sends the rows as multi-row INSERT ... VALUES ... RETURNING statements of up to
+    1000 rows each and sort_by_parameter_order matches the returned ids to the rows.
+    """
+    result = await session.execute(
+        insert(Listing).returning(Listing.id, sort_by_parameter_order=True),
+        values,
+    )
+    ids = list(result.scalars())
+    await notify_listing_changes(session, "created", ids)
+    await session.commit()
+    return ids
+
+
+async def import_listings(
+    session: AsyncSession,
+    seller_id: uuid.UUID,
+    manifest: UploadFile,
+    format: str,
+    images: list[UploadFile],
+    directory: Path,
+) -> dict:
+    """
+    Creates a listing for every valid manifest row and returns one result per row, in order,
+    with the new listing's id or the row's errors. Images are stored in directory.
+    """
+    uploads, rejected = index_images(images)
+    staged: dict[str, StagedUpload] = {}
+    published: set[str] = set()
+    results = []
+    truncated = False
+    reader = ManifestReader(manifest.file, format)
+    try:
+        while not truncated:
+            batch = await run_in_threadpool(reader.read_batch, settings.listing_import_batch_size)
+            if not batch:
+                break
+            room = settings.listing_import_max_rows - len(results)
+            if len(batch) > room:
+                batch, truncated = batch[:room], True
+
+            valid = []
+            for number, raw in batch:
+                result = {"row": number, "id": None, "errors": []}
+                results.append(result)
+                if isinstance(raw, str):
+                    result["errors"].append(raw)
+                    continue
+                try:
+                    valid.append((result, ListingImportRow.model_validate(raw)))
+                except ValidationError as error:
+                    result["errors"].extend(validation_errors(error))
+            await stage_images(uploads, {row.image for _, row in valid if row.image}, directory, staged, rejected)
+
+            rows, values = [], []
+            for result, row in valid:
+                if row.image is not None and row.image not in staged:
+                    result["errors"].append(
+                        f"image: {rejected.get(row.image, f'No image named {row.image!r} was uploaded')}"
+                    )
+                    continue
+                rows.append((result, row))
+                values.append({
+                    "title": row.title,
+                    "seller_id": seller_id,
+                    "description": row.description,
+                    "price_cents": row.price_cents,
+                    "status": row.status,
+                    "category": row.category,
+                    "condition": row.condition,
+                    "image": staged[row.image].relative_path if row.image else None,
+                })
+
+            if not values:
+                continue
+            try:
+                ids = await insert_batch(session, values)
+            except SQLAlchemyError:
+                await session.rollback()
+                logger.exception("Listing import batch of %d rows failed", len(values))
+                for result, _ in rows:
+                    result["errors"].append("The listing could not be saved")
+                continue
+            for (result, row), listing_id in zip(rows, ids):
+                result["id"] = listing_id
+                if row.image is not None and row.image not in published:
+                    await staged[row.image].commit()
+                    published.add(row.image)
+    finally:
+        reader.close()
+        await discard_all(upload for name, upload in staged.items() if name not in published)
+
+    # Different filenames with the same content share one stored image
+    stored = {staged[name].relative_path for name in published}
+    await asyncio.gather(*(generate_variants(image, LISTING_VARIANTS) for image in stored))
+    created = sum(1 for result in results if result["id"] is not None)
+    return {
+        "created": created,
+        "failed": len(results) - created,
+        "truncated": truncated,
+        "results": results,
+    }
+
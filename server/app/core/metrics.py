@@ -0,0 +1,65 @@
+import bisect
+import math
+
+# Default latency buckets in seconds, matching the Prometheus client defaults.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    A fixed-bucket histogram in the style of Prometheus.
+    Each worker process keeps its own counts, so totals are per worker.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Records one observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        """Returns the cumulative bucket counts, with "+Inf" holding the total, plus count and sum."""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip((*self.buckets, math.inf), self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == math.inf else str(bound)] = cumulative
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    """Formats labels as a Prometheus label set."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def render_counter(name: str, help_text: str, samples: dict[tuple, float], label_names: tuple[str, ...], kind: str = "counter") -> list[str]:
+    """Renders counters or gauges keyed by their label values in the Prometheus text format."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for label_values, value in sorted(samples.items()):
+        lines.append(f"{name}{format_labels(dict(zip(label_names, label_values)))} {value}")
+    return lines
+
+
+def render_histogram(name: str, help_text: str, histograms: dict[tuple, Histogram], label_names: tuple[str, ...]) -> list[str]:
+    """Renders histograms keyed by their label values in the Prometheus text format."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for label_values, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, label_values))
+        snapshot = histogram.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f"{name}_bucket{format_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {snapshot['sum']}")
+        lines.append(f"{name}_count{format_labels(labels)} {snapshot['count']}")
+    return lines
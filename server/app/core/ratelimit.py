@@ -0,0 +1,243 @@
+import ipaddress
+import logging
+import math
+import time
+from collections import OrderedDict, defaultdict
+from collections.abc import AsyncIterator
+from typing import Optional
+from fastapi import Depends, HTTPException, Request
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from app.auth.backend import current_user_optional
+from app.core.config import settings
+from app.core.instrumentation import route_label
+from app.core.metrics import render_counter
+from app.db.pool import pool_metrics
+from app.models.user import User
+
+# This file keeps one client from using up the workers and their database connections.
+#
+# Rate limiting: every client has a token bucket that holds up to settings.rate_limit_burst tokens and
+# refills at settings.rate_limit_per_second. Logged in users are keyed by their id, anonymous clients by
+# their IP, which is read from X-Forwarded-For only when the request came through one of
+# settings.rate_limit_trusted_proxies. Each request costs tokens according to its route (settings.rate_limit_route_costs), plus
+# extra for keyword searches and for every card a page asks for, so a card_num=100 keyword search costs
+# far more than opening one listing. A client whose bucket runs dry gets a 429 with a Retry-After
+# header saying when it will hold enough tokens again. The "memory" backend keeps the buckets per
+# worker; the "redis" backend shares them between workers and fails open if Redis is unreachable,
+# since refusing every request would turn a Redis outage into a full outage.
+#
+# Admission control: expensive requests, those costing at least settings.admission_min_cost, are shed
+# with a 503 and a Retry-After header while the database pool already has too many checkouts waiting
+# for a connection, or while the requests this worker is running already cost too much in total.
+# Cheap requests are always admitted, so browsing keeps working while uploads and exports back off.
+
+logger = logging.getLogger(__name__)
+
+TRUSTED_PROXIES = [ipaddress.ip_network(proxy, strict=False) for proxy in settings.rate_limit_trusted_proxies]
+
+# Refills a bucket, takes the cost if it holds enough tokens and returns {allowed, seconds to wait}.
+# The Redis clock is used so every worker agrees on the time.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+
+class MemoryRateLimitBackend:
+    """
+    Token buckets kept in this worker's memory, bounded to the most recently used clients.
+    Dropping a bucket only refills it early, so the bound never blocks anyone.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        # key -> (tokens, monotonic time they were counted at)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, cost: float, rate: float, capacity: float) -> tuple[bool, float]:
+        """Takes cost tokens from the bucket if it holds enough, and returns whether it did and how long to wait otherwise."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+class RedisRateLimitBackend:
+    """
+    Token buckets shared by every worker, updated atomically by a Lua script in one round trip.
+    Errors are logged and the request is allowed, like the shared response cache backend.
+    """
+
+    def __init__(self, url: str):
+        self.client = Redis.from_url(url)
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, cost: float, rate: float, capacity: float) -> tuple[bool, float]:
+        try:
+            allowed, wait = await self.script(keys=[f"rate-limit:{key}"], args=[rate, capacity, cost])
+        except RedisError:
+            logger.warning("Rate limit check failed for %s", key, exc_info=True)
+            return True, 0.0
+        return bool(allowed), float(wait)
+
+
+class RateLimiter:
+    """Applies the token bucket settings to a backend and counts the requests it refused."""
+
+    def __init__(self, backend: MemoryRateLimitBackend | RedisRateLimitBackend, rate: float, burst: float):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.limited: dict[tuple, int] = defaultdict(int)
+
+    async def take(self, key: str, cost: float) -> tuple[bool, float]:
+        # A request costing more than a full bucket would never be allowed, so it empties the bucket instead
+        return await self.backend.take(key, min(cost, self.burst), self.rate, self.burst)
+
+
+class AdmissionControl:
+    """Tracks the cost of the requests running in this worker and decides which expensive requests to shed."""
+
+    def __init__(self):
+        self.inflight_cost = 0.0
+        self.shed: dict[tuple, int] = defaultdict(int)
+
+    def rejection(self, cost: float) -> Optional[str]:
+        """Returns why a request of this cost cannot be admitted right now, or None to admit it."""
+        if cost < settings.admission_min_cost:
+            return None
+        if settings.admission_max_pool_waiters and pool_metrics.waiting > settings.admission_max_pool_waiters:
+            return "pool"
+        max_cost = settings.admission_max_inflight_cost
+        # A single request is always admitted when nothing else runs, however much it costs
+        if max_cost and self.inflight_cost and self.inflight_cost + cost > max_cost:
+            return "concurrency"
+        return None
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Creates the rate limiter with the backend chosen by settings.rate_limit_backend."""
+    if settings.rate_limit_backend == "memory":
+        backend = MemoryRateLimitBackend(settings.rate_limit_memory_size)
+    elif settings.rate_limit_backend == "redis":
+        backend = RedisRateLimitBackend(settings.redis_url)
+    else:
+        raise ValueError(f"Unknown rate_limit_backend '{settings.rate_limit_backend}'.")
+    return RateLimiter(backend, settings.rate_limit_per_second, settings.rate_limit_burst)
+
+
+rate_limiter = create_rate_limiter()
+admission_control = AdmissionControl()
+
+
+def request_cost(request: Request) -> float:
+    """Returns how many tokens a request costs, from its route and its search and page size parameters."""
+    cost = settings.rate_limit_route_costs.get(f"{request.method} {route_label(request.scope)}", 1.0)
+    if not cost:
+        return 0.0
+    if (request.query_params.get("keyword") or "").strip():
+        cost += settings.rate_limit_keyword_cost
+    card_num = request.query_params.get("card_num")
+    if card_num and card_num.isdigit():
+        cost += int(card_num) * settings.rate_limit_card_cost
+    return cost
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_ip(request: Request) -> str:
+    """
+    Returns the client's IP. When the connection comes from a trusted proxy, X-Forwarded-For is
+    read from the right, skipping the trusted proxies, since anything further left was sent by the
+    client and can be forged. Other clients are keyed by the address they connected from.
+    """
+    address = request.client.host if request.client else "unknown"
+    if not is_trusted_proxy(address):
+        return address
+    forwarded = request.headers.get("x-forwarded-for", "")
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        if not is_trusted_proxy(hop):
+            return hop
+        address = hop
+    return address
+
+
+def retry_after(seconds: float) -> dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+async def limit_requests(
+    request: Request,
+    user: Optional[User] = Depends(current_user_optional),
+) -> AsyncIterator[None]:
+    """
+    Dependency applied to every route in app/main.py that enforces the rate limit and admission control.
+    The route has already been matched when it runs, so costs are looked up by the route's path template.
+    """
+    cost = request_cost(request) if settings.rate_limit_enabled else 0.0
+    if not cost:
+        yield
+        return
+
+    label = (request.method, route_label(request.scope))
+    key = f"user:{user.id}" if user is not None else f"ip:{client_ip(request)}"
+    allowed, wait = await rate_limiter.take(key, cost)
+    if not allowed:
+        rate_limiter.limited[label] += 1
+        raise HTTPException(status_code=429, detail="Too many requests, please slow down.", headers=retry_after(wait))
+
+    reason = admission_control.rejection(cost)
+    if reason is not None:
+        admission_control.shed[(*label, reason)] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="The server is busy, please try again shortly.",
+            headers=retry_after(settings.admission_retry_after_seconds),
+        )
+
+    admission_control.inflight_cost += cost
+    try:
+        yield
+    finally:
+        admission_control.inflight_cost -= cost
+
+
+def render_rate_limit_metrics() -> list[str]:
+    """Returns the rate limit and admission control metrics in the Prometheus text format."""
+    return [
+        *render_counter("http_rate_limited_total", "Requests refused with a 429 by the rate limit.", rate_limiter.limited, ("method", "route")),
+        *render_counter("http_shed_total", "Requests shed with a 503 by admission control.", admission_control.shed, ("method", "route", "reason")),
+        *render_counter("http_inflight_cost", "Total cost of the requests this worker is running.", {(): admission_control.inflight_cost}, (), kind="gauge"),
+    ]
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
+
+# This file contains the upload pipeline for user images.
+# Uploads are streamed in chunks to a temporary file next to their final location, with all disk
+# work done in the threadpool so the event loop is never blocked. The file is named after a hash
+# of its bytes, so identical uploads share one file and different uploads with the same client
+# filename can never overwrite each other. It only becomes visible under its final name once
+# commit() is called, which the routes do after the database row referencing it is committed.
+
+CHUNK_SIZE = 1024 * 1024
+
+ALLOWED_IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif"}
+
+
+@dataclass
+class StagedUpload:
+    """An uploaded file that has been written to a temporary path but not yet published."""
+    temp_path: Path
+    final_path: Path
+    relative_path: str
+    size: int
+
+    async def commit(self) -> None:
+        """
+        Atomically moves the file to its content-addressed name.
+        If a file with the same content already exists, the duplicate is simply dropped.
+        """
+        await run_in_threadpool(self._commit)
+
+    async def discard(self) -> None:
+        """Removes the temporary file, used when the request fails before commit."""
+        await run_in_threadpool(self.temp_path.unlink, missing_ok=True)
+
+    def _commit(self) -> None:
+        if self.final_path.exists():
+            self.temp_path.unlink(missing_ok=True)
+            return
+        os.replace(self.temp_path, self.final_path)
+
+
+async def stage_upload(upload: UploadFile, directory: Path, url_prefix: str) -> StagedUpload:
+    """
+    Streams an uploaded image to a temporary file in directory while hashing it.
+    url_prefix is the path under app/static that the image column stores, e.g. "images/listings".
+    Raises a 400 Bad Request error for unsupported file types and a 413 error once the
+    upload exceeds settings.max_upload_bytes.
+    """
+    suffix = Path(upload.filename or "").suffix.lower()
+    if suffix not in ALLOWED_IMAGE_SUFFIXES:
+        raise HTTPException(status_code=400, detail=f"Unsupported image type '{suffix or upload.filename}'.")
+
+    temp_file = await run_in_threadpool(
+        tempfile.NamedTemporaryFile, dir=directory, prefix=".upload-", suffix=suffix, delete=False
+    )
+    temp_path = Path(temp_file.name)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while chunk := await upload.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > settings.max_upload_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Image is larger than the upload limit of {settings.max_upload_bytes} bytes.",
+                )
+            digest.update(chunk)
+            await run_in_threadpool(temp_file.write, chunk)
+        await run_in_threadpool(_flush_and_close, temp_file)
+    except BaseException:
+        await run_in_threadpool(temp_file.close)
+        await run_in_threadpool(temp_path.unlink, missing_ok=True)
+        raise
+    finally:
+        await upload.close()
+
+    name = f"{digest.hexdigest()}{suffix}"
+    return StagedUpload(
+        temp_path=temp_path,
+        final_path=directory / name,
+        relative_path=f"{url_prefix}/{name}",
+        size=size,
+    )
+
+
+def _flush_and_close(file) -> None:
+    """Makes sure the bytes are on disk before the file can be renamed into place."""
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
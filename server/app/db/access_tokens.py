@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import random
+import sys
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import delete, select, text, tuple_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from app.core.config import settings
+from app.db.database import engine
+from app.models.access_token import AccessToken, token_cutoff
+
+# This file removes expired rows from the accesstoken table, which fastapi-users never deletes.
+#
+# Every worker runs a TokenPurger, but a Postgres advisory lock lets only one of them purge at a
+# time. Expired rows are deleted in batches of settings.access_token_purge_batch_size, each in its
+# own short transaction with FOR UPDATE SKIP LOCKED, so a large backlog never holds locks for long
+# and never blocks a login or logout touching the same rows.
+#
+# The table can also be range partitioned by created_at, one partition per UTC day, with
+# `python -m app.db.access_tokens partition`. Partitioning is optional and changes nothing for the
+# app: the purge then creates the partitions for the next few days ahead of time and drops whole
+# partitions once every token in them has expired, which is O(1) instead of a DELETE per row. The
+# rows left over in the partitions that are still partly live are deleted in batches as above.
+# `python -m app.db.access_tokens unpartition` turns it back into a plain table.
+
+logger = logging.getLogger(__name__)
+
+# Key of the advisory lock that keeps two workers from purging at the same time
+PURGE_LOCK_ID = 7305_2001
+
+PARTITION_PREFIX = "accesstoken_p"
+
+# How long DDL on accesstoken waits for its lock before giving up until the next run, so
+# partition maintenance never queues logins behind it
+DDL_LOCK_TIMEOUT = "2s"
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def partition_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, time(), tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+async def is_partitioned(connection: AsyncConnection) -> bool:
+    return bool(await connection.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('accesstoken'))"
+    )))
+
+
+async def partition_days(connection: AsyncConnection) -> list[date]:
+    """Returns the days that have a partition, read from the partition names."""
+    names = await connection.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('accesstoken')"
+    ))
+    days = []
+    for name in names:
+        suffix = name.removeprefix(PARTITION_PREFIX)
+        if suffix != name and suffix.isdigit():
+            days.append(datetime.strptime(suffix, "%Y%m%d").date())
+    return sorted(days)
+
+
+def create_partition_sql(day: date) -> str:
+    start, end = partition_bounds(day)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF accesstoken "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+async def create_partitions(connection: AsyncConnection, existing: list[date]) -> list[str]:
+    """Creates the partitions from today through settings.access_token_partition_days_ahead days ahead."""
+    created = []
+    today = datetime.now(timezone.utc).date()
+    for offset in range(settings.access_token_partition_days_ahead + 1):
+        day = today + timedelta(days=offset)
+        if day in existing:
+            continue
+        try:
+            await connection.exec_driver_sql(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'")
+            await connection.exec_driver_sql(create_partition_sql(day))
+            await connection.commit()
+        except DBAPIError:
+            # Busy table, or rows for that day already landed in the default partition
+            await connection.rollback()
+            logger.warning("Could not create access token partition %s", partition_name(day), exc_info=True)
+            continue
+        created.append(partition_name(day))
+    return created
+
+
+async def drop_expired_partitions(connection: AsyncConnection, existing: list[date]) -> list[str]:
+    """Drops the partitions whose tokens have all expired."""
+    dropped = []
+    cutoff = token_cutoff()
+    for day in existing:
+        if partition_bounds(day)[1] > cutoff:
+            continue
+        try:
+            await connection.exec_driver_sql(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'")
+            await connection.exec_driver_sql(f"ALTER TABLE accesstoken DETACH PARTITION {partition_name(day)}")
+            await connection.exec_driver_sql(f"DROP TABLE {partition_name(day)}")
+            await connection.commit()
+        except DBAPIError:
+            await connection.rollback()
+            logger.warning("Could not drop access token partition %s", partition_name(day), exc_info=True)
+            continue
+        dropped.append(partition_name(day))
+    return dropped
+
+
+async def delete_expired_rows(connection: AsyncConnection) -> int:
+    """Deletes expired rows in batches, committing and pausing after each one."""
+    deleted = 0
+    batch_size = settings.access_token_purge_batch_size
+    while True:
+        expired = (
+            select(AccessToken.token, AccessToken.created_at)
+            .where(AccessToken.created_at < token_cutoff())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await connection.execute(
+            delete(AccessToken).where(tuple_(AccessToken.token, AccessToken.created_at).in_(expired))
+        )
+        await connection.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+        await asyncio.sleep(settings.access_token_purge_pause_seconds)
+
+
+async def purge_expired_tokens(async_engine: AsyncEngine) -> dict | None:
+    """
+    Runs one purge and returns what it did, or None if another worker is purging right now.
+    Behind PgBouncer in transaction mode a session-level lock could end up held by a server
+    connection nobody unlocks, so it is skipped there; overlapping purges only repeat work.
+    """
+    async with async_engine.connect() as connection:
+        use_lock = not settings.db_pgbouncer
+        if use_lock:
+            locked = await connection.scalar(text("SELECT pg_try_advisory_lock(:id)"), {"id": PURGE_LOCK_ID})
+            await connection.commit()
+            if not locked:
+                return None
+        try:
+            report = {"created_partitions": [], "dropped_partitions": []}
+            partitioned = await is_partitioned(connection)
+            await connection.commit()
+            if partitioned:
+                existing = await partition_days(connection)
+                await connection.commit()
+                report["dropped_partitions"] = await drop_expired_partitions(connection, existing)
+                report["created_partitions"] = await create_partitions(connection, existing)
+            report["deleted_rows"] = await delete_expired_rows(connection)
+            return report
+        finally:
+            if use_lock:
+                # Ends a transaction left open by an error, so the unlock can run
+                await connection.rollback()
+                await connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": PURGE_LOCK_ID})
+                await connection.commit()
+
+
+class TokenPurger:
+    """Runs the purge every settings.access_token_purge_interval_seconds in the background of a worker."""
+
+    def __init__(self, async_engine: AsyncEngine):
+        self.engine = async_engine
+        self._task: asyncio.Task | None = None
+
+    async def _loop(self) -> None:
+        interval = settings.access_token_purge_interval_seconds
+        # Spread the workers out, so they do not all try to take the lock at once
+        await asyncio.sleep(random.uniform(0, interval))
+        while True:
+            try:
+                report = await purge_expired_tokens(self.engine)
+                if report and (report["deleted_rows"] or report["dropped_partitions"] or report["created_partitions"]):
+                    logger.info("Purged expired access tokens", extra={"fields": report})
+            except Exception:
+                logger.exception("Could not purge expired access tokens")
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        """Starts the background purge, called when the app starts."""
+        if settings.access_token_purge_interval_seconds and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self) -> None:
+        """Stops the background purge, called when the app shuts down."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+token_purger = TokenPurger(engine)
+
+
+async def partition_table(async_engine: AsyncEngine) -> None:
+    """
+    Replaces accesstoken with a table partitioned by day on created_at, in one transaction.
+    Only live tokens are copied, so this takes no longer than copying one token lifetime of logins.
+    The primary key has to include the partition key, so it becomes (token, created_at).
+    """
+    async with async_engine.begin() as connection:
+        if await is_partitioned(connection):
+            print("accesstoken is already partitioned")
+            return
+        await connection.exec_driver_sql("SET LOCAL lock_timeout = '10s'")
+        await connection.exec_driver_sql("LOCK TABLE accesstoken IN ACCESS EXCLUSIVE MODE")
+        await connection.exec_driver_sql("ALTER TABLE accesstoken RENAME TO accesstoken_unpartitioned")
+        await connection.exec_driver_sql("ALTER TABLE accesstoken_unpartitioned RENAME CONSTRAINT accesstoken_pkey TO accesstoken_unpartitioned_pkey")
+        await connection.exec_driver_sql("ALTER INDEX ix_accesstoken_created_at RENAME TO ix_accesstoken_unpartitioned_created_at")
+        await connection.exec_driver_sql(
+            """
+            CREATE TABLE accesstoken (
+                user_id UUID NOT NULL REFERENCES "user" (id) ON DELETE CASCADE,
+                token VARCHAR(43) NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                CONSTRAINT accesstoken_pkey PRIMARY KEY (token, created_at)
+            ) PARTITION BY RANGE (created_at)
+            """
+        )
+        await connection.exec_driver_sql("CREATE INDEX ix_accesstoken_created_at ON accesstoken (created_at)")
+        cutoff = token_cutoff()
+        day = cutoff.date()
+        while day <= datetime.now(timezone.utc).date() + timedelta(days=settings.access_token_partition_days_ahead):
+            await connection.exec_driver_sql(create_partition_sql(day))
+            day += timedelta(days=1)
+        # Catches rows for days without a partition, in case the purge has not run for a while
+        await connection.exec_driver_sql("CREATE TABLE accesstoken_default PARTITION OF accesstoken DEFAULT")
+        result = await connection.execute(
+            text(
+                "INSERT INTO accesstoken (user_id, token, created_at) "
+                "SELECT user_id, token, created_at FROM accesstoken_unpartitioned WHERE created_at >= :cutoff"
+            ),
+            {"cutoff": cutoff},
+        )
+        await connection.exec_driver_sql("DROP TABLE accesstoken_unpartitioned")
+    print(f"Partitioned accesstoken, copied {result.rowcount} live tokens")
+
+
+async def unpartition_table(async_engine: AsyncEngine) -> None:
+    """Turns a partitioned accesstoken back into the plain table created by the migrations."""
+    async with async_engine.begin() as connection:
+        if not await is_partitioned(connection):
+            print("accesstoken is not partitioned")
+            return
+        await connection.exec_driver_sql("SET LOCAL lock_timeout = '10s'")
+        await connection.exec_driver_sql("LOCK TABLE accesstoken IN ACCESS EXCLUSIVE MODE")
+        await connection.exec_driver_sql("ALTER TABLE accesstoken RENAME TO accesstoken_partitioned")
+        await connection.exec_driver_sql("ALTER TABLE accesstoken_partitioned RENAME CONSTRAINT accesstoken_pkey TO accesstoken_partitioned_pkey")
+        await connection.exec_driver_sql("ALTER INDEX ix_accesstoken_created_at RENAME TO ix_accesstoken_partitioned_created_at")
+        await connection.exec_driver_sql(
+            """
+            CREATE TABLE accesstoken (
+                user_id UUID NOT NULL REFERENCES "user" (id) ON DELETE CASCADE,
+                token VARCHAR(43) NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                CONSTRAINT accesstoken_pkey PRIMARY KEY (token)
+            )
+            """
+        )
+        await connection.exec_driver_sql("CREATE INDEX ix_accesstoken_created_at ON accesstoken (created_at)")
+        result = await connection.execute(
+            text(
+                "INSERT INTO accesstoken (user_id, token, created_at) "
+                "SELECT user_id, token, created_at FROM accesstoken_partitioned WHERE created_at >= :cutoff"
+            ),
+            {"cutoff": token_cutoff()},
+        )
+        # Dropping the partitioned table drops its partitions with it
+        await connection.exec_driver_sql("DROP TABLE accesstoken_partitioned")
+    print(f"Unpartitioned accesstoken, copied {result.rowcount} live tokens")
+
+
+async def main(command: str) -> None:
+    try:
+        if command == "purge":
+            print(await purge_expired_tokens(engine) or "Another worker is purging right now")
+        elif command == "partition":
+            await partition_table(engine)
+        elif command == "unpartition":
+            await unpartition_table(engine)
+        else:
+            raise SystemExit("Usage: python -m app.db.access_tokens purge|partition|unpartition")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.db.access_tokens purge|partition|unpartition
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else ""))
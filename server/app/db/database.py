@@ -1,38 +1,126 @@
+import uuid
 from collections.abc import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, InterfaceError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool, instrument_pool
+from app.db.queries import instrument_queries
+from app.db.routing import ReadRouter, Replica
 
-# Use settings.database_url directly
-ASYNC_DATABASE_URL = str(settings.database_url).replace(
-    "postgresql://", "postgresql+asyncpg://"
-)
+def to_async_url(url: str) -> str:
+    """Converts a postgresql:// URL from the settings into an asyncpg URL."""
+    async_url = str(url).replace("postgresql://", "postgresql+asyncpg://")
+    # Remove sslmode=require from URL if present
+    return async_url.replace("sslmode=require", "").replace("&&", "&").rstrip("&").rstrip("?")
 
-# Remove sslmode=require from URL if present
-ASYNC_DATABASE_URL = (
-    ASYNC_DATABASE_URL.replace("sslmode=require", "").replace("&&", "&").rstrip("&")
-)
 
-# Decide if SSL is needed based on your environment
-connect_args = {}
-if "neon.tech" in ASYNC_DATABASE_URL:
-    connect_args["ssl"] = True
+def build_connect_args(async_url: str) -> dict:
+    """Builds the asyncpg connection arguments described by the settings."""
+    # Decide if SSL is needed based on your environment
+    connect_args = {}
+    if "neon.tech" in async_url:
+        connect_args["ssl"] = True
+
+    if settings.db_pgbouncer:
+        # PgBouncer in transaction pooling mode hands each transaction to a different server connection,
+        # so prepared statements cannot be cached or reused by name and startup settings are not forwarded.
+        # Set statement_timeout on the database role instead when running behind PgBouncer.
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    else:
+        connect_args["statement_cache_size"] = settings.db_statement_cache_size
+        connect_args["prepared_statement_cache_size"] = settings.db_statement_cache_size
+        if settings.db_statement_timeout_ms:
+            connect_args["server_settings"] = {"statement_timeout": str(settings.db_statement_timeout_ms)}
+    return connect_args
+
+
+def build_engine(url: str, poolclass=AsyncAdaptedQueuePool) -> AsyncEngine:
+    """Creates an async engine with the pool settings shared by the primary and the replicas."""
+    async_url = to_async_url(url)
+    async_engine = create_async_engine(
+        async_url,
+        connect_args=build_connect_args(async_url),
+        poolclass=poolclass,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle_seconds,
+    )
+    instrument_queries(async_engine)
+    return async_engine
+
+
+ASYNC_DATABASE_URL = to_async_url(settings.database_url)
+
+# Create async engine for the primary, which takes every write
+engine = build_engine(settings.database_url, poolclass=InstrumentedQueuePool)
+instrument_pool(engine.sync_engine)
+
+def build_sessionmaker(bind: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    """Creates a session factory with the options every route expects."""
+    return async_sessionmaker(
+        bind=bind,
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+    )
 
-# Create async engine
-engine = create_async_engine(
-    ASYNC_DATABASE_URL,
-    connect_args=connect_args,
-)
 
 # Async session factory
-AsyncSessionLocal = async_sessionmaker(
-    bind=engine,
-    autocommit=False,
-    autoflush=False,
-    expire_on_commit=False,
-)
+AsyncSessionLocal = build_sessionmaker(engine)
+
+# Read replicas, used by get_read_session for read-only routes
+def build_replica(index: int, url: str) -> Replica:
+    """Creates the engine and session factory for one read replica."""
+    replica_engine = build_engine(url)
+    return Replica(f"replica-{index}", replica_engine, build_sessionmaker(replica_engine))
+
+
+read_router = ReadRouter([build_replica(index, url) for index, url in enumerate(settings.database_replica_urls)])
 
 
 # Dependency for FastAPI routes
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+# Dependency for read-only routes that open their own sessions, such as streamed exports
+def get_read_sessionmaker(request: Request) -> async_sessionmaker[AsyncSession]:
+    replica = read_router.choose(request)
+    return replica.sessionmaker if replica else AsyncSessionLocal
+
+
+# Dependency for read-only FastAPI routes, which may be answered by a replica
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    replica = read_router.choose(request)
+    sessionmaker = replica.sessionmaker if replica else AsyncSessionLocal
+    async with sessionmaker() as session:
+        try:
+            yield session
+        except (OperationalError, InterfaceError, OSError):
+            # Connection-level failures take the replica out of rotation until the next health check
+            if replica:
+                read_router.mark_unhealthy(replica)
+            raise
+
+
+async def estimate_table_rows(session: AsyncSession, table_name: str) -> int | None:
+    """
+    Returns the planner's estimate of the number of rows in a table from pg_class.reltuples.
+    This is a catalog lookup instead of a full scan, but it is only as fresh as the last
+    VACUUM or ANALYZE. Returns None if the table has never been analyzed.
+    """
+    estimate = await session.scalar(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(quote_ident(:table_name))"),
+        {"table_name": table_name},
+    )
+    if estimate is None or estimate < 0:
+        return None
+    return estimate
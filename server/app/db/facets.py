@@ -0,0 +1,126 @@
+from collections.abc import Callable
+from sqlalchemy import Select, case, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.listing import Listing, ListingCategory, ListingCondition, ListingStatus
+from app.models.listing_facets import ListingFacetCounts
+from app.schemas.listing import ListingFilters
+
+# This file counts the listings per category, condition, status and price bucket for the filter
+# sidebar, all four in one query with GROUPING SETS instead of one filtered query per value.
+#
+# Filter sets without a keyword or a price range are answered from listing_facet_counts, a small
+# summary table with one row per combination of the four facets that triggers on listing_table keep
+# up to date. That covers the unfiltered marketplace as well as any category, condition and status
+# filters, since those are columns of the summary table. Keyword and price filters need the
+# individual listings, so those are counted live on listing_table.
+
+# Upper bounds in cents of every price bucket but the last, which is open-ended.
+# The added_listing_facet_counts migration has the same bounds in listing_price_bucket(), so changing
+# them needs a migration that replaces that function and rebuilds listing_facet_counts.
+PRICE_BUCKET_BOUNDS = (1000, 2500, 5000, 10000, 25000, 50000)
+
+
+def price_bucket(price_cents):
+    """
+    Builds the SQL expression for the index of the price bucket a price falls in.
+    The bounds are inlined rather than bound, so the expression in GROUPING SETS and the one in
+    the select list are identical to Postgres.
+    """
+    return case(
+        *((price_cents < literal_column(str(bound)), literal_column(str(index))) for index, bound in enumerate(PRICE_BUCKET_BOUNDS)),
+        else_=literal_column(str(len(PRICE_BUCKET_BOUNDS))),
+    )
+
+
+def price_bucket_ranges() -> list[tuple[int, int | None]]:
+    """Returns the (min_cents, max_cents) of every bucket, max_cents being exclusive and None for the last."""
+    lower_bounds = (0, *PRICE_BUCKET_BOUNDS)
+    upper_bounds = (*PRICE_BUCKET_BOUNDS, None)
+    return list(zip(lower_bounds, upper_bounds))
+
+
+def uses_summary(filters: ListingFilters) -> bool:
+    """Checks whether the facet counts for a filter set can be read from listing_facet_counts."""
+    return (
+        filters.keyword is None
+        and filters.min_price is None
+        and filters.max_price is None
+        and filters.seller_id is None
+    )
+
+
+def facet_statement(filters: ListingFilters, apply_filters: Callable[[Select, ListingFilters], Select]) -> Select:
+    """
+    Builds the GROUPING SETS query that returns one row per facet value with its count.
+    Each row has the four facet columns, the GROUPING() flag of each (0 for the facet the row
+    counts, 1 for the others) and the count. apply_filters adds the filters of the live query,
+    the same function GET /listings uses.
+    """
+    if uses_summary(filters):
+        columns = (
+            ListingFacetCounts.category,
+            ListingFacetCounts.condition,
+            ListingFacetCounts.status,
+            ListingFacetCounts.price_bucket,
+        )
+        count = func.sum(ListingFacetCounts.listing_count)
+        source = ListingFacetCounts
+        conditions = [
+            column == value
+            for column, value in zip(columns[:3], (filters.category, filters.condition, filters.status))
+            if value is not None
+        ]
+    else:
+        columns = (Listing.category, Listing.condition, Listing.status, price_bucket(Listing.price_cents))
+        count = func.count()
+        source = Listing
+        conditions = []
+
+    statement = (
+        select(*columns, *(func.grouping(column) for column in columns), count)
+        .select_from(source)
+        .where(*conditions)
+        .group_by(func.grouping_sets(*columns))
+    )
+    return statement if source is ListingFacetCounts else apply_filters(statement, filters)
+
+
+async def count_facets(
+    session: AsyncSession,
+    filters: ListingFilters,
+    apply_filters: Callable[[Select, ListingFilters], Select],
+) -> dict:
+    """Returns the counts for every facet value, including the values no listing has, and the total."""
+    facets = {
+        "status": {status: 0 for status in ListingStatus},
+        "category": {category: 0 for category in ListingCategory},
+        "condition": {condition: 0 for condition in ListingCondition},
+    }
+    buckets = [0] * (len(PRICE_BUCKET_BOUNDS) + 1)
+    total = 0
+
+    result = await session.execute(facet_statement(filters, apply_filters))
+    for category, condition, status, bucket, category_grouped, condition_grouped, status_grouped, _, count in result:
+        count = int(count or 0)
+        if not category_grouped:
+            # Every listing is in exactly one category group, counting NULL, so these add up to the total
+            total += count
+            if category is not None:
+                facets["category"][category] = count
+        elif not condition_grouped:
+            if condition is not None:
+                facets["condition"][condition] = count
+        elif not status_grouped:
+            facets["status"][status] = count
+        else:
+            buckets[bucket] = count
+
+    return {
+        "total": total,
+        **facets,
+        "price": [
+            {"min_cents": low, "max_cents": high, "count": count}
+            for (low, high), count in zip(price_bucket_ranges(), buckets)
+        ],
+        "source": "summary" if uses_summary(filters) else "live",
+    }
@@ -0,0 +1,120 @@
+import hashlib
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from sqlalchemy import Select, asc, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import etag_matches
+from app.core.config import settings
+from app.core.serialization import Projection
+from app.models.listing import Listing, ListingStatus
+from app.models.user import User
+from app.schemas.listing import ListingFilters
+from app.schemas.pagination import SyncToken
+
+# This file holds the queries behind GET /listings/changes, the delta sync of the listing feed.
+# Instead of downloading whole pages again, clients keep a sync token, the (updated_at, id) of the
+# last change they have seen, and ask for the rows after it in (updated_at, id) order. That is a
+# range scan of ix_listing_table_updated_at. Active rows are sent in full, rows that left ACTIVE
+# status as tombstones with just their id and status.
+#
+# updated_at is set when a row is written, not when its transaction commits, so a write can become
+# visible with an updated_at just behind a token that was already handed out (or later still on a
+# lagging replica). The last token of a sync is therefore never later than
+# settings.listing_sync_settle_seconds ago, and changes in that window are sent again on the next
+# poll. Clients apply changes by id, so seeing one twice is harmless.
+#
+# The newest updated_at of the table is one index lookup and serves as the Last-Modified of every
+# delta. The ETag also covers the token, filters and fields of the request, so pages of one sync
+# never share it. A conditional request that matches is only answered with a 304 once a LIMIT 1
+# probe finds no change after its token: the newest updated_at alone does not move when a row
+# commits late, so it cannot prove that nothing changed. A first sync, without a token, has nothing
+# to probe from and is always sent in full. Listings that disappear without an update, when their
+# seller's account is deleted, are not reported as tombstones.
+
+
+async def latest_listing_update(session: AsyncSession) -> datetime | None:
+    """Returns the newest updated_at of any listing, read from the end of ix_listing_table_updated_at."""
+    return await session.scalar(select(func.max(Listing.updated_at)))
+
+
+def changes_statement(
+    projection: Projection,
+    filters: ListingFilters,
+    token: SyncToken | None,
+    limit: int,
+    apply_filters: Callable[[Select, ListingFilters], Select],
+) -> Select:
+    """
+    Builds the query for the next limit changes after a token, plus one row to find out whether
+    more follow. Without a token it is a first full sync, which only needs the active listings.
+    """
+    statement = select(*projection.columns(Listing.id, Listing.status, Listing.updated_at))
+    if projection.needs_seller:
+        statement = statement.join(User, Listing.seller_id == User.id)
+    statement = apply_filters(statement, filters)
+    if token is None:
+        statement = statement.where(Listing.status == ListingStatus.ACTIVE)
+    else:
+        statement = statement.where(tuple_(Listing.updated_at, Listing.id) > tuple_(token.updated_at, token.id))
+    return statement.order_by(asc(Listing.updated_at), asc(Listing.id)).limit(limit + 1)
+
+
+def pending_change_statement(
+    filters: ListingFilters,
+    token: SyncToken,
+    apply_filters: Callable[[Select, ListingFilters], Select],
+) -> Select:
+    """Builds the probe for the first change after a token, which decides whether a poll gets a 304."""
+    statement = apply_filters(select(Listing.id), filters)
+    statement = statement.where(tuple_(Listing.updated_at, Listing.id) > tuple_(token.updated_at, token.id))
+    return statement.order_by(asc(Listing.updated_at), asc(Listing.id)).limit(1)
+
+
+def next_sync_token(rows: list, token: SyncToken | None, has_more: bool) -> SyncToken:
+    """
+    Returns the token for the changes after rows. While more changes follow it points right after
+    the last row, once the client has caught up it is moved back to the settle window.
+    """
+    if rows:
+        token = SyncToken(updated_at=rows[-1].updated_at, id=rows[-1].id)
+    if has_more:
+        return token
+    settled = datetime.now(timezone.utc) - timedelta(seconds=settings.listing_sync_settle_seconds)
+    if token is None or token.updated_at > settled:
+        return SyncToken(updated_at=settled, id=0)
+    return token
+
+
+def validator_headers(latest: datetime | None, variant: str) -> dict[str, str]:
+    """
+    Builds the Last-Modified and ETag headers of a delta from the newest listing update.
+    variant identifies the request, its token, filters and fields, and is hashed into the ETag.
+    """
+    stamp = "empty" if latest is None else f"{latest.timestamp():.6f}"
+    headers = {
+        "ETag": f'W/"{hashlib.blake2b(f"{variant}|{stamp}".encode(), digest_size=16).hexdigest()}"',
+        "Cache-Control": "no-cache",
+    }
+    if latest is not None:
+        headers["Last-Modified"] = format_datetime(latest.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def not_modified(if_none_match: str | None, if_modified_since: str | None, latest: datetime | None, etag: str) -> bool:
+    """
+    Checks the conditional headers of a delta request. If-None-Match takes precedence, as RFC 9110
+    requires. If-Modified-Since only has whole seconds, so it matches while no listing was updated
+    after the second it names. A match still needs an empty pending_change_statement probe.
+    """
+    if if_none_match:
+        return etag_matches(if_none_match, etag.removeprefix("W/"))
+    if not if_modified_since or latest is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return latest.replace(microsecond=0) <= since
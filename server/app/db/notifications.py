@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from collections.abc import Callable
+import asyncpg
+from sqlalchemy import func, select
+from app.core.config import settings
+from app.db.database import engine, to_async_url
+
+# This file holds the Postgres LISTEN/NOTIFY plumbing shared by the listing event stream and the
+# cache invalidations that the workers send each other.
+#
+# LISTEN needs a session of its own for as long as it listens, so listen() keeps a dedicated asyncpg
+# connection rather than one from the pool, to settings.listing_events_database_url when it is set
+# (PgBouncer in transaction mode cannot forward notifications). NOTIFY is an ordinary statement and
+# goes through the pool.
+
+logger = logging.getLogger(__name__)
+
+
+async def notify(channel: str, *payloads: str) -> None:
+    """Sends notifications in one statement and a transaction of their own, for senders outside of one."""
+    async with engine.connect() as connection:
+        await connection.execute(select(*(func.pg_notify(channel, payload) for payload in payloads)))
+        await connection.commit()
+
+
+async def listen(channel: str, on_notification: Callable[[str], None], on_reconnect: Callable[[], None]) -> None:
+    """
+    Calls on_notification with the payload of every notification on channel, until cancelled.
+    The connection is reopened with a backoff when it is lost. Notifications sent while it was
+    down are gone, so on_reconnect is called once it is back.
+    """
+    url = to_async_url(settings.listing_events_database_url or settings.database_url)
+    dsn = url.replace("postgresql+asyncpg://", "postgresql://")
+    delay = 1.0
+    connected_before = False
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn, ssl=True if "neon.tech" in dsn else None)
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            # asyncpg passes the connection, the sender's pid, the channel and the payload
+            await connection.add_listener(channel, lambda *notification: on_notification(notification[-1]))
+            if connected_before:
+                on_reconnect()
+            connected_before = True
+            delay = 1.0
+            await lost.wait()
+            logger.warning("Lost the %s connection, reconnecting", channel)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Could not listen on %s, retrying in %.0f seconds", channel, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close(timeout=5)
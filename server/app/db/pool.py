@@ -0,0 +1,107 @@
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.metrics import Histogram, render_counter, render_histogram
+
+# This file instruments the SQLAlchemy connection pool so we can see why requests run out of connections.
+# Wait time is how long a checkout blocked before getting a connection, which includes opening
+# a new one if the pool had to grow. Connect latency is only the time spent opening new connections.
+
+
+class PoolMetrics:
+    """Counters and histograms collected from the pool events of one engine."""
+
+    def __init__(self):
+        self.wait_time = Histogram()
+        self.connect_latency = Histogram()
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        # Checkouts currently blocked in the pool, which admission control sheds load on
+        self.waiting = 0
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """The default async queue pool, timing how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        pool_metrics.waiting += 1
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.waiting -= 1
+            pool_metrics.wait_time.observe(time.perf_counter() - start)
+
+
+def instrument_pool(engine: Engine) -> None:
+    """Registers the pool event listeners that feed pool_metrics."""
+
+    @event.listens_for(engine, "do_connect")
+    def before_connect(dialect, connection_record, cargs, cparams):
+        connection_record.info["connect_started"] = time.perf_counter()
+
+    @event.listens_for(engine.pool, "connect")
+    def after_connect(dbapi_connection, connection_record):
+        started = connection_record.info.pop("connect_started", None)
+        if started is not None:
+            pool_metrics.connect_latency.observe(time.perf_counter() - started)
+        pool_metrics.connects += 1
+
+    @event.listens_for(engine.pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_metrics.checkouts += 1
+
+    @event.listens_for(engine.pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_metrics.invalidations += 1
+
+
+def pool_stats(engine: Engine) -> dict:
+    """Returns the current state of the pool together with the collected metrics."""
+    pool = engine.pool
+    stats = {
+        "checkouts": pool_metrics.checkouts,
+        "connects": pool_metrics.connects,
+        "invalidations": pool_metrics.invalidations,
+        "timeouts": pool_metrics.timeouts,
+        "waiting": pool_metrics.waiting,
+        "wait_time_seconds": pool_metrics.wait_time.snapshot(),
+        "connect_latency_seconds": pool_metrics.connect_latency.snapshot(),
+    }
+    # Pool sizes are only available on queue pools, not on NullPool
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    return stats
+
+
+def render_pool_metrics(engine: Engine) -> list[str]:
+    """Returns the pool metrics in the Prometheus text format."""
+    lines = [
+        *render_counter("db_pool_checkouts_total", "Connections checked out of the pool.", {(): pool_metrics.checkouts}, ()),
+        *render_counter("db_pool_connects_total", "New database connections opened.", {(): pool_metrics.connects}, ()),
+        *render_counter("db_pool_invalidations_total", "Connections invalidated after errors.", {(): pool_metrics.invalidations}, ()),
+        *render_counter("db_pool_timeouts_total", "Checkouts that timed out waiting for a connection.", {(): pool_metrics.timeouts}, ()),
+        *render_histogram("db_pool_wait_seconds", "Time checkouts waited for a connection.", {(): pool_metrics.wait_time}, ()),
+        *render_histogram("db_pool_connect_seconds", "Time spent opening new connections.", {(): pool_metrics.connect_latency}, ()),
+    ]
+    lines += render_counter("db_pool_waiting", "Checkouts currently waiting for a connection.", {(): pool_metrics.waiting}, (), kind="gauge")
+    pool = engine.pool
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        lines += render_counter("db_pool_checked_out", "Connections currently checked out.", {(): pool.checkedout()}, (), kind="gauge")
+        lines += render_counter("db_pool_size", "Configured size of the pool.", {(): pool.size()}, (), kind="gauge")
+    return lines
@@ -0,0 +1,33 @@
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.core.config import settings
+from app.core.instrumentation import current_metrics
+from app.db.slow_queries import slow_query_log
+
+# This file times every SQL statement and adds it to the metrics of the request that ran it,
+# see app/core/instrumentation.py. Statements run outside of a request, such as replica health
+# checks, are not added to any request. Statements slower than settings.slow_query_threshold_ms
+# are also kept in the slow query log, see app/db/slow_queries.py.
+
+
+def instrument_queries(async_engine: AsyncEngine) -> None:
+    """Registers the event listeners that record the duration and row count of every statement run on an engine."""
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - context.query_started
+        metrics = current_metrics.get()
+        if metrics is not None:
+            # asyncpg reports the rows a SELECT returned or a write changed, and -1 for server-side cursors
+            metrics.record_query(statement, seconds, max(cursor.rowcount, 0))
+
+        threshold = settings.slow_query_threshold_ms
+        # The plans captured for the slow query log are slow too, but are not slow queries themselves
+        if threshold and seconds * 1000 >= threshold and not statement.startswith("EXPLAIN"):
+            route = metrics.route() if metrics is not None else "background"
+            slow_query_log.record(async_engine, route, seconds, statement, parameters, executemany)
@@ -0,0 +1,157 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from app.core.config import settings
+
+# This file decides which database answers a read-only request.
+# Reads go round-robin to the healthy replicas and fall back to the primary when none are healthy.
+# A replica counts as unhealthy if its health check fails or it is further behind the primary
+# than settings.replica_max_lag_seconds. After a successful write, the client gets a short-lived
+# cookie that pins its reads to the primary, so users always see their own changes even though
+# the replicas may lag. A cookie is used rather than worker memory because the next request can
+# be handled by any of the uvicorn workers.
+
+logger = logging.getLogger(__name__)
+
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Zero when the replica has replayed everything it received, otherwise the age of the last replayed transaction
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+@dataclass(eq=False)
+class Replica:
+    """A read replica and its current health."""
+    name: str
+    engine: AsyncEngine
+    sessionmaker: async_sessionmaker[AsyncSession]
+    healthy: bool = True
+    lag_seconds: float = 0.0
+    last_error: str | None = None
+    checked_at: float = field(default=0.0)
+
+
+class ReadRouter:
+    """Chooses the replica for each read-only request and keeps track of replica health."""
+
+    def __init__(self, replicas: list[Replica]):
+        self.replicas = replicas
+        self._next = itertools.count()
+        self._health_task: asyncio.Task | None = None
+
+    def choose(self, request: Request) -> Replica | None:
+        """Returns the replica that should serve this request, or None to use the primary."""
+        if not self.replicas or is_pinned_to_primary(request):
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def mark_unhealthy(self, replica: Replica, error: str = "connection failed") -> None:
+        """Takes a replica out of rotation until a health check succeeds again."""
+        if replica.healthy:
+            logger.warning("Read replica %s marked unhealthy: %s", replica.name, error)
+        replica.healthy = False
+        replica.last_error = error
+
+    async def check(self, replica: Replica) -> None:
+        """Runs one health and lag check against a replica."""
+        try:
+            async with replica.engine.connect() as connection:
+                lag = float(await connection.scalar(LAG_QUERY))
+        except Exception as exc:
+            self.mark_unhealthy(replica, repr(exc))
+        else:
+            replica.lag_seconds = lag
+            if lag > settings.replica_max_lag_seconds:
+                self.mark_unhealthy(replica, f"lagging {lag:.1f}s behind the primary")
+            else:
+                if not replica.healthy:
+                    logger.info("Read replica %s is healthy again", replica.name)
+                replica.healthy = True
+                replica.last_error = None
+        replica.checked_at = time.time()
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+            await asyncio.sleep(settings.replica_health_check_seconds)
+
+    def start(self) -> None:
+        """Starts the background health checks, called when the app starts."""
+        if self.replicas and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self) -> None:
+        """Stops the health checks and closes the replica connections, called when the app shuts down."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def status(self) -> list[dict]:
+        """Returns the health of every replica as seen by this worker."""
+        return [
+            {
+                "name": replica.name,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag_seconds,
+                "last_error": replica.last_error,
+                "checked_at": replica.checked_at,
+            }
+            for replica in self.replicas
+        ]
+
+
+def is_pinned_to_primary(request: Request) -> bool:
+    """Checks whether the client wrote recently enough that replicas may not have its change yet."""
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware that sets the read_primary_until cookie on every successful write request,
+    so that get_read_session sends the client's reads to the primary for a short window.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                window = settings.replica_read_your_writes_seconds
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}={time.time() + window:.3f}; Max-Age={int(window) + 1}; "
+                    f"Path=/; HttpOnly; SameSite=Lax"
+                )
+                if settings.cookie_secure:
+                    cookie += "; Secure"
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
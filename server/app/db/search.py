@@ -0,0 +1,81 @@
+import re
+from sqlalchemy import func, or_, literal
+from app.models.listing import Listing
+from app.models.user import User
+
+# This file contains the search engine behind the keyword filters for listings and users.
+# Listings are matched with Postgres full-text search on the generated search_vector column,
+# falling back to pg_trgm word similarity on the title so misspelled keywords still match.
+# User names are matched with pg_trgm, which also lets the GIN indexes serve ILIKE '%kw%'.
+
+SEARCH_CONFIG = "english"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def prefix_tsquery(keyword: str) -> str | None:
+    """
+    Turns free text typed by the user into a to_tsquery string where every word is
+    prefix matched, so "calc text" finds "calculus textbook" while the user is still typing.
+    Returns None if the keyword has no searchable words.
+    """
+    tokens = TOKEN_PATTERN.findall(keyword.lower())
+    if not tokens:
+        return None
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+def listing_search_filter(keyword: str):
+    """
+    Builds the WHERE clause for a listing keyword search.
+    Both branches of the OR can use their own GIN index, so Postgres never needs a sequential scan.
+    """
+    keyword = keyword.strip()
+    fuzzy = literal(keyword).op("<%")(Listing.title)
+    query = prefix_tsquery(keyword)
+    if query is None:
+        return fuzzy
+    return or_(
+        Listing.search_vector.op("@@")(func.to_tsquery(SEARCH_CONFIG, query)),
+        fuzzy,
+    )
+
+
+def listing_relevance(keyword: str) -> list:
+    """
+    Builds the ORDER BY clauses for sorting listings by relevance to the keyword.
+    Full-text matches are ranked by ts_rank first and trigram-only matches follow by similarity.
+    """
+    keyword = keyword.strip()
+    clauses = []
+    query = prefix_tsquery(keyword)
+    if query is not None:
+        clauses.append(func.ts_rank(Listing.search_vector, func.to_tsquery(SEARCH_CONFIG, query)).desc())
+    clauses.append(func.word_similarity(keyword, Listing.title).desc())
+    return clauses
+
+
+def user_search_filter(keyword: str):
+    """
+    Builds the WHERE clause for searching users by first or last name.
+    Substring matches keep the old ILIKE behavior and similarity matches catch misspellings.
+    """
+    keyword = keyword.strip()
+    search_filter = f"%{keyword}%"
+    return or_(
+        User.first_name.ilike(search_filter),
+        User.last_name.ilike(search_filter),
+        User.first_name.op("%")(keyword),
+        User.last_name.op("%")(keyword),
+    )
+
+
+def user_relevance(keyword: str):
+    """
+    Builds the ORDER BY clause for sorting users by how closely their name matches the keyword.
+    """
+    keyword = keyword.strip()
+    return func.greatest(
+        func.similarity(func.coalesce(User.first_name, ""), keyword),
+        func.similarity(func.coalesce(User.last_name, ""), keyword),
+    ).desc()
@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import logging
+import random
+import re
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.core.config import settings
+
+# This file keeps the statements that took longer than settings.slow_query_threshold_ms.
+# The listing and user filters build different SQL for every combination of query parameters,
+# so the statement text shows which combination was slow. Parameters are stored only as their
+# shapes (type and length), never their values, since they can hold emails and search terms.
+#
+# A sample of the slow SELECTs, settings.slow_query_explain_sample_rate, gets an
+# EXPLAIN (ANALYZE, BUFFERS) plan. The plan is captured in the background on a separate
+# connection after the statement finished, so the request that ran it is not slowed down further.
+# EXPLAIN ANALYZE runs the statement a second time, so it has its own timeout and only one runs at
+# a time. SELECTs that lock rows (FOR UPDATE, FOR SHARE and the like) or contain a data-modifying
+# CTE would take the locks or write again, so they only get a plain EXPLAIN of the estimated plan.
+# Entries are kept per worker in a ring buffer of settings.slow_query_log_size entries.
+
+logger = logging.getLogger(__name__)
+
+# Row locking clauses and writes, which must not be run a second time by EXPLAIN ANALYZE
+LOCKS_OR_WRITES = re.compile(
+    r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b|\b(?:INSERT|UPDATE|DELETE|MERGE)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class SlowQuery:
+    """One statement that took longer than the threshold."""
+    captured_at: datetime
+    route: str
+    duration_ms: float
+    statement: str
+    parameter_shapes: list[str]
+    plan: str | None = None
+    # "not sampled", "pending", "captured", "estimated" (plain EXPLAIN), "skipped" or "failed: <reason>"
+    plan_status: str = "not sampled"
+
+
+def parameter_shape(value: Any) -> str:
+    """Describes a bind parameter without revealing its value."""
+    if value is None:
+        return "null"
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def parameter_shapes(parameters: Any) -> list[str]:
+    if isinstance(parameters, dict):
+        return [f"{name}: {parameter_shape(value)}" for name, value in parameters.items()]
+    return [parameter_shape(value) for value in parameters or ()]
+
+
+def is_explainable(statement: str) -> bool:
+    """Only SELECTs are explained, since EXPLAIN ANALYZE really runs the statement."""
+    return statement.lstrip().upper().startswith("SELECT")
+
+
+def can_analyze(statement: str) -> bool:
+    """Checks whether a SELECT can be run again safely, it must not lock rows or write."""
+    return LOCKS_OR_WRITES.search(statement) is None
+
+
+class SlowQueryLog:
+    """A ring buffer of slow statements, with sampled plans."""
+
+    def __init__(self, size: int):
+        self.entries: deque[SlowQuery] = deque(maxlen=size)
+        self.captured = 0
+        self._explaining: asyncio.Task | None = None
+
+    def record(self, engine: AsyncEngine, route: str, seconds: float, statement: str, parameters: Any, executemany: bool) -> None:
+        """Stores a slow statement and starts capturing its plan if it is sampled."""
+        entry = SlowQuery(
+            captured_at=datetime.now(timezone.utc),
+            route=route,
+            duration_ms=round(seconds * 1000, 2),
+            statement=statement,
+            # executemany statements get a list of parameter sets, the first one stands for all of them
+            parameter_shapes=parameter_shapes(parameters[0] if executemany and parameters else parameters),
+        )
+        self.entries.append(entry)
+        self.captured += 1
+        logger.warning(
+            "Slow query",
+            extra={"fields": {"route": route, "duration_ms": entry.duration_ms, "statement": " ".join(statement.split())[:500]}},
+        )
+
+        if executemany or not is_explainable(statement) or random.random() >= settings.slow_query_explain_sample_rate:
+            return
+        if self._explaining is not None and not self._explaining.done():
+            entry.plan_status = "skipped"
+            return
+        entry.plan_status = "pending"
+        # A fresh context, so the EXPLAIN is not counted in the metrics of the request that was slow
+        self._explaining = asyncio.create_task(self.explain(engine, entry, parameters), context=contextvars.Context())
+
+    async def explain(self, engine: AsyncEngine, entry: SlowQuery, parameters: Any) -> None:
+        """
+        Captures the plan of a slow statement by running it again under EXPLAIN (ANALYZE, BUFFERS),
+        or only planning it with EXPLAIN if running it again would lock rows or write.
+        """
+        analyze = can_analyze(entry.statement)
+        try:
+            async with engine.connect() as connection:
+                await connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.slow_query_explain_timeout_ms)}")
+                options = "(ANALYZE, BUFFERS) " if analyze else ""
+                result = await connection.exec_driver_sql(f"EXPLAIN {options}{entry.statement}", parameters)
+                entry.plan = "\n".join(row[0] for row in result)
+                entry.plan_status = "captured" if analyze else "estimated"
+                # Nothing to keep, the transaction only holds the timeout
+                await connection.rollback()
+        except Exception as error:
+            entry.plan_status = f"failed: {error}"
+            logger.warning("Could not capture the plan of a slow query", exc_info=True)
+
+    def clear(self) -> int:
+        cleared = len(self.entries)
+        self.entries.clear()
+        return cleared
+
+    def snapshot(self) -> dict:
+        """Returns the entries, newest first, and a summary per route and statement, slowest first."""
+        groups: dict[tuple[str, str], list[SlowQuery]] = {}
+        for entry in self.entries:
+            groups.setdefault((entry.route, entry.statement), []).append(entry)
+        summary = [
+            {
+                "route": route,
+                "statement": statement,
+                "count": len(entries),
+                "max_ms": max(entry.duration_ms for entry in entries),
+                "mean_ms": round(sum(entry.duration_ms for entry in entries) / len(entries), 2),
+            }
+            for (route, statement), entries in groups.items()
+        ]
+        summary.sort(key=lambda group: group["max_ms"], reverse=True)
+        return {
+            "threshold_ms": settings.slow_query_threshold_ms,
+            "captured_total": self.captured,
+            "summary": summary,
+            "entries": [asdict(entry) for entry in reversed(self.entries)],
+        }
+
+
+slow_query_log = SlowQueryLog(settings.slow_query_log_size)
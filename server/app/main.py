@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from app.api.auth import router as auth_router
 from app.api.listings import router as listings_router
 from app.api.profile import router as profile_router
@@ -7,6 +8,17 @@ from app.api.about import router as about_router
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from fastapi.staticfiles import StaticFiles
+from app.core.images import shutdown_pool
+from app.db.database import read_router
+from app.db.access_tokens import token_purger
+from app.core.listing_events import listing_events
+from app.core.cache import cache_broadcast
+from app.db.routing import ReadYourWritesMiddleware
+from app.api.metrics import router as metrics_router
+from app.core.instrumentation import InstrumentationMiddleware, configure_logging
+from app.core.ratelimit import limit_requests
+
+configure_logging()
 
 origins = [settings.base_url, settings.frontend_url]
 allow_origins = origins + [
@@ -14,7 +26,21 @@ allow_origins = origins + [
     "https://gatormarket.com"
 ]
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Starts and stops resources that live as long as the worker process."""
+    read_router.start()
+    token_purger.start()
+    cache_broadcast.start()
+    yield
+    await cache_broadcast.stop()
+    await listing_events.stop()
+    token_purger.stop()
+    await read_router.stop()
+    shutdown_pool()
+
+# Every route is rate limited and admission controlled, see app/core/ratelimit.py
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(limit_requests)])
 
 # Setting up CORS middleware
 app.add_middleware(
@@ -23,13 +49,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Keyset pagination cursors are returned in headers so the list response body stays unchanged
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor", "ETag", "Retry-After"],
 )
 
+# Pins a client's reads to the primary for a few seconds after each write
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Measures each request for the Server-Timing header, GET /metrics and the request log.
+# Added last so it is the outermost middleware and its timings include the others
+app.add_middleware(InstrumentationMiddleware)
+
 app.include_router(auth_router)
 app.include_router(listings_router)
 app.include_router(profile_router)
 app.include_router(admin_router)
 app.include_router(about_router)
+app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -2,5 +2,8 @@ from .access_token import AccessToken
 from .user import User
 from .base import Base
 from .listing import Listing
+from .email_job import EmailJob, EmailDeadLetter
+from .seller_stats import SellerListingStats
+from .listing_facets import ListingFacetCounts
 
-__all__ = ["Base", "User", "AccessToken", "Listing"]
\ No newline at end of file
+__all__ = ["Base", "User", "AccessToken", "Listing", "EmailJob", "EmailDeadLetter", "SellerListingStats", "ListingFacetCounts"]
\ No newline at end of file
@@ -1,10 +1,13 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
 from fastapi import Depends
 from fastapi_users_db_sqlalchemy.access_token import (
     SQLAlchemyBaseAccessTokenTableUUID,
     SQLAlchemyAccessTokenDatabase
 )
-from fastapi_users.authentication.strategy.db import AccessTokenDatabase, DatabaseStrategy
+from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.db.database import get_async_session
 from .base import Base
 
@@ -12,16 +15,43 @@ class AccessToken(SQLAlchemyBaseAccessTokenTableUUID, Base):
     pass
 
 
+def token_cutoff() -> datetime:
+    """Returns the creation time before which every access token has expired."""
+    return datetime.now(timezone.utc) - timedelta(seconds=settings.access_token_lifetime_seconds)
+
+
+class ExpiringAccessTokenDatabase(SQLAlchemyAccessTokenDatabase[AccessToken]):
+    """
+    The fastapi-users token adapter, but every lookup is bounded by the token lifetime.
+    Expired rows that were not purged yet are never returned, and on a partitioned accesstoken
+    table (see app/db/access_tokens.py) the created_at bound lets Postgres skip old partitions.
+    """
+
+    async def get_by_token(self, token: str, max_age: Optional[datetime] = None) -> Optional[AccessToken]:
+        cutoff = token_cutoff()
+        return await super().get_by_token(token, max(max_age, cutoff) if max_age else cutoff)
+
+    async def create(self, create_dict: dict[str, Any]) -> AccessToken:
+        # created_at is set in Python, so there is nothing to refresh after the insert
+        access_token = AccessToken(**create_dict)
+        self.session.add(access_token)
+        await self.session.commit()
+        return access_token
+
+    async def delete(self, access_token: AccessToken) -> None:
+        await self.session.execute(
+            delete(AccessToken).where(
+                AccessToken.token == access_token.token,
+                AccessToken.created_at == access_token.created_at,
+            )
+        )
+        await self.session.commit()
+
+
 async def get_access_token_db(
     session: AsyncSession = Depends(get_async_session)
 ):
     """
     Gets a session's access token from the DB
     """
-    yield SQLAlchemyAccessTokenDatabase(session, AccessToken)
-
-
-def get_database_strategy(
-    access_token_db: AccessTokenDatabase[AccessToken] = Depends(get_access_token_db)
-) -> DatabaseStrategy:
-    return DatabaseStrategy(access_token_db, lifetime_seconds=3600)
\ No newline at end of file
+    yield ExpiringAccessTokenDatabase(session, AccessToken)
@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from sqlalchemy import DateTime, Index, Integer, String, Text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from .base import Base
+
+
+class EmailJob(Base):
+    """
+    Our database SQLAlchemy model for an outbound email waiting to be sent.
+    Rows are deleted once the email is accepted by the provider, see app/core/emails.py.
+    """
+    __tablename__ = "email_job"
+    # The worker claims the due jobs in run_after order
+    __table_args__ = (
+        Index("ix_email_job_run_after", "run_after"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    to: Mapped[str] = mapped_column(String, nullable=False)
+    subject: Mapped[str] = mapped_column(String, nullable=False)
+    html: Mapped[str] = mapped_column(Text, nullable=False)
+    # Number of delivery attempts so far, counted when a worker claims the job
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # The job is not picked up before this time, used for both retry backoff and claim leases
+    run_after: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+
+class EmailDeadLetter(Base):
+    """
+    Our database SQLAlchemy model for an email that could not be delivered after every retry.
+    These are kept for inspection and can be moved back into email_job to retry them.
+    """
+    __tablename__ = "email_dead_letter"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    to: Mapped[str] = mapped_column(String, nullable=False)
+    subject: Mapped[str] = mapped_column(String, nullable=False)
+    html: Mapped[str] = mapped_column(Text, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    failed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+
+def enqueue_email(session: AsyncSession, to: str, subject: str, html: str) -> EmailJob:
+    """
+    Adds an email to the outbound queue. It is sent by the email worker once the caller commits,
+    so an email is only queued if the change that triggered it is saved too.
+    """
+    job = EmailJob(to=to, subject=subject, html=html)
+    session.add(job)
+    return job
@@ -1,6 +1,7 @@
 import uuid
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, DateTime, ForeignKey
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Computed, Index, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from .base import Base
 from datetime import datetime, timezone
 import enum
@@ -44,6 +45,17 @@ class Listing(Base):
     Our database SQLAlchemy model for a listing.
     """
     __tablename__ = "listing_table"
+    __table_args__ = (
+        Index("ix_listing_table_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_listing_table_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        # Indexes matching the filter and sort shapes of the listing queries, see the migration for details
+        Index("ix_listing_table_seller_id_updated_at", "seller_id", text("updated_at DESC"), text("id DESC")),
+        Index("ix_listing_table_status_updated_at", "status", text("updated_at DESC"), text("id DESC")),
+        Index("ix_listing_table_updated_at", text("updated_at DESC"), text("id DESC")),
+        Index("ix_listing_table_category_status_price", "category", "status", "price_cents"),
+        Index("ix_listing_table_active_price", "price_cents", "id", postgresql_where=text("status = 'ACTIVE'")),
+        Index("ix_listing_table_active_created_at", text("created_at DESC"), text("id DESC"), postgresql_where=text("status = 'ACTIVE'")),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     seller_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
     seller: Mapped["User"] = relationship(back_populates="listings")
@@ -56,4 +68,15 @@ class Listing(Base):
     category: Mapped[ListingCategory] = mapped_column(nullable=True)
     condition: Mapped[ListingCondition] = mapped_column(nullable=True)
     # server_default was added to provide a default value at the database level so that SQL inserts use the default value, suggested by Copilot
-    image: Mapped[str] = mapped_column(String, default="images/listings/placeholder.jpg", server_default="images/listings/placeholder.jpg", nullable=True)
\ No newline at end of file
+    image: Mapped[str] = mapped_column(String, default="images/listings/placeholder.jpg", server_default="images/listings/placeholder.jpg", nullable=True)
+    # Generated by Postgres from the title and description for keyword search, see app/db/search.py
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        nullable=True,
+        deferred=True,
+    )
@@ -0,0 +1,31 @@
+from sqlalchemy import Index, Integer, SmallInteger
+from sqlalchemy.orm import Mapped, mapped_column
+from .base import Base
+from .listing import ListingCategory, ListingCondition, ListingStatus
+
+
+class ListingFacetCounts(Base):
+    """
+    Our database SQLAlchemy model for the number of listings in one combination of category,
+    condition, status and price bucket. There are at most a few thousand combinations, so the
+    facet counts of the whole marketplace are a GROUP BY over this table instead of listing_table.
+    Rows are never written by the app: statement-level triggers on listing_table keep them up to
+    date, see the added_listing_facet_counts migration and app/db/facets.py.
+    """
+    __tablename__ = "listing_facet_counts"
+    # category and condition are nullable, so the key is a unique index that treats NULLs as equal
+    __table_args__ = (
+        Index(
+            "ix_listing_facet_counts_key",
+            "category", "condition", "status", "price_bucket",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    category: Mapped[ListingCategory] = mapped_column(nullable=True)
+    condition: Mapped[ListingCondition] = mapped_column(nullable=True)
+    status: Mapped[ListingStatus] = mapped_column(nullable=False)
+    # Index into PRICE_BUCKET_BOUNDS in app/db/facets.py
+    price_bucket: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    listing_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
@@ -0,0 +1,45 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Integer, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from .base import Base
+from .listing import ListingStatus
+
+
+class SellerListingStats(Base):
+    """
+    Our database SQLAlchemy model for the listing totals of one seller in one status.
+    Rows are never written by the app: statement-level triggers on listing_table add the
+    changes of every INSERT, UPDATE and DELETE to them, see the added_seller_listing_stats migration.
+    """
+    __tablename__ = "seller_listing_stats"
+    seller_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    status: Mapped[ListingStatus] = mapped_column(primary_key=True)
+    listing_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # Sum of price_cents over the listings in this status
+    value_cents: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
+    # Latest updated_at of a listing that entered or changed in this status
+    last_activity_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+async def load_seller_stats(session: AsyncSession, seller_id: uuid.UUID) -> dict:
+    """
+    Returns a seller's listing counts by status, the value of their active listings and their
+    last listing activity, read from at most one row per status instead of every listing.
+    """
+    result = await session.scalars(select(SellerListingStats).where(SellerListingStats.seller_id == seller_id))
+    rows = result.all()
+    counts = {status: 0 for status in ListingStatus}
+    active_value_cents = 0
+    for row in rows:
+        counts[row.status] = row.listing_count
+        if row.status == ListingStatus.ACTIVE:
+            active_value_cents = row.value_cents
+    activity = [row.last_activity_at for row in rows if row.listing_count and row.last_activity_at is not None]
+    return {
+        "counts": counts,
+        "total": sum(counts.values()),
+        "active_value_cents": active_value_cents,
+        "last_activity_at": max(activity, default=None),
+    }
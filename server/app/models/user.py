@@ -1,5 +1,5 @@
+import logging
 import uuid
-import resend
 
 from typing import List
 from fastapi import Depends, HTTPException
@@ -7,16 +7,25 @@ from fastapi_users import BaseUserManager, UUIDIDMixin, models
 from fastapi_users_db_sqlalchemy import SQLAlchemyBaseUserTableUUID, SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Boolean
+from sqlalchemy import String, Boolean, Index
 from app.db.database import get_async_session
 from .base import Base
 from app.core.config import settings
+from app.core.cache import user_counts
+from .email_job import enqueue_email
+
+logger = logging.getLogger(__name__)
 
 class User(SQLAlchemyBaseUserTableUUID, Base):
     """
     Our database SQLAlchemy model for a user.
     """
     __tablename__ = "user"
+    # Trigram indexes used by the admin user search, see app/db/search.py
+    __table_args__ = (
+        Index("ix_user_first_name_trgm", "first_name", postgresql_using="gin", postgresql_ops={"first_name": "gin_trgm_ops"}),
+        Index("ix_user_last_name_trgm", "last_name", postgresql_using="gin", postgresql_ops={"last_name": "gin_trgm_ops"}),
+    )
     first_name: Mapped[str] = mapped_column(String, nullable=True)
     last_name: Mapped[str] = mapped_column(String, nullable=True)
     phone_number: Mapped[str] = mapped_column(String, nullable=True)
@@ -43,27 +52,30 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
 
     async def on_after_register(self, user, request = None):
         """Requests user verification after registration."""
-        print(f"User {user.id} has registered.")
+        logger.info("User %s has registered", user.id)
+        await user_counts.invalidate()
         await self.request_verify(user, request)
 
 
     async def on_after_request_verify(self, user, token, _ = None):
-        """Performs email verification with Resend."""
-        print(f"Verification requested for user {user.id} with token {token}")
+        """Queues the verification email."""
+        logger.info("Verification requested for user %s", user.id)
         verification_url = f"{settings.base_url}/auth/verify-email?token={token}"
-        print(f"Verification URL: {verification_url}")
-        params: resend.Emails.SendParams = {
-            "from": "noreply@gatormarket.com",
-            "to": [user.email],
-            "subject": "Verify your email - GatorMarket",
-            "html": f"<p>Please verify your email using the following link: <a href={verification_url}>Click to verify your email</a></p>"
-        }
-        email = resend.Emails.send(params)
-        print(email)
+        # Anyone with the link can verify the account, so it is only logged at debug level for local development
+        logger.debug("Verification URL for user %s: %s", user.id, verification_url)
+        # Queued for the email worker so registration does not wait on the email provider
+        enqueue_email(
+            self.user_db.session,
+            to=user.email,
+            subject="Verify your email - GatorMarket",
+            html=f"<p>Please verify your email using the following link: <a href={verification_url}>Click to verify your email</a></p>",
+        )
+        await self.user_db.session.commit()
 
     async def on_after_verify(self, user, request = None):
         """Logs when a user has been verified."""
-        print(f"User {user.id} has been verified.")
+        logger.info("User %s has been verified", user.id)
+        await user_counts.invalidate()
 
     async def authenticate(self, credentials) -> User | None:
         """
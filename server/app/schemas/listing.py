@@ -1,12 +1,37 @@
 import uuid
-from pydantic import BaseModel, ConfigDict, computed_field, field_serializer
+from decimal import Decimal
+from pydantic import BaseModel, ConfigDict, Field, computed_field, field_serializer, field_validator
 from app.models.listing import ListingStatus, ListingCategory, ListingCondition
 from datetime import datetime
 from app.core.config import settings
+from app.core.images import variant_urls, LISTING_VARIANTS
 from fastapi import UploadFile, File
 
 # Source: https://medium.com/@ajaygohil2563/unlocking-the-power-of-nested-pydantic-schemas-in-fastapi-d7c872423aa4
 
+# Frontend labels for the listing enums, lowercase with spaces instead of underscores, built once at import
+ENUM_LABELS = {
+    member: member.value.replace("_", " ").lower()
+    for enum_class in (ListingStatus, ListingCategory, ListingCondition)
+    for member in enum_class
+}
+
+def enum_label(value) -> str | None:
+    """Returns the frontend label of a listing enum value."""
+    if value is None:
+        return None
+    return ENUM_LABELS[value]
+
+def normalize_keyword(keyword: str | None) -> str | None:
+    """
+    Normalizes a search keyword so that equivalent searches share the same cache entries.
+    Searches are case-insensitive, so casing and repeated whitespace are dropped.
+    """
+    if keyword is None:
+        return None
+    keyword = " ".join(keyword.split()).lower()
+    return keyword or None
+
 class SellerResponse(BaseModel):
     """Pydantic model used to retrieve the listing seller's details."""
     first_name: str
@@ -32,9 +57,7 @@ class UserListingResponse(BaseModel):
     @field_serializer('status', 'category', 'condition', mode='plain')
     def remove_underscores(self, value) -> str:
         """Removes underscores from enum values and makes them lowercase to pass to frontend."""
-        if value is None:
-            return None
-        return value.value.replace("_", " ").lower()
+        return enum_label(value)
     
     @computed_field
     @property
@@ -44,6 +67,12 @@ class UserListingResponse(BaseModel):
             return None
 
         return f"{settings.base_url}/static/{self.image}" # Source: https://github.com/fastapi/fastapi/discussions/9430
+
+    @computed_field
+    @property
+    def image_variants(self) -> dict[str, str] | None:
+        """Generates the URLs of the resized image variants, keyed by variant name, for building a srcset."""
+        return variant_urls(self.image, LISTING_VARIANTS)
     
 class ListingResponse(BaseModel):
     """
@@ -67,9 +96,7 @@ class ListingResponse(BaseModel):
         """
         Removes underscores from enum values to pass to the frontend.
         """
-        if value is None:
-            return None
-        return value.value.replace("_", " ").lower()
+        return enum_label(value)
     
     @computed_field
     @property
@@ -78,4 +105,158 @@ class ListingResponse(BaseModel):
         if self.image is None:
             return None
 
-        return f"{settings.base_url}/static/{self.image}" # Source: https://github.com/fastapi/fastapi/discussions/9430
\ No newline at end of file
+        return f"{settings.base_url}/static/{self.image}" # Source: https://github.com/fastapi/fastapi/discussions/9430
+
+    @computed_field
+    @property
+    def image_variants(self) -> dict[str, str] | None:
+        """Generates the URLs of the resized image variants, keyed by variant name, for building a srcset."""
+        return variant_urls(self.image, LISTING_VARIANTS)
+
+
+class ListingFilters(BaseModel):
+    """
+    Pydantic model for the validated listing filter query parameters.
+    It is frozen so it can be used directly as a cache key for filter-dependent results.
+    """
+    model_config = ConfigDict(frozen=True)
+    status: ListingStatus | None = None
+    category: ListingCategory | None = None
+    condition: ListingCondition | None = None
+    min_price: int | None = None
+    max_price: int | None = None
+    keyword: str | None = None
+    # Set by the seller-scoped endpoints, never taken from the public query parameters
+    seller_id: uuid.UUID | None = None
+
+
+class SellerStatsResponse(BaseModel):
+    """Pydantic model for a seller's listing totals, read from seller_listing_stats."""
+    counts: dict[ListingStatus, int]
+    total: int
+    active_value_cents: int
+    last_activity_at: datetime | None
+
+    @field_serializer('counts', mode='plain')
+    def label_statuses(self, counts: dict[ListingStatus, int]) -> dict[str, int]:
+        """Uses the frontend labels of the statuses as keys."""
+        return {enum_label(status): count for status, count in counts.items()}
+
+
+class PriceBucketCount(BaseModel):
+    """Pydantic model for the number of listings in one price range, max_cents being exclusive."""
+    min_cents: int
+    max_cents: int | None
+    count: int
+
+
+class ListingFacetsResponse(BaseModel):
+    """
+    Pydantic model for the listing counts per filter value shown in the filter sidebar.
+    source says whether they were read from the listing_facet_counts summary or counted live.
+    """
+    total: int
+    status: dict[ListingStatus, int]
+    category: dict[ListingCategory, int]
+    condition: dict[ListingCondition, int]
+    price: list[PriceBucketCount]
+    source: str
+
+    @field_serializer('status', 'category', 'condition', mode='plain')
+    def label_values(self, counts: dict) -> dict[str, int]:
+        """Uses the frontend labels of the enum values as keys."""
+        return {enum_label(value): count for value, count in counts.items()}
+
+
+def parse_enum_name(enum_class, value):
+    """Accepts an enum member name or its frontend label in any case, e.g. "LIKE_NEW" or "like new"."""
+    if value is None or isinstance(value, enum_class):
+        return value
+    name = str(value).strip().upper().replace(" ", "_")
+    if not name:
+        return None
+    try:
+        return enum_class[name]
+    except KeyError:
+        raise ValueError(f"'{value}' is not one of {', '.join(member.name for member in enum_class)}")
+
+
+class ListingImportRow(BaseModel):
+    """
+    Pydantic model for one row of a listing import manifest.
+    price is in dollars like the create form, with at most two decimal places. image is the
+    filename of one of the images uploaded with the manifest. Empty CSV cells count as missing.
+    """
+    model_config = ConfigDict(str_strip_whitespace=True, extra="forbid")
+    title: str = Field(min_length=1)
+    description: str
+    price: Decimal = Field(ge=0, le=Decimal("21474836.47"), decimal_places=2)
+    category: ListingCategory | None = None
+    condition: ListingCondition | None = None
+    status: ListingStatus = ListingStatus.ACTIVE
+    image: str | None = None
+
+    @field_validator('category', 'condition', 'image', mode='before')
+    @classmethod
+    def empty_as_none(cls, value):
+        return None if isinstance(value, str) and not value.strip() else value
+
+    @field_validator('category', mode='before')
+    @classmethod
+    def parse_category(cls, value):
+        return parse_enum_name(ListingCategory, value)
+
+    @field_validator('condition', mode='before')
+    @classmethod
+    def parse_condition(cls, value):
+        return parse_enum_name(ListingCondition, value)
+
+    @field_validator('status', mode='before')
+    @classmethod
+    def parse_status(cls, value):
+        return parse_enum_name(ListingStatus, value) or ListingStatus.ACTIVE
+
+    @property
+    def price_cents(self) -> int:
+        return int(self.price * 100)
+
+
+class ListingImportResult(BaseModel):
+    """Pydantic model for the outcome of one manifest row, with the new listing's id or why it was rejected."""
+    row: int
+    id: int | None = None
+    errors: list[str] = []
+
+
+class ListingImportResponse(BaseModel):
+    """
+    Pydantic model for the result of a listing import, one result per manifest row in order.
+    truncated is set when the manifest had more rows than settings.listing_import_max_rows.
+    """
+    created: int
+    failed: int
+    truncated: bool
+    results: list[ListingImportResult]
+
+
+class ListingTombstone(BaseModel):
+    """Pydantic model for a listing that left ACTIVE status, which delta sync clients should drop."""
+    id: int
+    status: ListingStatus
+    updated_at: datetime
+
+    @field_serializer('status', mode='plain')
+    def label_status(self, value) -> str:
+        return enum_label(value)
+
+
+class ListingChangesResponse(BaseModel):
+    """
+    Pydantic model for one page of GET /listings/changes.
+    listings are the active listings created or changed since the sync token, removed the ones that
+    left ACTIVE status. sync_token is passed back to get the next changes, right away while has_more is set.
+    """
+    listings: list[UserListingResponse]
+    removed: list[ListingTombstone]
+    sync_token: str
+    has_more: bool
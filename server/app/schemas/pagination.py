@@ -1,3 +1,6 @@
+import base64
+import json
+from datetime import datetime
 from pydantic import BaseModel
 from enum import Enum
 from fastapi import Query
@@ -9,13 +12,100 @@ class SortEnum(Enum):
     ASC = "asc"
     DESC = "desc"
 
+class CursorDirection(Enum):
+    """Enum for the direction a keyset cursor points in."""
+    NEXT = "next"
+    PREV = "prev"
+
 class Pagination(BaseModel):
     """Pydantic model for pagination query parameters."""
     page_num: int
     card_num: int
 
+class Cursor(BaseModel):
+    """
+    Pydantic model for a decoded keyset pagination cursor.
+    It stores the sort key of the boundary row plus its id as a tie-breaker.
+    """
+    sort_by: str
+    order: str
+    value: int | str | datetime
+    id: int
+    direction: CursorDirection
+
 def pagination_params (
         page_num: int = Query(ge=1, required=False, default=1, le=500000),
         card_num: int = Query(ge=1, le=100, required=False, default=10),
 ):
-    return Pagination(page_num=page_num, card_num=card_num)
\ No newline at end of file
+    return Pagination(page_num=page_num, card_num=card_num)
+
+def seller_pagination_params(
+        page_num: int = Query(ge=1, required=False, default=1, le=500000),
+        card_num: int = Query(ge=1, le=100, required=False, default=50),
+):
+    """The pagination parameters of the seller listing pages, which show more cards per page than search results."""
+    return Pagination(page_num=page_num, card_num=card_num)
+
+def encode_cursor(cursor: Cursor) -> str:
+    """
+    Encodes a cursor into an opaque, URL-safe token that can be passed back as the cursor query parameter.
+    """
+    value = cursor.value.isoformat() if isinstance(cursor.value, datetime) else cursor.value
+    payload = {
+        "s": cursor.sort_by,
+        "o": cursor.order,
+        "v": value,
+        "t": isinstance(cursor.value, datetime),
+        "i": cursor.id,
+        "d": cursor.direction.value,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Cursor:
+    """
+    Decodes a token created by encode_cursor.
+    Raises a ValueError if the token is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        value = datetime.fromisoformat(payload["v"]) if payload["t"] else payload["v"]
+        return Cursor(
+            sort_by=payload["s"],
+            order=payload["o"],
+            value=value,
+            id=payload["i"],
+            direction=CursorDirection(payload["d"]),
+        )
+    except (ValueError, TypeError, KeyError) as exc:
+        raise ValueError("Malformed cursor.") from exc
+
+class SyncToken(BaseModel):
+    """
+    Pydantic model for a decoded delta sync token of GET /listings/changes.
+    It is the (updated_at, id) of the last change a client has seen, changes after it come next.
+    """
+    updated_at: datetime
+    id: int
+
+def encode_sync_token(token: SyncToken) -> str:
+    """Encodes a sync token into an opaque, URL-safe string like encode_cursor does."""
+    payload = {"u": token.updated_at.isoformat(), "i": token.id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_sync_token(token: str) -> SyncToken:
+    """
+    Decodes a token created by encode_sync_token.
+    Raises a ValueError if the token is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        updated_at = datetime.fromisoformat(payload["u"])
+        if updated_at.tzinfo is None:
+            raise ValueError("Sync token without a time zone.")
+        return SyncToken(updated_at=updated_at, id=payload["i"])
+    except (ValueError, TypeError, KeyError) as exc:
+        raise ValueError("Malformed sync token.") from exc
@@ -1,8 +1,10 @@
 import uuid
 
 from fastapi_users import schemas
-from pydantic import field_validator, ConfigDict, BaseModel, computed_field
+from pydantic import field_validator, model_validator, ConfigDict, BaseModel, Field, computed_field
 from app.core.config import settings
+from app.core.images import variant_urls, PROFILE_VARIANTS
+from app.schemas.listing import normalize_keyword
 
 
 # Required for auth.py
@@ -48,4 +50,57 @@ class UserResponse(BaseModel):
         if self.profile_picture is None:
             return None
 
-        return f"{settings.base_url}/static/{self.profile_picture}" # Source: https://github.com/fastapi/fastapi/discussions/9430/
\ No newline at end of file
+        return f"{settings.base_url}/static/{self.profile_picture}" # Source: https://github.com/fastapi/fastapi/discussions/9430/
+
+    @computed_field
+    @property
+    def profile_picture_variants(self) -> dict[str, str] | None:
+        """Generates the URLs of the resized profile picture variants, keyed by variant name."""
+        return variant_urls(self.profile_picture, PROFILE_VARIANTS)
+
+
+class UserFilters(BaseModel):
+    """
+    Pydantic model for the validated admin user filter query parameters.
+    It is frozen so it can be used directly as a cache key for filter-dependent results.
+    """
+    model_config = ConfigDict(frozen=True)
+    is_active: bool | None = None
+    is_admin: bool | None = None
+    is_verified: bool | None = None
+    keyword: str | None = None
+
+    @field_validator("keyword")
+    def normalized_keyword(cls, v: str | None) -> str | None:
+        # A blank keyword filters nothing, so it must not count as a filter
+        return normalize_keyword(v)
+
+
+class BulkModerationRequest(BaseModel):
+    """
+    Pydantic model for the admin bulk ban and unban request body.
+    Exactly one of user_ids or filters selects the users. With dry_run the outcomes are
+    reported but nothing is saved.
+    """
+    user_ids: list[uuid.UUID] | None = Field(None, max_length=10000)
+    filters: UserFilters | None = None
+    # Also deactivate the listings of banned users, or reactivate them on unban
+    include_listings: bool = True
+    dry_run: bool = False
+
+    @model_validator(mode="after")
+    def one_selector(self):
+        if (self.user_ids is None) == (self.filters is None):
+            raise ValueError("Provide exactly one of user_ids or filters.")
+        if self.filters is not None and self.filters == UserFilters():
+            raise ValueError("filters must set at least one field, a blank keyword does not count.")
+        return self
+
+
+class ModerationOutcome(BaseModel):
+    """Pydantic model for the result of a bulk moderation action on one user, streamed as one NDJSON line."""
+    user_id: uuid.UUID
+    # "banned", "unbanned", "unchanged", "rejected" or "not_found"
+    outcome: str
+    detail: str | None = None
+    listing_ids: list[int] = []
@@ -0,0 +1,120 @@
+"""
+Benchmark for POST /listings/import against a raw COPY of the same rows.
+
+Builds a JSONL manifest of --rows listings from the fixtures in scripts/init.sql and imports it
+for bench-0@ufl.edu with app/core/listing_import.py, the same code the route runs, then copies
+the same rows straight into listing_table with asyncpg's COPY. Both write through the listing
+triggers. The imported rows are deleted after every run.
+Needs the benchmark data from benchmarks/seed.py. Run from the server folder:
+
+    RESEND_API_KEY=x uv run python -m benchmarks.bench_listing_import --rows 5000
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+from datetime import datetime, timezone
+from fastapi import UploadFile
+from sqlalchemy import delete, select
+from app.api.listings import LISTINGS_DIR
+from app.core.config import settings
+from app.core.listing_import import import_listings
+from app.db.database import AsyncSessionLocal
+from app.models.listing import Listing
+from app.models.user import User
+from benchmarks.seed import BENCHMARK_USER_EMAIL, DEFAULT_FIXTURES, load_fixtures
+
+TITLE_PREFIX = "import-bench "
+REPEAT = 3
+
+COPY_COLUMNS = [
+    "seller_id", "title", "description", "price_cents", "status",
+    "created_at", "updated_at", "category", "condition", "image",
+]
+
+
+def build_manifest(rows: int) -> tuple[bytes, list[dict]]:
+    """Returns the JSONL manifest and the same rows as dicts."""
+    fixtures = load_fixtures(DEFAULT_FIXTURES)
+    listings = []
+    for i in range(rows):
+        fixture = fixtures[i % len(fixtures)]
+        listings.append({
+            "title": f"{TITLE_PREFIX}{fixture.title} #{i}",
+            "description": fixture.description,
+            "price": f"{fixture.price_cents / 100:.2f}",
+            "category": fixture.category,
+            "condition": fixture.condition,
+        })
+    manifest = "".join(json.dumps(listing) + "\n" for listing in listings)
+    return manifest.encode(), listings
+
+
+async def cleanup() -> None:
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(Listing).where(Listing.title.startswith(TITLE_PREFIX)))
+        await session.commit()
+
+
+async def run_import(seller_id, manifest: bytes) -> float:
+    upload = UploadFile(file=io.BytesIO(manifest), filename="manifest.jsonl")
+    async with AsyncSessionLocal() as session:
+        start = time.perf_counter()
+        summary = await import_listings(session, seller_id, upload, "jsonl", [], LISTINGS_DIR)
+        elapsed = time.perf_counter() - start
+    if summary["failed"]:
+        raise RuntimeError(f"{summary['failed']} rows failed to import")
+    return elapsed
+
+
+async def run_copy(seller_id, listings: list[dict]) -> float:
+    async with AsyncSessionLocal() as session:
+        connection = await session.connection()
+        raw = (await connection.get_raw_connection()).driver_connection
+        start = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        records = [
+            (
+                seller_id, listing["title"], listing["description"], round(float(listing["price"]) * 100),
+                "ACTIVE", now, now, listing["category"], listing["condition"], None,
+            )
+            for listing in listings
+        ]
+        await raw.copy_records_to_table("listing_table", records=records, columns=COPY_COLUMNS)
+        await session.commit()
+        return time.perf_counter() - start
+
+
+async def run(rows: int) -> None:
+    settings.listing_import_max_rows = max(settings.listing_import_max_rows, rows)
+    manifest, listings = build_manifest(rows)
+    async with AsyncSessionLocal() as session:
+        seller_id = await session.scalar(select(User.id).where(User.email == BENCHMARK_USER_EMAIL))
+    if seller_id is None:
+        raise SystemExit("Seed the benchmark data first with `python -m benchmarks.seed`.")
+
+    timings = {"import": [], "copy": []}
+    for _ in range(REPEAT):
+        await cleanup()
+        timings["import"].append(await run_import(seller_id, manifest))
+        await cleanup()
+        timings["copy"].append(await run_copy(seller_id, listings))
+    await cleanup()
+
+    best = {name: min(values) for name, values in timings.items()}
+    for name, seconds in best.items():
+        print(f"{name:>7}: {seconds * 1000:8.1f} ms  {rows / seconds:10.0f} rows/s")
+    print(f"  ratio: {best['import'] / best['copy']:.1f}x the time of COPY "
+          f"(batch size {settings.listing_import_batch_size})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the listing import with a raw COPY.")
+    parser.add_argument("--rows", type=int, default=5000, help="listings per run")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares the results of benchmarks/load.py against a stored baseline and fails on regressions.
+
+An endpoint regresses when its p95 or p99 latency grows by more than --latency-threshold (and by
+at least --min-latency-delta-ms, so tiny endpoints do not fail on noise), its throughput drops
+by more than --throughput-threshold, its error rate grows, or it runs more SQL statements per
+request than before. Endpoints with fewer than --min-requests samples in the baseline are skipped,
+since their tail latencies are mostly noise. Exits with status 1 if anything regressed, so a CI job can run:
+
+    RESEND_API_KEY=x uv run python -m benchmarks.compare benchmarks/baseline.json benchmarks/results/latest.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def error_rate(stats: dict) -> float:
+    return stats["errors"] / stats["requests"] if stats["requests"] else 0.0
+
+
+def compare_endpoint(baseline: dict, current: dict, args: argparse.Namespace) -> list[str]:
+    """Returns a description of each way current is worse than baseline."""
+    problems = []
+    for name in ("p95", "p99"):
+        before, after = baseline["latency_ms"][name], current["latency_ms"][name]
+        if after > before * (1 + args.latency_threshold) and after - before >= args.min_latency_delta_ms:
+            problems.append(f"{name} {before:.1f} -> {after:.1f} ms")
+    before, after = baseline["throughput_rps"], current["throughput_rps"]
+    if after < before * (1 - args.throughput_threshold):
+        problems.append(f"throughput {before:.1f} -> {after:.1f} rps")
+    before, after = error_rate(baseline), error_rate(current)
+    if after > before + args.error_rate_threshold:
+        problems.append(f"error rate {before:.1%} -> {after:.1%}")
+    if baseline["db_queries"] and current["db_queries"]:
+        # Query counts barely vary between runs, so half a statement per request is already a new query
+        before, after = baseline["db_queries"]["mean"], current["db_queries"]["mean"]
+        if after - before >= 0.5:
+            problems.append(f"queries {before:.1f} -> {after:.1f} per request")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare load test results against a baseline.")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--latency-threshold", type=float, default=0.2, help="allowed relative p95/p99 growth")
+    parser.add_argument("--min-latency-delta-ms", type=float, default=5.0, help="smallest latency growth that counts")
+    parser.add_argument("--throughput-threshold", type=float, default=0.2, help="allowed relative throughput drop")
+    parser.add_argument("--error-rate-threshold", type=float, default=0.01, help="allowed error rate growth")
+    parser.add_argument("--min-requests", type=int, default=20, help="skip endpoints with fewer baseline requests than this")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())
+    current = json.loads(args.current.read_text())
+
+    regressed = False
+    for endpoint, before in baseline["endpoints"].items():
+        after = current["endpoints"].get(endpoint)
+        if after is None:
+            print(f"{'MISSING':<9} {endpoint:<30} not in the current results")
+            regressed = True
+            continue
+        if before["requests"] < args.min_requests:
+            print(f"skipped   {endpoint:<30} only {before['requests']} requests in the baseline")
+            continue
+        problems = compare_endpoint(before, after, args)
+        status = "REGRESSED" if problems else "ok"
+        print(f"{status:<9} {endpoint:<30} p95 {before['latency_ms']['p95']:.1f} -> {after['latency_ms']['p95']:.1f} ms  {'; '.join(problems)}")
+        regressed = regressed or bool(problems)
+    for endpoint in current["endpoints"].keys() - baseline["endpoints"].keys():
+        print(f"new       {endpoint:<30} not in the baseline")
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
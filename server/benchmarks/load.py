@@ -0,0 +1,307 @@
+"""
+Load test that replays a realistic mix of traffic against a running server.
+
+Each of --concurrency virtual users repeatedly picks a scenario from MIX and runs its requests
+back to back. The scenarios are browsing with filters and keyset cursors, keyword searches,
+listing detail views, creating listings with an image, and admin moderation. After --warmup
+seconds, every request is recorded under its endpoint and the report gives p50/p95/p99 latency,
+throughput, errors and the number of SQL statements each request ran. Query counts need the server
+to run with DB_QUERY_COUNT_HEADER=true, they are left out otherwise. Every virtual user comes from
+the same IP, so run the server with RATE_LIMIT_ENABLED=false or the rate limit ends up being measured.
+
+Seed the database with benchmarks/seed.py first, then start the server and run from the server folder:
+
+    DB_QUERY_COUNT_HEADER=true RATE_LIMIT_ENABLED=false RESEND_API_KEY=x uv run uvicorn app.main:app --port 8080 --workers 4
+    RESEND_API_KEY=x uv run python -m benchmarks.load --duration 60 --output benchmarks/results/latest.json
+
+The JSON written by --output can be checked against a stored baseline with benchmarks/compare.py.
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+from pathlib import Path
+import httpx
+from PIL import Image
+from app.core.instrumentation import QUERY_COUNT_HEADER
+from benchmarks.seed import (
+    BENCHMARK_ADMIN_EMAIL, BENCHMARK_EMAIL_PREFIX, BENCHMARK_PASSWORD, BENCHMARK_USER_EMAIL,
+    DEFAULT_FIXTURES, load_fixtures,
+)
+
+# Scenarios and how often each is picked
+MIX = {
+    "browse": 45,
+    "search": 20,
+    "detail": 25,
+    "create": 5,
+    "moderate": 5,
+}
+
+SORTS = [("updated_at", "desc"), ("created_at", "desc"), ("price", "asc"), ("price", "desc")]
+CATEGORIES = ["electronics", "textbooks", "furniture", "appliances", "school_supplies", "clothing", None]
+CONDITIONS = ["new", "like_new", "very_good", "good", "used", None]
+# Fields the grid cards of the frontend show
+CARD_FIELDS = "id,title,description,price_cents,status,image_variants"
+
+
+@dataclass
+class Sample:
+    """One recorded request."""
+    endpoint: str
+    seconds: float
+    status: int
+    queries: int | None
+
+
+@dataclass
+class LoadTest:
+    """The clients, the ids the scenarios pick from and the recorded samples."""
+    user: httpx.AsyncClient
+    admin: httpx.AsyncClient
+    listing_ids: list[int]
+    victim_ids: list[str]
+    keywords: list[str]
+    image: bytes
+    recording: bool = False
+    samples: list[Sample] = field(default_factory=list)
+
+    async def request(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Sends a request and records it under endpoint, a name shared by requests to the same route."""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            if self.recording:
+                self.samples.append(Sample(endpoint, time.perf_counter() - start, 0, None))
+            raise
+        seconds = time.perf_counter() - start
+        if self.recording:
+            queries = response.headers.get(QUERY_COUNT_HEADER)
+            self.samples.append(Sample(endpoint, seconds, response.status_code, int(queries) if queries else None))
+        return response
+
+
+async def browse(test: LoadTest, rng: random.Random) -> None:
+    """Opens the listings page with a random sort and filters and follows the cursor for a few pages."""
+    sort_by, order = rng.choice(SORTS)
+    params = {"card_num": 20, "sort_by": sort_by, "order": order, "status": "active", "fields": CARD_FIELDS, "description_length": 120}
+    if category := rng.choice(CATEGORIES):
+        params["category"] = category
+    if condition := rng.choice(CONDITIONS):
+        params["condition"] = condition
+    if rng.random() < 0.3:
+        params["max_price"] = rng.choice([2000, 5000, 10000])
+    endpoint = "GET /listings"
+    for _ in range(rng.randint(1, 3)):
+        response = await test.request(test.user, endpoint, "GET", "/listings", params=params)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params["cursor"] = cursor
+        endpoint = "GET /listings?cursor"
+
+
+async def search(test: LoadTest, rng: random.Random) -> None:
+    """Searches listings by a keyword from the fixture titles, ranked by relevance."""
+    params = {"card_num": 20, "keyword": rng.choice(test.keywords), "sort_by": "relevance", "fields": CARD_FIELDS, "description_length": 120}
+    await test.request(test.user, "GET /listings?keyword", "GET", "/listings", params=params)
+
+
+async def detail(test: LoadTest, rng: random.Random) -> None:
+    """Opens one listing, favouring a small set of popular ones like real traffic does."""
+    popular = test.listing_ids[:10]
+    listing_id = rng.choice(popular if rng.random() < 0.5 else test.listing_ids)
+    await test.request(test.user, "GET /listings/{id}", "GET", f"/listings/{listing_id}")
+
+
+async def create(test: LoadTest, rng: random.Random) -> None:
+    """Posts a new listing with an image."""
+    data = {
+        "title": f"Benchmark listing {rng.randrange(1_000_000)}",
+        "description": "Posted by the load test.",
+        "price": str(rng.randint(1, 200)),
+        "category": "MISCELLANEOUS",
+        "condition": "GOOD",
+    }
+    files = {"image": ("benchmark.jpg", test.image, "image/jpeg")}
+    await test.request(test.user, "POST /listings/new", "POST", "/listings/new", data=data, files=files)
+
+
+async def moderate(test: LoadTest, rng: random.Random) -> None:
+    """Reviews the newest listings and the user list as an admin, then bans and unbans a user."""
+    await test.request(test.admin, "GET /admin/listings", "GET", "/admin/listings", params={"card_num": 50})
+    await test.request(test.admin, "GET /admin/users", "GET", "/admin/users", params={"card_num": 50, "keyword": "bench"})
+    user_id = rng.choice(test.victim_ids)
+    await test.request(test.admin, "POST /admin/users/{id}/ban", "POST", f"/admin/users/{user_id}/ban")
+    await test.request(test.admin, "POST /admin/users/{id}/unban", "POST", f"/admin/users/{user_id}/unban")
+
+
+SCENARIOS = {"browse": browse, "search": search, "detail": detail, "create": create, "moderate": moderate}
+
+
+def build_image() -> bytes:
+    """Builds a small JPEG for the listing uploads."""
+    image = Image.linear_gradient("L").resize((640, 480)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+async def login(base_url: str, email: str) -> httpx.AsyncClient:
+    """Returns a client holding the auth cookie of a benchmark user."""
+    client = httpx.AsyncClient(base_url=base_url, timeout=30.0)
+    response = await client.post("/auth/login", data={"username": email, "password": BENCHMARK_PASSWORD})
+    if response.status_code >= 400:
+        raise SystemExit(f"Could not log in as {email} ({response.status_code}), run benchmarks.seed first.")
+    # The cookie domain from the settings may not match base_url, so keep the cookie for every host
+    for header in response.headers.get_list("set-cookie"):
+        for name, morsel in SimpleCookie(header).items():
+            client.cookies.set(name, morsel.value)
+    return client
+
+
+async def prepare(base_url: str, fixtures: Path) -> LoadTest:
+    """Logs in and collects the listing and user ids the scenarios pick from."""
+    user = await login(base_url, BENCHMARK_USER_EMAIL)
+    admin = await login(base_url, BENCHMARK_ADMIN_EMAIL)
+    listings = await user.get("/listings", params={"card_num": 100, "status": "active", "fields": "id"})
+    users = await admin.get("/admin/users", params={"card_num": 100, "fields": "id,email"})
+    victim_ids = [
+        row["id"] for row in users.json()
+        if row["email"].startswith(BENCHMARK_EMAIL_PREFIX) and row["email"] not in (BENCHMARK_USER_EMAIL, BENCHMARK_ADMIN_EMAIL)
+    ]
+    listing_ids = [row["id"] for row in listings.json()]
+    if not listing_ids or not victim_ids:
+        raise SystemExit("No benchmark listings or users found, run benchmarks.seed first.")
+    keywords = sorted({word.lower() for fixture in load_fixtures(fixtures) for word in fixture.title.split() if len(word) > 3})
+    return LoadTest(user, admin, listing_ids, victim_ids, keywords, build_image())
+
+
+async def virtual_user(test: LoadTest, rng: random.Random, deadline: float) -> None:
+    """Runs scenarios picked from MIX until the deadline."""
+    names, weights = list(MIX), list(MIX.values())
+    while time.perf_counter() < deadline:
+        try:
+            await SCENARIOS[rng.choices(names, weights)[0]](test, rng)
+        except httpx.HTTPError:
+            # Already recorded as a failed request with status 0
+            pass
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: list[Sample], seconds: float) -> dict:
+    """Latency percentiles in milliseconds, throughput and query counts of a set of samples."""
+    latencies = sorted(sample.seconds * 1000 for sample in samples)
+    queries = [sample.queries for sample in samples if sample.queries is not None]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if sample.status == 0 or sample.status >= 400),
+        "throughput_rps": round(len(samples) / seconds, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "mean": round(sum(latencies) / len(latencies), 2),
+            "max": round(latencies[-1], 2),
+        },
+        "db_queries": {
+            "mean": round(sum(queries) / len(queries), 2),
+            "max": max(queries),
+        } if queries else None,
+    }
+
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Runs the warmup and the measured period and returns the results."""
+    test = await prepare(args.base_url, args.fixtures)
+    try:
+        started_at = datetime.now(timezone.utc)
+        warmup_end = time.perf_counter() + args.warmup
+        deadline = warmup_end + args.duration
+        workers = [
+            asyncio.create_task(virtual_user(test, random.Random(args.seed + i), deadline))
+            for i in range(args.concurrency)
+        ]
+        await asyncio.sleep(args.warmup)
+        test.recording = True
+        measured_start = time.perf_counter()
+        await asyncio.gather(*workers)
+        measured = time.perf_counter() - measured_start
+    finally:
+        await test.user.aclose()
+        await test.admin.aclose()
+
+    by_endpoint = defaultdict(list)
+    for sample in test.samples:
+        by_endpoint[sample.endpoint].append(sample)
+    return {
+        "meta": {
+            "started_at": started_at.isoformat(),
+            "commit": current_commit(),
+            "base_url": args.base_url,
+            "duration_seconds": round(measured, 2),
+            "warmup_seconds": args.warmup,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "mix": MIX,
+        },
+        "total": summarize(test.samples, measured) if test.samples else None,
+        "endpoints": {endpoint: summarize(samples, measured) for endpoint, samples in sorted(by_endpoint.items())},
+    }
+
+
+def print_report(results: dict) -> None:
+    print(f"{'endpoint':<30} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    rows = [*results["endpoints"].items(), ("total", results["total"])]
+    for endpoint, stats in rows:
+        if stats is None:
+            continue
+        latency = stats["latency_ms"]
+        queries = f"{stats['db_queries']['mean']:.1f}" if stats["db_queries"] else "-"
+        print(
+            f"{endpoint:<30} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+            f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f} {queries:>8}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a traffic mix against a running server.")
+    parser.add_argument("--base-url", default="http://localhost:8080")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of traffic before recording starts")
+    parser.add_argument("--concurrency", type=int, default=16, help="number of virtual users")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the scenario choices")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES, help="SQL file the search keywords come from")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_report(results)
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
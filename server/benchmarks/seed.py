@@ -0,0 +1,180 @@
+"""
+Seeds the database with benchmark data at a given scale factor.
+
+Scale factor 1 is 100 users and 1,000 listings. Listings are variations of the fixtures in
+scripts/init.sql, spread over every category, condition and the last year of created_at values,
+with filler words in the descriptions so keyword searches match realistic numbers of rows.
+Every generated user has an email starting with "bench-" and the password BENCHMARK_PASSWORD.
+bench-admin@ufl.edu is a superuser and bench-0@ufl.edu is the user benchmarks/load.py logs in as.
+--reset deletes the generated users, and with them their listings, before seeding.
+Run from the server folder:
+
+    RESEND_API_KEY=x uv run python -m benchmarks.seed --scale 10 --reset
+"""
+import argparse
+import asyncio
+import random
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from fastapi_users.password import PasswordHelper
+from sqlalchemy import delete, insert, text
+from app.db.database import AsyncSessionLocal
+from app.models.listing import Listing, ListingCategory, ListingCondition, ListingStatus
+from app.models.user import User
+
+USERS_PER_SCALE = 100
+LISTINGS_PER_SCALE = 1000
+INSERT_BATCH_SIZE = 5000
+
+BENCHMARK_EMAIL_PREFIX = "bench-"
+BENCHMARK_PASSWORD = "benchmark-password"
+BENCHMARK_ADMIN_EMAIL = "bench-admin@ufl.edu"
+BENCHMARK_USER_EMAIL = "bench-0@ufl.edu"
+
+DEFAULT_FIXTURES = Path(__file__).resolve().parents[2] / "scripts" / "init.sql"
+
+FILLER_WORDS = [
+    "dorm", "campus", "pickup", "gently", "used", "clean", "works", "great", "semester", "moving",
+    "cheap", "negotiable", "barely", "original", "box", "bundle", "gator", "apartment", "fast", "sale",
+]
+
+# Statuses of the generated listings and how often each appears
+STATUS_WEIGHTS = {ListingStatus.ACTIVE: 85, ListingStatus.INACTIVE: 10, ListingStatus.SOLD: 5}
+
+
+@dataclass
+class Fixture:
+    """One listing from scripts/init.sql."""
+    title: str
+    description: str
+    price_cents: int
+    category: str
+    condition: str
+    image: str
+
+
+# One parenthesized value list of the INSERT in scripts/init.sql
+VALUES_PATTERN = re.compile(r"\(\s*('(?:[^']|'')*'(?:\s*,\s*(?:'(?:[^']|'')*'|\d+|NOW\(\)))+)\s*\)")
+FIELD_PATTERN = re.compile(r"'((?:[^']|'')*)'|(\d+)|NOW\(\)")
+
+
+def load_fixtures(path: Path) -> list[Fixture]:
+    """Parses the listings inserted by scripts/init.sql."""
+    fixtures = []
+    for values in VALUES_PATTERN.finditer(path.read_text()):
+        fields = []
+        for field in FIELD_PATTERN.finditer(values.group(1)):
+            string, number = field.groups()
+            fields.append(string.replace("''", "'") if string is not None else int(number) if number else None)
+        _, title, description, price_cents, _, _, _, category, condition, image = fields
+        fixtures.append(Fixture(title, description, price_cents, category, condition, image))
+    if not fixtures:
+        raise ValueError(f"No listings found in {path}.")
+    return fixtures
+
+
+def generate_users(scale: float, hashed_password: str) -> list[dict]:
+    """Builds the rows of the benchmark users, the admin first."""
+    users = [{
+        "id": uuid.uuid4(),
+        "email": BENCHMARK_ADMIN_EMAIL,
+        "first_name": "Bench",
+        "last_name": "Admin",
+        "is_superuser": True,
+    }]
+    for i in range(max(1, int(USERS_PER_SCALE * scale))):
+        users.append({
+            "id": uuid.uuid4(),
+            "email": f"{BENCHMARK_EMAIL_PREFIX}{i}@ufl.edu",
+            "first_name": f"Bench{i}",
+            "last_name": random.choice(["Gator", "Albert", "Alberta", "Swamp", "Orange", "Blue"]),
+            "is_superuser": False,
+        })
+    for user in users:
+        user.update({
+            "hashed_password": hashed_password,
+            "phone_number": f"352555{random.randrange(10000):04d}",
+            "is_active": True,
+            "is_verified": True,
+            "is_banned": False,
+        })
+    return users
+
+
+def generate_listings(scale: float, fixtures: list[Fixture], seller_ids: list[uuid.UUID]):
+    """Yields the rows of the benchmark listings, each a variation of one of the fixtures."""
+    now = datetime.now(timezone.utc)
+    categories, conditions = list(ListingCategory), list(ListingCondition)
+    statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+    for i in range(int(LISTINGS_PER_SCALE * scale)):
+        fixture = fixtures[i % len(fixtures)]
+        created_at = now - timedelta(seconds=random.randrange(365 * 24 * 3600))
+        # Most listings keep the fixture's category, the rest spread the filters over every value
+        category = ListingCategory[fixture.category] if random.random() < 0.5 else random.choice(categories)
+        condition = ListingCondition[fixture.condition] if random.random() < 0.5 else random.choice(conditions)
+        yield {
+            "seller_id": random.choice(seller_ids),
+            "title": f"{fixture.title} #{i}",
+            "description": f"{fixture.description} {' '.join(random.sample(FILLER_WORDS, 6))}",
+            "price_cents": max(100, int(fixture.price_cents * random.uniform(0.3, 1.5))),
+            "status": random.choices(statuses, weights)[0],
+            "created_at": created_at,
+            "updated_at": min(now, created_at + timedelta(seconds=random.randrange(7 * 24 * 3600))),
+            "category": category,
+            "condition": condition,
+            "image": fixture.image,
+        }
+
+
+async def reset() -> None:
+    """Deletes the benchmark users, whose listings and sessions go with them through their foreign keys."""
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(User).where(User.email.startswith(BENCHMARK_EMAIL_PREFIX)))
+        await session.commit()
+
+
+async def seed(scale: float, fixtures: list[Fixture]) -> None:
+    """Inserts the benchmark users and listings in batches and refreshes the planner statistics."""
+    users = generate_users(scale, PasswordHelper().hash(BENCHMARK_PASSWORD))
+    seller_ids = [user["id"] for user in users[1:]]
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(User), users)
+        batch = []
+        for row in generate_listings(scale, fixtures, seller_ids):
+            batch.append(row)
+            if len(batch) == INSERT_BATCH_SIZE:
+                await session.execute(insert(Listing), batch)
+                batch = []
+        if batch:
+            await session.execute(insert(Listing), batch)
+        await session.commit()
+        # Fresh statistics, so the planner and estimate_table_rows see the new row counts
+        await session.execute(text('ANALYZE "user", listing_table'))
+        await session.commit()
+    print(f"Seeded {len(users)} users and {int(LISTINGS_PER_SCALE * scale)} listings.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed the database with benchmark users and listings.")
+    parser.add_argument("--scale", type=float, default=1.0, help="scale factor, 1 is 100 users and 1,000 listings")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES, help="SQL file with the fixture listings")
+    parser.add_argument("--reset", action="store_true", help="delete earlier benchmark data first")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, so runs generate the same data")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    fixtures = load_fixtures(args.fixtures)
+
+    async def run() -> None:
+        if args.reset:
+            await reset()
+        await seed(args.scale, fixtures)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
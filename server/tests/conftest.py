@@ -0,0 +1,74 @@
+import asyncio
+import os
+import pytest
+
+# Settings are read when the app modules are imported, so the required ones need a value first
+os.environ.setdefault("RESEND_API_KEY", "test")
+
+# The Postgres tests run against the scratch database in TEST_DATABASE_URL, which they wipe, and are
+# skipped without one. It is seeded once per run with SEEDED_SELLERS users and SEEDED_LISTINGS listings.
+SEEDED_SELLERS = 1000
+SEEDED_LISTINGS = 1_000_000
+
+SEED_USERS = """
+INSERT INTO "user" (id, email, hashed_password, is_active, is_superuser, is_verified, is_banned)
+SELECT gen_random_uuid(), 'seller-' || n || '@ufl.edu', 'not-a-hash', true, false, true, false
+FROM generate_series(1, CAST(:sellers AS integer)) AS n
+"""
+
+# Mostly active listings spread over every seller, category and condition, updated over about two years
+SEED_LISTINGS = """
+INSERT INTO listing_table (seller_id, title, description, price_cents, status, created_at, updated_at, category, condition)
+SELECT
+    sellers.ids[1 + n % CAST(:sellers AS integer)],
+    'Seeded listing ' || n,
+    'Listing number ' || n || ' of the query plan tests',
+    (n::bigint * 7919) % 100000,
+    (CASE WHEN n % 10 < 8 THEN 'ACTIVE' WHEN n % 10 = 8 THEN 'SOLD' ELSE 'INACTIVE' END)::listingstatus,
+    now() - n * interval '1 minute',
+    now() - n * interval '1 minute' + (n % 97) * interval '1 minute',
+    (enum_range(NULL::listingcategory))[1 + n % 7],
+    (enum_range(NULL::listingcondition))[1 + n % 5]
+FROM generate_series(1, CAST(:listings AS integer)) AS n, (SELECT array_agg(id ORDER BY email) AS ids FROM "user") AS sellers
+"""
+
+
+@pytest.fixture(scope="session")
+def seeded_engine():
+    """
+    An engine for the scratch database, with the tables of the models and the seeded rows.
+    The engine uses NullPool, so the tests can use it from their own asyncio.run() loops.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+    from app.db.database import to_async_url
+    from app.models import Base
+
+    engine = create_async_engine(to_async_url(url), poolclass=NullPool)
+
+    async def seed():
+        async with engine.begin() as connection:
+            await connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(text(SEED_USERS), {"sellers": SEEDED_SELLERS})
+            await connection.execute(text(SEED_LISTINGS), {"sellers": SEEDED_SELLERS, "listings": SEEDED_LISTINGS})
+        # ANALYZE cannot run in a transaction block, the planner needs its statistics for realistic plans
+        async with engine.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            await connection.execute(text("ANALYZE"))
+
+    async def drop():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+    asyncio.run(seed())
+    try:
+        yield engine
+    finally:
+        asyncio.run(drop())
@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from app.auth.backend import current_user_optional
+from app.main import app
+
+
+@pytest.fixture
+def signed_in(monkeypatch):
+    """Replaces the user lookup with one that counts its calls, signed in as the user it is given."""
+    calls = []
+
+    def use(user):
+        def lookup():
+            calls.append(user)
+            return user
+        app.dependency_overrides[current_user_optional] = lookup
+        return calls
+
+    yield use
+    app.dependency_overrides.pop(current_user_optional, None)
+
+
+def test_the_user_is_looked_up_once_per_request(signed_in):
+    # The rate limiter and the route share one dependency, which FastAPI runs once per request
+    calls = signed_in(SimpleNamespace(id=uuid.uuid4(), is_superuser=True))
+    assert TestClient(app).get("/metrics").status_code == 200
+    assert len(calls) == 1
+
+
+def test_routes_need_a_user(signed_in):
+    calls = signed_in(None)
+    response = TestClient(app).get("/profile/listings")
+    assert response.status_code == 401
+    assert len(calls) == 1
+
+
+class RecordingSession:
+    def __init__(self):
+        self.commits = 0
+
+    async def commit(self):
+        self.commits += 1
+
+
+def test_the_user_lookup_releases_its_connection():
+    # A stream or an export would otherwise keep the lookup's connection until the response ends
+    session, user = RecordingSession(), SimpleNamespace(id=uuid.uuid4())
+    assert asyncio.run(current_user_optional(user, session)) is user
+    assert session.commits == 1
@@ -0,0 +1,70 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from redis.exceptions import RedisError
+from app.auth import strategy
+from app.auth.strategy import CachedDatabaseStrategy, RevocableJWTStrategy, auth_cache
+from app.models.user import User
+
+
+class FakeTokens:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.lookups = 0
+
+    async def get_by_token(self, token, max_age):
+        self.lookups += 1
+        return SimpleNamespace(user_id=self.user_id, created_at=datetime.now(timezone.utc))
+
+
+class FakeUserManager:
+    def __init__(self, user):
+        self.user = user
+
+    def parse_id(self, user_id):
+        return user_id
+
+    async def get(self, user_id):
+        return self.user
+
+
+def make_user(**values) -> User:
+    return User(
+        id=uuid.uuid4(), email="gator@ufl.edu", hashed_password="x", is_active=True,
+        is_superuser=False, is_verified=True, is_banned=False, **values,
+    )
+
+
+def test_memory_backend_reads_every_session_from_the_database(monkeypatch):
+    # Without a shared backend other workers would never see a ban or logout
+    monkeypatch.setattr(strategy.response_cache, "shared", None)
+    auth_cache.clear()
+    user = make_user()
+    tokens = FakeTokens(user.id)
+    manager = FakeUserManager(user)
+    database_strategy = CachedDatabaseStrategy(tokens, lifetime_seconds=3600)
+
+    async def run():
+        assert await database_strategy.read_token("token", manager) is user
+        user.is_banned = True
+        return await database_strategy.read_token("token", manager)
+
+    assert asyncio.run(run()) is None
+    assert tokens.lookups == 2
+    assert len(auth_cache) == 0
+
+
+def test_logout_survives_a_redis_outage():
+    class BrokenRevocations:
+        async def revoke(self, token_id, expires_at):
+            raise RedisError("connection refused")
+
+    jwt_strategy = RevocableJWTStrategy(BrokenRevocations(), secret="a-test-secret-that-is-long-enough-for-hs256", lifetime_seconds=3600)
+    user = make_user()
+
+    async def run():
+        token = await jwt_strategy.write_token(user)
+        await jwt_strategy.destroy_token(token, user)
+
+    asyncio.run(run())
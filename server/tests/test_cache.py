@@ -0,0 +1,123 @@
+import asyncio
+import time
+from starlette.requests import Request
+from app.core import cache as cache_module
+from app.core.cache import CacheBroadcast, CountCache, ResponseCache, TTLCache
+from app.db.routing import READ_PRIMARY_COOKIE
+
+
+def make_cache(max_namespaces: int) -> ResponseCache:
+    return ResponseCache(TTLCache(maxsize=8, ttl=60), None, max_age=0, max_namespaces=max_namespaces)
+
+
+def test_versions_are_bounded():
+    cache = make_cache(max_namespaces=3)
+
+    async def run():
+        for user in range(100):
+            await cache.invalidate(f"user:{user}")
+
+    asyncio.run(run())
+    assert len(cache._versions) == 3
+
+
+def test_versions_never_repeat_after_eviction():
+    cache = make_cache(max_namespaces=2)
+
+    async def run():
+        seen = [await cache.version("user:a")]
+        await cache.invalidate("user:a")
+        seen.append(await cache.version("user:a"))
+        # Pushes user:a out of the bounded versions
+        await cache.invalidate("user:b", "user:c", "user:d")
+        seen.append(await cache.version("user:a"))
+        await cache.invalidate("user:a")
+        seen.append(await cache.version("user:a"))
+        return seen
+
+    seen = asyncio.run(run())
+    assert seen == sorted(seen)
+    assert len(set(seen)) == len(seen)
+
+
+def test_invalidations_are_broadcast_without_a_shared_backend(monkeypatch):
+    sent = []
+
+    async def fake_notify(channel, *payloads):
+        sent.extend(payloads)
+
+    monkeypatch.setattr(cache_module, "notify", fake_notify)
+    sender, receiver = CacheBroadcast(), CacheBroadcast()
+    writer = ResponseCache(TTLCache(maxsize=8, ttl=60), None, max_age=0, broadcast=sender)
+    reader = ResponseCache(TTLCache(maxsize=8, ttl=60), None, max_age=0, broadcast=receiver)
+
+    async def run():
+        before = await reader.version("listings")
+        await writer.invalidate("listings")
+        for payload in sent:
+            # Each worker also receives its own notifications, which it has already applied
+            sender._receive(payload)
+            receiver._receive(payload)
+        return before, await reader.version("listings"), await writer.version("listings")
+
+    before, after, writer_version = asyncio.run(run())
+    assert after != before
+    assert writer_version == 1
+    assert receiver.received == 1 and sender.received == 0
+
+
+def test_reconnect_drops_everything():
+    broadcast = CacheBroadcast()
+    cache = ResponseCache(TTLCache(maxsize=8, ttl=60), None, max_age=0, broadcast=broadcast)
+    cache.local.set("response:listings:0:/listings?", "entry")
+    versions = asyncio.run(cache.version("listings"))
+    broadcast._resync()
+    assert len(cache.local) == 0
+    assert asyncio.run(cache.version("listings")) != versions
+
+
+def make_request(cookies: str = "") -> Request:
+    headers = [(b"cookie", cookies.encode())] if cookies else []
+    return Request({"type": "http", "method": "GET", "path": "/listings", "query_string": b"", "headers": headers})
+
+
+def test_clients_pinned_to_the_primary_bypass_the_cache():
+    cache = make_cache(max_namespaces=8)
+    calls = []
+
+    async def produce(response):
+        calls.append(1)
+        return {"count": len(calls)}
+
+    async def run():
+        pinned = make_request(f"{READ_PRIMARY_COOKIE}={time.time() + 60}")
+        await cache.serve(make_request(), "listings", dict, produce)
+        cached = await cache.serve(make_request(), "listings", dict, produce)
+        fresh = await cache.serve(pinned, "listings", dict, produce)
+        return cached, fresh
+
+    cached, fresh = asyncio.run(run())
+    assert cached.body == b'{"count":1}'
+    assert fresh.body == b'{"count":2}'
+    assert fresh.headers["cache-control"] == "private, no-cache"
+    assert len(cache.local) == 1
+
+
+def test_count_invalidations_reach_every_worker(monkeypatch):
+    sent = []
+
+    async def fake_notify(channel, *payloads):
+        sent.extend(payloads)
+
+    monkeypatch.setattr(cache_module, "notify", fake_notify)
+    sender, receiver = CacheBroadcast(), CacheBroadcast()
+    writer = CountCache("listing_counts", maxsize=8, ttl=60, broadcast=sender)
+    reader = CountCache("listing_counts", maxsize=8, ttl=60, broadcast=receiver)
+    writer.set("active", 10)
+    reader.set("active", 10)
+
+    asyncio.run(writer.invalidate())
+    for payload in sent:
+        receiver._receive(payload)
+    assert writer.get("active") is None
+    assert reader.get("active") is None
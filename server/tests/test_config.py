@@ -0,0 +1,10 @@
+from pathlib import Path
+from app.core.config import Settings
+
+EXAMPLE_ENV = Path(__file__).resolve().parents[1] / "example.env"
+
+
+def test_example_env_is_a_valid_configuration():
+    # The README has new setups copy example.env to .env as it is
+    settings = Settings(_env_file=EXAMPLE_ENV)
+    assert settings.listing_events_database_url is None
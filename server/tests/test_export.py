@@ -0,0 +1,47 @@
+import asyncio
+import os
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.api.admin import listing_export_statement
+from app.core.export import export_response
+from app.schemas.listing import ListingFilters
+from conftest import SEEDED_LISTINGS
+
+# The admin exports stream through a server-side cursor, so the memory of a worker must not grow
+# with the number of rows exported. Exporting every seeded listing reads about 200 MB of rows.
+RSS_GROWTH_LIMIT = 64 * 1024 * 1024
+
+# Rows exported before the baseline is taken, once the cursor, buffers and allocator have warmed up
+WARMUP_ROWS = 50_000
+
+
+def resident_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc to read the resident memory")
+@pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+def test_listing_export_memory_stays_flat(seeded_engine, export_format):
+    response = export_response(
+        async_sessionmaker(seeded_engine),
+        listing_export_statement(ListingFilters()),
+        export_format,
+        "listings",
+    )
+
+    async def consume():
+        lines, baseline, peak = 0, None, 0
+        async for chunk in response.body_iterator:
+            lines += chunk.count("\n")
+            if baseline is None and lines >= WARMUP_ROWS:
+                baseline = resident_bytes()
+            if baseline is not None:
+                peak = max(peak, resident_bytes())
+        return lines, baseline, peak
+
+    lines, baseline, peak = asyncio.run(consume())
+    header = 1 if export_format == "csv" else 0
+    assert lines == SEEDED_LISTINGS + header
+    growth = peak - baseline
+    assert growth < RSS_GROWTH_LIMIT, f"Resident memory grew by {growth / 2**20:.0f} MB during the export"
@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from PIL import Image
+from app.core import images
+from app.core.config import settings
+from app.core.images import LISTING_VARIANTS, PROFILE_VARIANTS, generate_variants, variant_path, variant_urls
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "STATIC_DIR", tmp_path)
+    # Renders in a thread, since a pool process would not see the patched folder
+    monkeypatch.setattr(images, "get_pool", lambda: None)
+    images.variant_files.clear()
+    (tmp_path / "images" / "profile").mkdir(parents=True)
+    yield tmp_path
+    images.variant_files.clear()
+
+
+def static_url(path: str) -> str:
+    return f"{settings.base_url}/static/{path}"
+
+
+def test_missing_variants_fall_back_to_the_original(static_dir):
+    image = "images/profile/gator.png"
+    Image.new("RGB", (300, 200)).save(static_dir / image)
+    assert variant_urls(image, PROFILE_VARIANTS) == {"avatar": static_url(image)}
+
+
+def test_generated_variants_are_advertised(static_dir):
+    image = "images/profile/gator.png"
+    Image.new("RGB", (300, 200)).save(static_dir / image)
+    variant_urls(image, PROFILE_VARIANTS)
+    asyncio.run(generate_variants(image, PROFILE_VARIANTS))
+    assert (static_dir / variant_path(image, "avatar")).is_file()
+    assert variant_urls(image, PROFILE_VARIANTS) == {"avatar": static_url(variant_path(image, "avatar"))}
+
+
+def test_failed_variants_are_not_advertised(static_dir):
+    image = "images/listings/broken.jpg"
+    (static_dir / "images" / "listings").mkdir()
+    (static_dir / image).write_bytes(b"not an image")
+    asyncio.run(generate_variants(image, LISTING_VARIANTS))
+    assert variant_urls(image, LISTING_VARIANTS) == {name: static_url(image) for name in LISTING_VARIANTS}
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+from app.core.listing_events import matches
+from app.models.listing import ListingCategory
+from app.schemas.listing import ListingFilters
+
+
+def listing(**values) -> SimpleNamespace:
+    row = {"title": "Desk lamp", "description": "Bright LED lamp", "category": ListingCategory.FURNITURE, "condition": None, "price_cents": 1500}
+    return SimpleNamespace(**{**row, **values})
+
+
+def test_keyword_matches_title_and_description():
+    assert matches(ListingFilters(keyword="led desk"), listing())
+    assert not matches(ListingFilters(keyword="chair"), listing())
+
+
+def test_missing_description_is_not_the_word_none():
+    assert not matches(ListingFilters(keyword="none"), listing(description=None))
+    assert matches(ListingFilters(keyword="lamp"), listing(description=None))
+
+
+def test_price_and_category_filters():
+    assert matches(ListingFilters(category=ListingCategory.FURNITURE, max_price=2000), listing())
+    assert not matches(ListingFilters(min_price=2000), listing())
+    assert not matches(ListingFilters(category=ListingCategory.TEXTBOOKS), listing())
@@ -0,0 +1,55 @@
+import asyncio
+import io
+import json
+from fastapi import UploadFile
+from app.core import listing_import
+from app.core.config import settings
+
+
+def upload(name: str, content: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=name)
+
+
+def manifest(*rows: dict) -> UploadFile:
+    return upload("manifest.jsonl", "".join(json.dumps(row) + "\n" for row in rows).encode())
+
+
+def row(title: str, image: str | None = None) -> dict:
+    return {"title": title, "description": "A listing", "price": "5.00", "image": image}
+
+
+def run_import(monkeypatch, tmp_path, rows: list[dict], images: list[UploadFile]) -> dict:
+    async def insert_batch(session, values):
+        return list(range(1, len(values) + 1))
+
+    async def generate_variants(image, variants):
+        pass
+
+    monkeypatch.setattr(listing_import, "insert_batch", insert_batch)
+    monkeypatch.setattr(listing_import, "generate_variants", generate_variants)
+    return asyncio.run(listing_import.import_listings(None, None, manifest(*rows), "jsonl", images, tmp_path))
+
+
+def test_images_of_truncated_rows_are_not_read(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "listing_import_max_rows", 1)
+    used, unused = upload("used.jpg", b"first image"), upload("unused.jpg", b"second image")
+    summary = run_import(monkeypatch, tmp_path, [row("Lamp", "used.jpg"), row("Desk", "unused.jpg")], [used, unused])
+    assert summary["created"] == 1 and summary["truncated"]
+    assert unused.file.tell() == 0
+    assert len([path for path in tmp_path.iterdir() if not path.name.startswith(".upload-")]) == 1
+
+
+def test_unreferenced_images_are_not_read(monkeypatch, tmp_path):
+    extra = upload("extra.jpg", b"never used")
+    summary = run_import(monkeypatch, tmp_path, [row("Lamp")], [extra])
+    assert summary["created"] == 1
+    assert extra.file.tell() == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_duplicate_image_names_fail_only_their_rows(monkeypatch, tmp_path):
+    images = [upload("photo.jpg", b"one"), upload("photo.jpg", b"two")]
+    summary = run_import(monkeypatch, tmp_path, [row("Lamp", "photo.jpg"), row("Desk")], images)
+    first, second = summary["results"]
+    assert first["id"] is None and "More than one image named 'photo.jpg'" in first["errors"][0]
+    assert second["id"] is not None
@@ -0,0 +1,140 @@
+import asyncio
+import json
+from datetime import timedelta
+import pytest
+from fastapi import Response
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.listings import apply_listing_filters, get_listings, listing_projection
+from app.db.listing_sync import changes_statement, pending_change_statement
+from app.models.listing import Listing, ListingStatus
+from app.models.user import User
+from app.schemas.listing import ListingFilters
+from app.schemas.pagination import Pagination, SyncToken
+
+# These tests check that the listing queries use the indexes of the listing filter and sort
+# migration: none of them may read listing_table with a sequential scan once it holds a million
+# rows. The get_listings queries are captured as the endpoints send them and re-run under EXPLAIN.
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Returns the relations that a JSON query plan reads with a sequential scan."""
+    found = [plan["Relation Name"]] if plan["Node Type"] == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def explain(engine, statement: str, parameters) -> dict:
+    async with engine.connect() as connection:
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar_one()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+async def listing_page_statements(engine, pages: int = 1, **params) -> list[tuple[str, tuple]]:
+    """
+    Calls get_listings like the endpoints do and returns the listing_table statements it sent.
+    With pages above 1 it follows the X-Next-Cursor header, so the keyset queries are included.
+    """
+    captured = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if "listing_table" in statement:
+            captured.append((statement, parameters))
+
+    arguments = {
+        "pagination": Pagination(page_num=1, card_num=params.pop("card_num", 10)),
+        "sort_by": "updated_at",
+        "order": "desc",
+        **{name: None for name in ("status", "category", "condition", "min_price", "max_price", "keyword", "cursor")},
+        "projection": listing_projection(True, None, None),
+        **params,
+    }
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        for _ in range(pages):
+            response = Response()
+            await get_listings(async_session=AsyncSession(engine), response=response, **arguments)
+            arguments["cursor"] = response.headers.get("X-Next-Cursor")
+            if arguments["cursor"] is None:
+                break
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+    return captured
+
+
+async def first_seller(engine):
+    async with AsyncSession(engine) as session:
+        return await session.scalar(select(User.id).order_by(User.email).limit(1))
+
+
+async def token_time(engine):
+    # A day before the newest update, so the poll after the token has rows to return
+    async with AsyncSession(engine) as session:
+        latest = await session.scalar(select(Listing.updated_at).order_by(Listing.updated_at.desc()).limit(1))
+    return latest - timedelta(days=1)
+
+
+def assert_indexed(engine, statements) -> None:
+    assert statements
+    for statement, parameters in statements:
+        plan = asyncio.run(explain(engine, statement, parameters))
+        assert "listing_table" not in seq_scans(plan), f"Sequential scan on listing_table for:\n{statement}"
+
+
+@pytest.mark.parametrize("params", [
+    {"status": "active", "pages": 2},
+    {"status": "active", "sort_by": "price", "order": "asc", "pages": 2},
+    {"status": "active", "sort_by": "created_at", "pages": 2},
+    {"status": "active", "category": "furniture", "min_price": 1000, "max_price": 5000, "sort_by": "price", "order": "asc"},
+    {"category": "textbooks", "status": "active", "sort_by": "price", "order": "desc"},
+    {"pages": 2},
+], ids=["active-updated", "active-price", "active-created", "category-price-range", "category-price", "all-updated"])
+def test_listing_pages_use_an_index(seeded_engine, params):
+    assert_indexed(seeded_engine, asyncio.run(listing_page_statements(seeded_engine, **params)))
+
+
+@pytest.mark.parametrize("params", [
+    {"pages": 2},
+    {"status": "active"},
+    {"sort_by": "price", "order": "asc"},
+], ids=["updated", "active", "price"])
+def test_seller_pages_use_an_index(seeded_engine, params):
+    # GET /profile/listings and GET /admin/users/{user_id}/listings
+    seller_id = asyncio.run(first_seller(seeded_engine))
+    statements = asyncio.run(listing_page_statements(
+        seeded_engine,
+        card_num=50,
+        projection=listing_projection(False, None, None),
+        seller_id=seller_id,
+        **params,
+    ))
+    assert_indexed(seeded_engine, statements)
+
+
+def test_admin_listing_updates_use_an_index(seeded_engine):
+    # POST /admin/users/{user_id}/deactivate_listings and activate_listings, EXPLAIN alone does not run the UPDATE
+    seller_id = asyncio.run(first_seller(seeded_engine))
+    dialect = seeded_engine.dialect
+    statements = [
+        update(Listing).where(Listing.seller_id == seller_id).values(status=status.value).returning(Listing.id)
+        for status in (ListingStatus.INACTIVE, ListingStatus.ACTIVE)
+    ] + [select(Listing).where(Listing.seller_id == seller_id)]
+    for statement in statements:
+        compiled = statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        assert_indexed(seeded_engine, [(str(compiled), ())])
+
+
+def test_listing_changes_use_an_index(seeded_engine):
+    # GET /listings/changes, the first sync, a poll after a token and the probe for a 304
+    token = SyncToken(updated_at=asyncio.run(token_time(seeded_engine)), id=0)
+    projection = listing_projection(True, None, None)
+    statements = [
+        changes_statement(projection, ListingFilters(), None, 100, apply_listing_filters),
+        changes_statement(projection, ListingFilters(), token, 100, apply_listing_filters),
+        pending_change_statement(ListingFilters(), token, apply_listing_filters),
+    ]
+    for statement in statements:
+        compiled = statement.compile(dialect=seeded_engine.dialect, compile_kwargs={"literal_binds": True})
+        assert_indexed(seeded_engine, [(str(compiled), ())])
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+from app.db.listing_sync import not_modified, pending_change_statement, validator_headers
+from app.schemas.listing import ListingFilters
+from app.schemas.pagination import SyncToken
+
+LATEST = datetime(2025, 1, 1, 12, 30, tzinfo=timezone.utc)
+
+
+def test_etag_depends_on_the_request():
+    first = validator_headers(LATEST, "/listings/changes?limit=5")["ETag"]
+    second = validator_headers(LATEST, "/listings/changes?limit=5&sync_token=abc")["ETag"]
+    assert first != second
+    assert first == validator_headers(LATEST, "/listings/changes?limit=5")["ETag"]
+
+
+def test_etag_depends_on_the_latest_update():
+    variant = "/listings/changes?sync_token=abc"
+    assert validator_headers(LATEST, variant)["ETag"] != validator_headers(LATEST.replace(minute=31), variant)["ETag"]
+
+
+def test_not_modified():
+    etag = validator_headers(LATEST, "/listings/changes")["ETag"]
+    assert not_modified(etag, None, LATEST, etag)
+    assert not not_modified('W/"other"', None, LATEST, etag)
+    assert not_modified(None, "Wed, 01 Jan 2025 12:30:00 GMT", LATEST, etag)
+    assert not not_modified(None, "Wed, 01 Jan 2025 12:29:59 GMT", LATEST, etag)
+
+
+def test_pending_change_probe_reads_one_row_after_the_token():
+    token = SyncToken(updated_at=LATEST, id=7)
+    statement = pending_change_statement(ListingFilters(), token, lambda statement, filters: statement)
+    sql = str(statement)
+    assert "LIMIT" in sql
+    assert "listing_table.updated_at, listing_table.id) >" in sql
@@ -0,0 +1,46 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.api.metrics import get_metrics
+from app.core.config import settings
+
+
+def make_request(authorization: str | None = None) -> Request:
+    headers = [(b"authorization", authorization.encode())] if authorization is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/metrics", "headers": headers})
+
+
+def status_of(request: Request, user=None) -> int:
+    try:
+        return asyncio.run(get_metrics(request, user)).status_code
+    except HTTPException as error:
+        return error.status_code
+
+
+def test_metrics_need_a_login_without_a_token(monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", "")
+    assert status_of(make_request()) == 401
+    assert status_of(make_request("Bearer ")) == 401
+
+
+def test_metrics_are_for_administrators(monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", "")
+    assert status_of(make_request(), SimpleNamespace(is_superuser=False)) == 403
+    assert status_of(make_request(), SimpleNamespace(is_superuser=True)) == 200
+
+
+@pytest.mark.parametrize("authorization, expected", [
+    ("Bearer scrape-secret", 200),
+    ("Bearer wrong", 401),
+    ("scrape-secret", 401),
+    (None, 401),
+])
+def test_metrics_token(monkeypatch, authorization, expected):
+    monkeypatch.setattr(settings, "metrics_token", "scrape-secret")
+    assert status_of(make_request(authorization)) == expected
+
+
+def test_server_timing_is_off_by_default():
+    assert type(settings).model_fields["server_timing_header"].default is False
@@ -0,0 +1,37 @@
+import ipaddress
+import pytest
+from starlette.requests import Request
+from app.core import ratelimit
+from app.core.ratelimit import client_ip
+
+
+def make_request(peer: str, forwarded: str | None = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "client": (peer, 1234)})
+
+
+@pytest.fixture
+def behind_nginx(monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXIES", [ipaddress.ip_network("172.16.0.0/12")])
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXIES", [])
+    assert client_ip(make_request("172.18.0.5", "203.0.113.7")) == "172.18.0.5"
+
+
+def test_forwarded_for_from_a_trusted_proxy(behind_nginx):
+    assert client_ip(make_request("172.18.0.5", "203.0.113.7")) == "203.0.113.7"
+
+
+def test_forged_forwarded_for_is_skipped(behind_nginx):
+    # nginx appends the address it saw, anything before it came from the client
+    assert client_ip(make_request("172.18.0.5", "1.2.3.4, 203.0.113.7")) == "203.0.113.7"
+
+
+def test_forwarded_for_from_an_untrusted_client(behind_nginx):
+    assert client_ip(make_request("203.0.113.7", "1.2.3.4")) == "203.0.113.7"
+
+
+def test_trusted_proxy_without_forwarded_for(behind_nginx):
+    assert client_ip(make_request("172.18.0.5")) == "172.18.0.5"
@@ -0,0 +1,26 @@
+import pytest
+from app.db.slow_queries import can_analyze, is_explainable
+
+
+@pytest.mark.parametrize("statement", [
+    "SELECT users.id FROM users WHERE users.id IN ($1) FOR UPDATE",
+    "SELECT listing_table.id FROM listing_table FOR NO KEY UPDATE SKIP LOCKED",
+    "SELECT id FROM listing_table FOR SHARE",
+    "SELECT id FROM listing_table\nFOR KEY SHARE OF listing_table",
+    "SELECT * FROM (WITH moved AS (UPDATE listing_table SET status = 'INACTIVE' RETURNING id) SELECT id FROM moved) AS m",
+])
+def test_locking_and_writing_selects_are_not_analyzed(statement):
+    assert is_explainable(statement)
+    assert not can_analyze(statement)
+
+
+@pytest.mark.parametrize("statement", [
+    "SELECT listing_table.id, listing_table.updated_at FROM listing_table ORDER BY listing_table.updated_at",
+    "SELECT count(*) FROM users WHERE users.is_verified = $1",
+])
+def test_plain_selects_are_analyzed(statement):
+    assert can_analyze(statement)
+
+
+def test_writes_are_not_explained():
+    assert not is_explainable("UPDATE users SET is_banned = $1 WHERE users.id = $2")
@@ -0,0 +1,28 @@
+import uuid
+import pytest
+from pydantic import ValidationError
+from app.schemas.user import BulkModerationRequest, UserFilters
+
+
+@pytest.mark.parametrize("keyword", ["", "   ", "\t\n"])
+def test_blank_keyword_is_not_a_selector(keyword):
+    # A blank keyword normalizes to no keyword, which would select every user
+    with pytest.raises(ValidationError, match="at least one field"):
+        BulkModerationRequest.model_validate({"filters": {"keyword": keyword}})
+
+
+def test_keyword_is_normalized():
+    request = BulkModerationRequest.model_validate({"filters": {"keyword": "  Spam   BOT "}})
+    assert request.filters == UserFilters(keyword="spam bot")
+
+
+def test_blank_keyword_with_another_filter():
+    request = BulkModerationRequest.model_validate({"filters": {"keyword": " ", "is_verified": False}})
+    assert request.filters == UserFilters(is_verified=False)
+
+
+def test_exactly_one_selector():
+    with pytest.raises(ValidationError, match="exactly one"):
+        BulkModerationRequest.model_validate({})
+    with pytest.raises(ValidationError, match="exactly one"):
+        BulkModerationRequest.model_validate({"user_ids": [str(uuid.uuid4())], "filters": {"is_admin": False}})